@@ -1,208 +1,176 @@
 import sys
 import time
-import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib.gridspec import GridSpec
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QHBoxLayout, 
-                            QToolBar, QGroupBox, QGridLayout, QPushButton, QStatusBar, QFrame, 
-                            QSplitter, QTabWidget, QComboBox, QLCDNumber, QFileDialog, QMessageBox,
-                            QSlider, QCheckBox, QRadioButton, QSpinBox, QDoubleSpinBox, QProgressBar,
-                            QTextEdit, QTableWidget, QTableWidgetItem, QHeaderView, QLineEdit,
-                            QDateTimeEdit, QToolButton, QMenu, QAction)
-from PyQt5.QtCore import QTimer, Qt, QDateTime, QSize, QDate
-from PyQt5.QtGui import QFont, QColor, QPalette, QIcon, QPixmap, QTextCursor
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
-from matplotlib.figure import Figure
-from pymodbus.client.sync import ModbusTcpClient
-from pymodbus.constants import Endian
-from pymodbus.payload import BinaryPayloadDecoder
-from pymodbus.transaction import ModbusSocketFramer
-from pymodbus.pdu import ModbusRequest
-from pymodbus.exceptions import ModbusIOException
-import struct
-import csv
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    启动耗时统计：以 --profile-startup 参数启动时记录各模块导入和各控件构建的耗时，
+    在主窗口显示后输出报告
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.records = []
+        self._depth = 0
+
+    @contextmanager
+    def measure(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.records.append((self._depth, name, time.perf_counter() - started))
+
+    def mark(self, name):
+        """记录从启动到当前时刻的总耗时"""
+        if self.enabled:
+            self.records.append((self._depth, name, time.perf_counter() - self.started))
+
+    def report(self):
+        if not self.enabled:
+            return
+        lines = ["启动耗时统计:"]
+        # 记录按结束顺序保存，嵌套的子项先结束，这里按层级缩进后输出
+        for depth, name, elapsed in self.records:
+            lines.append(f"  {'  ' * depth}{name}: {elapsed * 1000:.1f} ms")
+        lines.append(f"  启动完成总耗时: {(time.perf_counter() - self.started) * 1000:.1f} ms")
+        report = "\n".join(lines)
+        # 标准输出此时已重定向到日志区域，同时输出到控制台（无控制台的打包程序中 __stdout__ 为 None）
+        if sys.__stdout__ is not None:
+            sys.__stdout__.write(report + "\n")
+            sys.__stdout__.flush()
+        print(report)
+
+
+profiler = StartupProfiler('--profile-startup' in sys.argv)
+
+with profiler.measure("import numpy"):
+    import numpy as np
+with profiler.measure("import PyQt5"):
+    from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QHBoxLayout, 
+                                QToolBar, QGroupBox, QGridLayout, QPushButton, QStatusBar, QFrame, 
+                                QSplitter, QTabWidget, QComboBox, QLCDNumber, QFileDialog, QMessageBox,
+                                QSlider, QCheckBox, QRadioButton, QSpinBox, QDoubleSpinBox, QProgressBar,
+                                QTextEdit, QTableWidget, QTableWidgetItem, QHeaderView, QLineEdit,
+                                QDateTimeEdit, QToolButton, QMenu, QAction, QStackedWidget, QProgressDialog,
+                                QDialog)
+    from PyQt5.QtCore import QTimer, Qt, QDateTime, QSize, QDate
+    from PyQt5.QtGui import QFont, QColor, QPalette, QIcon, QPixmap, QTextCursor
+import io
 import os
+import threading
 from datetime import datetime
-import io
-import requests
-import resources_rc
+import logging
+with profiler.measure("import gis_protocol / gis_acquisition"):
+    from gis_protocol import DeviceSession, RegisterDecoder, get_decode_plan
+    from gis_acquisition import AcquisitionWorker, FrameRingBuffer, PollScheduler
+    from gis_prpd import PrpdHistogram, PrpdRasterizer, PrpsBuffer
+    from gis_prpd_widget import HeatmapPanel
+    from gis_recording import RecordBuffer
+    from gis_segments import SegmentWriter
+    from gis_export import EXPORT_FORMATS, ExportCancelled, ExportJob
+    from gis_history import HistoryStore
+    from gis_capture import CaptureWriter, ReplaySource
+    from gis_trend import TrendStore
+    from gis_trend_widget import TrendPanel
+    from gis_log_sink import LogSink, StreamToSink
+
+# 以下模块只在用到时才导入，避免拖慢启动：
+#   requests       - 局放类型识别和API检查
+#   pymodbus       - 第一次连接设备
+#   resources_rc   - 窗口图标，在主窗口显示后加载
+#   gis_canvas     - Matplotlib图表画布，在主窗口显示后创建
 
-# 设置默认字体为SimHei（或其他支持中文的字体）
-plt.rcParams['font.sans-serif'] = ['SimHei']
-# 解决负号"-"显示为方块的问题
-plt.rcParams['axes.unicode_minus'] = False
+# 设备地址
+DEVICE_HOST = '192.168.0.150'
+DEVICE_PORT = 6789
 
-# 自定义 Modbus TCP 请求
-class CustomModbusRequest(ModbusRequest):
-    function_code = 4
+# 日志设置：缓冲区容量（行）、日志控件最多保留的行数、刷新间隔（毫秒）
+LOG_BUFFER_LINES = 5000
+LOG_MAX_LINES = 20000
+LOG_FLUSH_INTERVAL = 100
 
-    def __init__(self, address, count, unit):
-        ModbusRequest.__init__(self)
-        self.address = address
-        self.count = count
-        self.unit_id = unit
+# 自适应刷新：检测到放电活动（放电次数总和或uhf_db最大值超过阈值）时按最短周期轮询，
+# 设备安静时逐步放慢到最长周期（毫秒）
+ADAPTIVE_MIN_INTERVAL = 100
+ADAPTIVE_MAX_INTERVAL = 5000
+ADAPTIVE_COUNT_THRESHOLD = 100
+ADAPTIVE_UHF_THRESHOLD = 60.0
 
-    def encode(self):
-        return struct.pack('>HH', self.address, self.count)
+# 图表最大绘图帧率，与采集周期无关；两次绘图之间采集到的多帧合并为一次绘图
+RENDER_MAX_FPS = 10
 
-    def decode(self, data):
-        self.address, self.count = struct.unpack('>HH', data)
+# PRPS瀑布图显示的周期数
+PRPS_CYCLES = 50
 
-    def execute(self, context):
-        raise NotImplementedError("Custom request not implemented")
+# 累加PRPD图的累加方式，以及默认累加帧数（滑动窗口长度或衰减半衰期）
+PRPD_ACCUMULATE_MODES = [('滑动窗口', 'window'), ('指数衰减', 'decay'), ('全部累加', 'all')]
+PRPD_ACCUMULATE_FRAMES = 500
 
-# 配置 Modbus TCP 客户端
-client = ModbusTcpClient('192.168.0.150', port=6789, framer=ModbusSocketFramer)
+# 图表显示后端：Matplotlib 画布（带工具栏，可保存出版质量的图像）或基于 QImage 的轻量热图（高帧率）
+DISPLAY_BACKENDS = [('Matplotlib', 'matplotlib'), ('轻量热图 (高帧率)', 'heatmap')]
+DISPLAY_BACKEND = 'matplotlib'
 
-# 连接到 Modbus 服务器
-client.connect()
+# 数据记录缓冲区的内存上限（MB），超出后丢弃最早的数据
+RECORD_MEMORY_BUDGET_MB = 512
 
-# 全局变量存储放电次数，uhf_db和相位数据
-discharge_counts = []
-uhf_db_values = []
-phase_values = []
+# 记录时同时写入磁盘的目录（每个设备一个子目录），以及段文件按大小（MB）或时长（秒）轮换的阈值
+RECORD_DIR = 'recordings'
+RECORD_SEGMENT_MB = 64
+RECORD_SEGMENT_SECONDS = 3600
 
+# 原始报文抓包文件的目录；回放倍速选项（0 为尽快回放），回放线程的轮询周期（秒）
+CAPTURE_DIR = 'captures'
+REPLAY_SPEEDS = [('1×', 1.0), ('10×', 10.0), ('100×', 100.0), ('最快', 0.0)]
+REPLAY_POLL_INTERVAL = 0.005
 
-# 配置50组寄存器
-TELEMETRY_REGISTERS = []
-for i in range(50):
-    base_addr = 100 + i * 6
-    TELEMETRY_REGISTERS.append({
-        '放电次数': {'addr': base_addr, 'type': 'int16'},
-        'reserve': {'addr': base_addr + 1, 'type': 'int16'},
-        'uhf_db': {'addr': base_addr + 2, 'type': 'float32', 'endian': 'big'},
-        '相位': {'addr': base_addr + 4, 'type': 'float32', 'endian': 'big'},
-    })
+# 趋势数据（按秒、分钟、小时汇总）的保存目录和保存间隔（秒），以及趋势图可选的时间范围（秒）
+TREND_DIR = 'trends'
+TREND_SAVE_INTERVAL = 60
+TREND_SPANS = [('最近1小时', 3600), ('最近1天', 86400), ('最近7天', 7 * 86400), ('最近30天', 30 * 86400)]
 
-def send_wake_up_sequence(client):
+# 设备型号，对应 register_maps 目录下的寄存器表
+REGISTER_MAP = 'gis_uhf_v1'
+
+def create_client():
+    """创建 Modbus TCP 客户端，在第一次连接设备时才调用"""
+    from pymodbus.client.sync import ModbusTcpClient
+    from pymodbus.transaction import ModbusSocketFramer
+    return ModbusTcpClient(DEVICE_HOST, port=DEVICE_PORT, framer=ModbusSocketFramer)
+
+# 寄存器解码器，解码结果保存在预分配数组中并在每次轮询之间复用
+decoder = RegisterDecoder(get_decode_plan(REGISTER_MAP))
+
+# 设备会话，负责按需唤醒和统计唤醒耗时
+# 客户端在第一次读取或点击"连接设备"时才创建和连接，导入本模块不会发起网络连接
+session = DeviceSession(None, decoder, client_factory=create_client)
+
+def send_wake_up_sequence(client=None):
     """
-    发送唤醒指令 0xFF, 0xFE, 0xFF, 0xFE，并等待5秒。
+    发送唤醒指令 0xFF, 0xFE, 0xFF, 0xFE，并在超时时间内等待设备回复。
     """
-    wake_up_sequence = bytes([0xFF, 0xFE, 0xFF, 0xFE])
-    try:
-        client.socket.sendall(wake_up_sequence)
-        print("唤醒指令发送成功")
-        print("等待5秒...")
-        time.sleep(5)  # 等待5秒
-        response = client.socket.recv(1024)  # 接收回复内容
-        print(f"收到回复: {response.hex()}")
-        
-    except Exception as e:
-        print(f"发送唤醒指令失败: {e}")
-        client.close()  # 发送失败时关闭连接
-        client.connect()  # 重新连接
+    session.wake_up()
 
 def parse_registers(data):
-    for group in TELEMETRY_REGISTERS:
-        for name, config in group.items():
-            addr = config['addr']
-            try:
-                if config['type'] == 'int16':
-                    value = int.from_bytes(data[(addr-100)*2:(addr-100)*2+2], byteorder='big')
-                    if name == '放电次数':
-                        discharge_counts.append(value)
-                elif config['type'] == 'float32':
-                    # 处理浮点数寄存器数据
-                    result = struct.unpack('>HH', data[(addr-100)*2:(addr-100)*2+4])
-                    adjusted_bytes = struct.pack('>HH', result[1], result[0])
-                    value = struct.unpack('>f', adjusted_bytes)[0]
-                    if name == 'uhf_db':
-                        uhf_db_values.append(round(value,2))
-                    elif name == '相位':
-                        phase_values.append(value)
-                raw_data = data[(addr-100)*2:(addr-100)*2+4] if config['type'] == 'float32' else data[(addr-100)*2:(addr-100)*2+2]
-                print(f"寄存器地址 {addr}: {value} ({name}), 原始报文: {raw_data.hex()}")
-            except struct.error:
-                print(f"寄存器地址 {addr}: 数据不足，无法解析, 原始报文: {data[(addr-100)*2:].hex()}")
-
-def read_data(client):
-    # 清空全局变量列表，避免数据不断累积
-    global discharge_counts, uhf_db_values, phase_values
-    discharge_counts = []
-    uhf_db_values = []
-    phase_values = []
-    
-    send_wake_up_sequence(client)
-    time.sleep(1)
-    request = bytes([0x00, 0x01, 0x00, 0x00, 0x00, 0x06, 0x02, 0x04, 0x00, 0x64, 0x01, 0x8F])
-    client.socket.sendall(request)
-    response = client.socket.recv(1024)
-    print(f"收到回复: {response}")
-    if len(response) > 9:
-        data = response[9:]  # 跳过前9个字节
-        parse_registers(data)
-    else:
-        print("回复内容长度不足，无法解析")
-
-# 自定义输出重定向类
-class OutputRedirector(io.StringIO):
-    def __init__(self, text_widget, out_type):
-        super(OutputRedirector, self).__init__()
-        self.text_widget = text_widget
-        self.out_type = out_type
-        self.buf = ""
-
-    def write(self, text):
-        self.buf += text
-        if text.endswith('\n'):
-            self.text_widget.append(self.buf.rstrip())
-            self.text_widget.moveCursor(QTextCursor.End)
-            self.buf = ""
-        return len(text)
-
-    def flush(self):
-        if self.buf:
-            self.text_widget.append(self.buf)
-            self.text_widget.moveCursor(QTextCursor.End)
-            self.buf = ""
-
-# 自定义 Matplotlib 画布类
-class MplCanvas(FigureCanvasQTAgg):
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.fig.set_facecolor('#f0f0f0')
-        # 使用GridSpec来控制子图的大小和位置
-        gs = GridSpec(1, 2, width_ratios=[1, 1])  # 1行2列，宽度比例1:1
-        self.ax1 = self.fig.add_subplot(gs[0, 0])  # 左侧PRPD图
-        self.ax2 = self.fig.add_subplot(gs[0, 1], projection='3d')  # 右侧PRPS图
-        self.colorbar = None  # 添加colorbar属性以便跟踪和管理
-        super(MplCanvas, self).__init__(self.fig)
-        self.setStyleSheet("background-color: #f0f0f0;")
-        
-        # 初始化图表显示
-        self.setup_prpd_plot()
-        self.setup_prps_plot()
-        
-        # 调整布局
-        self.fig.tight_layout()
-        self.fig.subplots_adjust(wspace=0.3)
-        
-    def setup_prpd_plot(self):
-        """设置PRPD图的基本显示信息"""
-        self.ax1.set_xlabel('相位 (°)', fontsize=12)
-        self.ax1.set_ylabel('幅值 (dB)', fontsize=12)
-        self.ax1.set_xlim(0, 360)
-        self.ax1.set_ylim(0, 80)
-        self.ax1.set_title('PRPD图 (相位分辨局部放电)', fontsize=14, fontweight='bold')
-        self.ax1.grid(True, linestyle='--', alpha=0.7)
-        
-        # 添加参考波形
-        x = np.linspace(0, 360, 1000)
-        y = 40 + 40 * np.sin(np.radians(x))
-        self.ax1.plot(x, y, 'r-', label='参考波形', linewidth=2, alpha=0.5)
-        self.ax1.legend(loc='upper right')
-        
-    def setup_prps_plot(self):
-        """设置PRPS图的基本显示信息"""
-        self.ax2.set_title('PRPS图 (相位分辨局部放电谱)', fontsize=14, fontweight='bold')
-        self.ax2.set_xlabel('相位 (°)', fontsize=12)
-        self.ax2.set_ylabel('周期', fontsize=12)
-        self.ax2.set_zlabel('幅值 (dB)', fontsize=12)
-        self.ax2.set_xlim(0, 360)
-        self.ax2.set_ylim(0, 50)
-        self.ax2.set_zlim(0, 80)
+    return decoder.decode(data)
+
+def read_data(client=None):
+    # 只在设备空闲超时或读取失败后才重新唤醒
+    return session.read_frame()
+
+def connect_session():
+    """连接设备，失败时关闭后重试一次；由采集线程执行，与读取不会同时使用会话"""
+    if not session.connect():
+        session.close()
+        if not session.connect():
+            raise ConnectionError(f"无法连接到 {DEVICE_HOST}:{DEVICE_PORT}")
 
 # 局部放电类型识别函数
 def recognize_pd_type(image_path):
@@ -213,14 +181,28 @@ def recognize_pd_type(image_path):
     
     try:
         with open(image_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(url, files=files)
-            response.raise_for_status()  # 如果请求失败则抛出异常
-            data = response.json()
-            return data
+            return post_recognition_request(url, {'file': f})
     except FileNotFoundError:
         print(f"错误：文件未找到，请检查路径 '{image_path}' 是否正确。")
         return {"error": "文件未找到"}
+
+def recognize_pd_array(image):
+    """
+    发送栅格化后的 64×64 灰度数组到FastAPI服务进行局部放电类型识别，数据只在内存中处理
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, image)
+    url = 'http://127.0.0.1:9000/api/v1/predict_array'
+    return post_recognition_request(url, {'file': ('prpd.npy', buffer.getvalue(), 'application/octet-stream')})
+
+def post_recognition_request(url, files):
+    """上传文件到识别服务，返回识别结果，失败时返回包含 error 的字典"""
+    import requests
+    try:
+        response = requests.post(url, files=files)
+        response.raise_for_status()  # 如果请求失败则抛出异常
+        data = response.json()
+        return data
     except requests.exceptions.ConnectionError:
         print(f"错误：无法连接到服务器 {url}。请确保API服务正在运行并且地址正确。")
         return {"error": "连接服务器失败"}
@@ -235,12 +217,10 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("GIS局放监测系统 v1.2")
-        # 设置窗口图标
-        self.setWindowIcon(QIcon(':images/GIS_PD.ico'))
         self.setGeometry(100, 100, 1280, 720)
         
         # 初始化局放类型识别相关变量
-        self.pd_image_path = "temp_pd_image.jpg"
+        self.pd_rasterizer = PrpdRasterizer()
         self.api_url = "http://127.0.0.1:9000/api/v1/predict"
         self.setStyleSheet("""
             QMainWindow {
@@ -353,50 +333,125 @@ class MainWindow(QMainWindow):
         # 创建主布局
         self.main_layout = QVBoxLayout(self.central_widget)
         
-        # 初始化数据记录
+        # 初始化数据记录，按列存储在分块的 numpy 数组中；记录在采集线程中进行（见 process_live_frame），
+        # recording、recorder 和 segment_writer 的修改与读取用 record_lock 保护
         self.recording = False
-        self.record_data = []
+        self.recorder = RecordBuffer(memory_budget=RECORD_MEMORY_BUDGET_MB * 1024 * 1024)
+        self.record_lock = threading.Lock()
+        # 记录期间的磁盘写入线程，每次开始记录时新建；停止后保留，下一次的写入线程先等待它写完
+        self.segment_writer = None
+        # 回放期间记录时回放帧的写入线程，以及各回放记录目录最近一次的写入线程
+        self.replay_writer = None
+        self.replay_writers = {}
+        # 已启动、还没有检查修复结果的写入线程
+        self.unchecked_writers = []
+        # 正在进行的导出任务，导出在后台线程中进行，界面用定时器刷新进度
+        self.export_job = None
+        self.export_progress = None
+        # 正在进行的连接或断开操作 (操作, WorkerCommand)，在采集线程中执行，界面用定时器查询结果
+        self.connection_job = None
+        # 抓包回放：回放数据源和回放线程，回放期间实时采集暂停
+        self.replay = None
+        self.replay_worker = None
+        self.replay_resume_live = False
+        # 回放记录的设备名 replay_<抓包文件名>，也是回放记录目录名
+        self.replay_device = None
+        # 放电次数和幅值的多分辨率趋势，每帧增量汇总，定时保存到 TREND_DIR
+        self.trends = TrendStore(TREND_DIR)
+        self.trend_device = f"{DEVICE_HOST}_{DEVICE_PORT}"
         
         # 初始化进度条值
         self.progress_value = 0
         
-        # 初始化日志区域
+        # 初始化日志区域，控件最多保留 LOG_MAX_LINES 行，超出后自动删除最早的行
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
-        
-        # 添加PRPD历史数据存储
-        self.prpd_history = []  # 用于存储历史数据
-        self.max_history = 5    # 最大历史记录数
-        
-        # 重定向标准输出到文本区域
-        self.stdout_redirector = OutputRedirector(self.log_text, "stdout")
-        self.stderr_redirector = OutputRedirector(self.log_text, "stderr")
+        self.log_text.document().setMaximumBlockCount(LOG_MAX_LINES)
+        
+        # 累加PRPD直方图，默认按滑动窗口累加
+        self.prpd_histogram = PrpdHistogram(mode=PRPD_ACCUMULATE_MODES[0][1], window=PRPD_ACCUMULATE_FRAMES,
+                                            decay=0.5 ** (1.0 / PRPD_ACCUMULATE_FRAMES))
+        self.prps_buffer = PrpsBuffer(PRPS_CYCLES)  # PRPS图最近 PRPS_CYCLES 个周期
+        
+        # 重定向标准输出到日志缓冲区，由定时器批量刷新到文本区域
+        self.log_sink = LogSink(capacity=LOG_BUFFER_LINES)
+        # 开启寄存器调试日志时自动降为调试级别前的日志级别，关闭时恢复
+        self.verbose_restore_level = None
+        self.stdout_redirector = StreamToSink(self.log_sink, logging.INFO)
+        self.stderr_redirector = StreamToSink(self.log_sink, logging.WARNING)
         sys.stdout = self.stdout_redirector
         sys.stderr = self.stderr_redirector
         
+        self.log_timer = QTimer()
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(LOG_FLUSH_INTERVAL)
+        
         # 创建顶部信息面板
-        self.create_info_panel()
+        with profiler.measure("创建信息面板"):
+            self.create_info_panel()
         
         # 创建中间内容区域
-        self.create_content_area()
+        with profiler.measure("创建内容区域"):
+            self.create_content_area()
         
         # 创建底部状态栏
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("系统状态: 正常运行中")
         
-        # 创建定时器
+        # 创建采集线程，设备通信和解码都在后台完成，界面只读取最新快照绘图；
+        # 记录和趋势在采集线程中逐帧处理，界面绘图慢或环形缓冲区覆盖旧帧时也不会漏记
+        self.frame_buffer = FrameRingBuffer(group_count=decoder.plan.group_count)
+        self.last_frame_seq = -1
+        # 绘图统计：已绘制的次数、合并或窗口隐藏时未单独绘制的帧数
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self.scheduler = PollScheduler(self.refresh_rate.value() / 1000,
+                                       min_interval=ADAPTIVE_MIN_INTERVAL / 1000,
+                                       max_interval=ADAPTIVE_MAX_INTERVAL / 1000,
+                                       count_threshold=ADAPTIVE_COUNT_THRESHOLD,
+                                       uhf_threshold=ADAPTIVE_UHF_THRESHOLD)
+        self.acquisition = AcquisitionWorker(lambda on_frame: session.read_frames(on_frame=on_frame),
+                                             decoder, self.frame_buffer, scheduler=self.scheduler,
+                                             on_frame=self.process_live_frame)
+        self.acquisition.start()
+        
+        # 创建绘图定时器，按最大帧率绘图，与采集周期无关
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_plot)
-        self.timer.start(1000)  # 每秒更新一次
+        self.timer.start(1000 // self.render_fps.value())
         
         # 创建时间更新定时器
         self.time_timer = QTimer()
         self.time_timer.timeout.connect(self.update_time)
         self.time_timer.start(1000)  # 每秒更新一次
         
+        # 导出进度刷新定时器，只在导出期间运行
+        self.export_timer = QTimer()
+        self.export_timer.timeout.connect(self.check_export)
+        
+        # 连接和断开结果查询定时器，只在操作进行期间运行
+        self.connection_timer = QTimer()
+        self.connection_timer.timeout.connect(self.check_connection)
+        
+        # 开始记录后检查写入线程修复段文件的结果，只在修复完成前运行
+        self.record_check_timer = QTimer()
+        self.record_check_timer.timeout.connect(self.check_segment_writers)
+        
+        # 回放结束检查定时器，只在回放期间运行
+        self.replay_timer = QTimer()
+        self.replay_timer.timeout.connect(self.check_replay)
+        
+        # 趋势数据保存定时器
+        self.trend_timer = QTimer()
+        self.trend_timer.timeout.connect(lambda: self.save_trends(background=True))
+        self.trend_timer.start(TREND_SAVE_INTERVAL * 1000)
+        
         # 初始化时间显示
         self.update_time()
+        
+        # 窗口图标资源在主窗口显示后再加载
+        QTimer.singleShot(0, self.load_resources)
 
     def create_info_panel(self):
         # 创建顶部信息面板
@@ -412,18 +467,26 @@ class MainWindow(QMainWindow):
         
         # 添加连接状态
         connection_label = QLabel("连接状态: ")
-        self.connection_value = QLabel("已连接")
-        self.connection_value.setStyleSheet("font-weight: bold; color: green;")
+        # 启动时还没有连接，连接成功（点击"连接设备"或采集线程第一次读到数据）后才显示已连接
+        self.connection_value = QLabel("未连接")
+        self.connection_value.setStyleSheet("font-weight: bold; color: gray;")
         info_layout.addWidget(connection_label, 0, 2)
         info_layout.addWidget(self.connection_value, 0, 3)
         
         # 添加IP地址显示
         ip_label = QLabel("服务器IP: ")
-        ip_value = QLabel("192.168.0.150:6789")
+        ip_value = QLabel(f"{DEVICE_HOST}:{DEVICE_PORT}")
         ip_value.setStyleSheet("font-weight: bold;")
         info_layout.addWidget(ip_label, 0, 4)
         info_layout.addWidget(ip_value, 0, 5)
-        
+
+        # 添加设备唤醒状态显示
+        device_state_label = QLabel("设备状态: ")
+        self.device_state_value = QLabel()
+        self.device_state_value.setStyleSheet("font-weight: bold;")
+        info_layout.addWidget(device_state_label, 1, 0)
+        info_layout.addWidget(self.device_state_value, 1, 1, 1, 5)
+
         # 添加数据面板
         data_panel = QGroupBox("监测数据")
         data_layout = QGridLayout()
@@ -459,10 +522,12 @@ class MainWindow(QMainWindow):
         content_splitter = QSplitter(Qt.Horizontal)
         
         # 创建左侧控制面板
-        control_panel = self.create_control_panel()
+        with profiler.measure("创建控制面板"):
+            control_panel = self.create_control_panel()
         
         # 创建右侧图表区域
-        chart_panel = self.create_chart_area()
+        with profiler.measure("创建图表区域"):
+            chart_panel = self.create_chart_area()
         
         # 添加到分割器
         content_splitter.addWidget(control_panel)
@@ -497,6 +562,57 @@ class MainWindow(QMainWindow):
         connection_group.setLayout(connection_layout)
         control_layout.addWidget(connection_group)
         
+        # 创建数据记录
+        record_group = QGroupBox("数据记录")
+        record_layout = QVBoxLayout()
+        
+        self.record_button = QPushButton("开始记录")
+        self.record_button.clicked.connect(self.toggle_recording)
+        record_layout.addWidget(self.record_button)
+        
+        export_button = QPushButton("导出数据")
+        export_button.clicked.connect(self.export_data)
+        record_layout.addWidget(export_button)
+        
+        history_button = QPushButton("历史回看")
+        history_button.clicked.connect(self.show_history)
+        record_layout.addWidget(history_button)
+        
+        trend_button = QPushButton("趋势图")
+        trend_button.clicked.connect(self.show_trend)
+        record_layout.addWidget(trend_button)
+        
+        record_group.setLayout(record_layout)
+        control_layout.addWidget(record_group)
+        
+        # 创建抓包与回放
+        capture_group = QGroupBox("抓包与回放")
+        capture_layout = QVBoxLayout()
+        
+        self.capture_check = QCheckBox("保存原始报文")
+        self.capture_check.toggled.connect(self.toggle_capture)
+        capture_layout.addWidget(self.capture_check)
+        
+        speed_layout = QHBoxLayout()
+        speed_layout.addWidget(QLabel("回放倍速:"))
+        self.replay_speed = QComboBox()
+        for name, speed in REPLAY_SPEEDS:
+            self.replay_speed.addItem(name, speed)
+        speed_layout.addWidget(self.replay_speed)
+        capture_layout.addLayout(speed_layout)
+        
+        self.replay_button = QPushButton("回放抓包...")
+        self.replay_button.clicked.connect(self.start_replay)
+        capture_layout.addWidget(self.replay_button)
+        
+        self.stop_replay_button = QPushButton("停止回放")
+        self.stop_replay_button.setEnabled(False)
+        self.stop_replay_button.clicked.connect(self.stop_replay)
+        capture_layout.addWidget(self.stop_replay_button)
+        
+        capture_group.setLayout(capture_layout)
+        control_layout.addWidget(capture_group)
+        
         # 创建显示设置
         display_group = QGroupBox("显示设置")
         display_layout = QVBoxLayout()
@@ -508,12 +624,44 @@ class MainWindow(QMainWindow):
         
         self.show_accumulated_prpd = QCheckBox("显示累加PRPD图")
         self.show_accumulated_prpd.setChecked(False)
+        self.show_accumulated_prpd.toggled.connect(self.toggle_accumulated_prpd)
         display_layout.addWidget(self.show_accumulated_prpd)
         
+        # 累加方式和累加帧数，累加帧数对滑动窗口为窗口长度，对指数衰减为半衰期
+        accumulate_layout = QHBoxLayout()
+        self.accumulate_mode = QComboBox()
+        for name, mode in PRPD_ACCUMULATE_MODES:
+            self.accumulate_mode.addItem(name, mode)
+        self.accumulate_mode.currentIndexChanged.connect(self.change_accumulate_settings)
+        accumulate_layout.addWidget(self.accumulate_mode)
+        self.accumulate_frames = QSpinBox()
+        self.accumulate_frames.setRange(5, 100000)
+        self.accumulate_frames.setValue(PRPD_ACCUMULATE_FRAMES)
+        self.accumulate_frames.setSuffix(" 帧")
+        self.accumulate_frames.valueChanged.connect(self.change_accumulate_settings)
+        accumulate_layout.addWidget(self.accumulate_frames)
+        display_layout.addLayout(accumulate_layout)
+        
         self.show_prps = QCheckBox("显示PRPS图")
         self.show_prps.setChecked(True)
         display_layout.addWidget(self.show_prps)
         
+        # 显示后端，轻量热图不经过 Matplotlib，适合高刷新率或多个面板同时显示
+        backend_layout = QHBoxLayout()
+        backend_layout.addWidget(QLabel("显示后端:"))
+        self.display_backend = QComboBox()
+        for name, backend in DISPLAY_BACKENDS:
+            self.display_backend.addItem(name, backend)
+        self.display_backend.setCurrentIndex(self.display_backend.findData(DISPLAY_BACKEND))
+        self.display_backend.currentIndexChanged.connect(self.change_display_backend)
+        backend_layout.addWidget(self.display_backend)
+        display_layout.addLayout(backend_layout)
+        
+        self.verbose_decode = QCheckBox("输出寄存器调试日志")
+        self.verbose_decode.setChecked(False)
+        self.verbose_decode.toggled.connect(self.toggle_verbose_decode)
+        display_layout.addWidget(self.verbose_decode)
+        
         # self.show_reference = QCheckBox("显示参考波形")
         # self.show_reference.setChecked(True)
         # display_layout.addWidget(self.show_reference)
@@ -536,6 +684,32 @@ class MainWindow(QMainWindow):
         self.refresh_rate.valueChanged.connect(self.change_refresh_rate)
         refresh_layout.addWidget(self.refresh_rate)
         
+        render_fps_label = QLabel("最大绘图帧率 (FPS):")
+        refresh_layout.addWidget(render_fps_label)
+        
+        self.render_fps = QSpinBox()
+        self.render_fps.setRange(1, 60)
+        self.render_fps.setValue(RENDER_MAX_FPS)
+        self.render_fps.valueChanged.connect(self.change_render_fps)
+        refresh_layout.addWidget(self.render_fps)
+        
+        # 按放电活动自动调整采集周期，设备安静时降低轮询频率
+        self.adaptive_checkbox = QCheckBox("自适应刷新")
+        self.adaptive_checkbox.setToolTip(
+            f"检测到放电时按 {ADAPTIVE_MIN_INTERVAL} ms 采集，安静时逐步放慢到 {ADAPTIVE_MAX_INTERVAL} ms")
+        self.adaptive_checkbox.toggled.connect(self.toggle_adaptive_refresh)
+        refresh_layout.addWidget(self.adaptive_checkbox)
+        
+        pipeline_label = QLabel("流水线请求数:")
+        refresh_layout.addWidget(pipeline_label)
+        
+        # 每次读取连续发送的请求数，设备支持时可减少往返等待
+        self.pipeline_depth = QSpinBox()
+        self.pipeline_depth.setRange(1, 8)
+        self.pipeline_depth.setValue(session.pipeline_depth)
+        self.pipeline_depth.valueChanged.connect(self.change_pipeline_depth)
+        refresh_layout.addWidget(self.pipeline_depth)
+        
         # 设置刷新率组
         refresh_group.setLayout(refresh_layout)
         control_layout.addWidget(refresh_group)
@@ -604,17 +778,18 @@ class MainWindow(QMainWindow):
         prpd_container = QWidget()
         prpd_layout = QVBoxLayout()
         
-        # 创建自定义画布
-        self.canvas = MplCanvas(self, width=10, height=6, dpi=100)
-        self.ax1 = self.canvas.ax1
-        self.ax2 = self.canvas.ax2
-        
-        # 创建工具栏
-        self.toolbar = NavigationToolbar(self.canvas, self)
-        
-        # 添加到PRPD布局
-        prpd_layout.addWidget(self.toolbar)
-        prpd_layout.addWidget(self.canvas)
+        # 两种显示后端各占一页，切换时只切换页面；Matplotlib 画布在主窗口显示后再创建，见 create_canvas
+        self.chart_stack = QStackedWidget()
+        canvas_page = QWidget()
+        self.prpd_layout = QVBoxLayout(canvas_page)
+        self.prpd_layout.setContentsMargins(0, 0, 0, 0)
+        self.canvas = None
+        self.heatmap_panel = HeatmapPanel(prps_cycles=PRPS_CYCLES)
+        self.chart_stack.addWidget(canvas_page)
+        self.chart_stack.addWidget(self.heatmap_panel)
+        prpd_layout.addWidget(self.chart_stack)
+        # 当前用于绘图的后端，接口相同：MplCanvas 或 HeatmapPanel
+        self.chart_view = None
         
         # 添加日志区域
         log_group = QGroupBox("系统日志")
@@ -638,8 +813,22 @@ class MainWindow(QMainWindow):
         self.auto_scroll.setChecked(True)
         log_toolbar.addWidget(self.auto_scroll)
         
+        # 添加日志级别选择
+        log_toolbar.addWidget(QLabel("日志级别:"))
+        self.log_level = QComboBox()
+        for name, level in [("调试", logging.DEBUG), ("信息", logging.INFO),
+                            ("警告", logging.WARNING), ("错误", logging.ERROR)]:
+            self.log_level.addItem(name, level)
+        self.log_level.setCurrentIndex(self.log_level.findData(self.log_sink.level))
+        self.log_level.currentIndexChanged.connect(self.change_log_level)
+        log_toolbar.addWidget(self.log_level)
+        
         log_toolbar.addStretch()
         
+        # 添加日志统计
+        self.log_stats = QLabel()
+        log_toolbar.addWidget(self.log_stats)
+        
         # 添加日志工具栏到布局
         log_layout.addLayout(log_toolbar)
         
@@ -666,111 +855,177 @@ class MainWindow(QMainWindow):
         
         return chart_panel
 
+    def load_resources(self):
+        # 设置窗口图标
+        with profiler.measure("import resources_rc"):
+            import resources_rc
+        self.setWindowIcon(QIcon(':images/GIS_PD.ico'))
+        profiler.mark("主窗口显示 (距启动)")
+        
+        # 窗口绘制完成后再创建图表画布
+        QTimer.singleShot(0, self.create_canvas)
+
+    def create_canvas(self):
+        with profiler.measure("import gis_canvas (matplotlib)"):
+            from gis_canvas import MplCanvas, NavigationToolbar
+        
+        # 创建自定义画布
+        with profiler.measure("创建Matplotlib画布"):
+            self.canvas = MplCanvas(self, width=10, height=6, dpi=100, prps_cycles=PRPS_CYCLES)
+        self.ax1 = self.canvas.ax1
+        self.ax2 = self.canvas.ax2
+        
+        # 创建工具栏
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        
+        # 添加到PRPD布局
+        self.prpd_layout.addWidget(self.toolbar)
+        self.prpd_layout.addWidget(self.canvas)
+        self.change_display_backend()
+        profiler.report()
+
     def update_time(self):
         current_time = QDateTime.currentDateTime().toString('yyyy-MM-dd hh:mm:ss')
         self.time_value.setText(current_time)
+        self.update_device_state()
+
+    def update_device_state(self):
+        # 显示设备唤醒状态和唤醒统计
+        state_names = {
+            DeviceSession.AWAKE: '已唤醒',
+            DeviceSession.IDLE_TIMEOUT: '空闲超时',
+            DeviceSession.ASLEEP: '休眠',
+        }
+        metrics = session.metrics()
+        self.device_state_value.setText(
+            f"{state_names[metrics['state']]}  |  唤醒次数: {metrics['wake_count']}  "
+            f"超时: {metrics['wake_timeouts']}  "
+            f"最近唤醒耗时: {metrics['last_wake_latency']:.2f}s  "
+            f"平均唤醒耗时: {metrics['avg_wake_latency']:.2f}s  "
+            f"读取失败: {metrics['failed_reads']}/{metrics['read_count']}  "
+            f"丢弃迟到帧: {metrics['mismatched_frames']}  |  "
+            f"采集耗时: {self.acquisition.last_latency * 1000:.0f}ms  "
+            f"采集周期: {self.scheduler.metrics()['interval'] * 1000:.0f}ms  "
+            f"丢弃节拍: {self.scheduler.overdue_ticks}  |  "
+            f"采集帧数: {self.acquisition.frame_count}  "
+            f"绘图次数: {self.frames_rendered}  "
+            f"未单独绘制: {self.frames_skipped}")
+        if (self.connection_value.text() == "未连接" and self.connection_job is None
+                and self.acquisition.frame_count):
+            # 采集线程在第一次读取时自动连接，读到数据说明已连接
+            self.connection_value.setText("已连接")
+            self.connection_value.setStyleSheet("font-weight: bold; color: green;")
+
+    def process_live_frame(self, frame):
+        """
+        在采集线程中处理实时采集的每一帧：汇总趋势，记录中时追加到记录缓冲区并放入段文件写入队列。
+        回放的帧由回放线程采集，不经过这里，不会并入实时设备的趋势和记录。
+        """
+        has_data = len(frame.phase_values) > 0
+        discharge_counts_sum = int(frame.discharge_counts.sum())
+        # 趋势按帧汇总放电次数总和和幅值最大值（与LCD显示相同，没有放电点时幅值为0）
+        self.trends.add(self.trend_device, frame.timestamp_ns, discharge_counts_sum,
+                        float(frame.uhf_db_values.max()) if has_data else 0.0)
+        if not has_data:
+            return
+        # 按列追加整帧数据，时间字符串在导出时再格式化
+        with self.record_lock:
+            if not self.recording:
+                return
+            self.recorder.append(frame.timestamp_ns, frame.phase_values, frame.uhf_db_values, discharge_counts_sum)
+            self.segment_writer.write(frame)
+
+    def process_replay_frame(self, frame):
+        """在回放线程中处理回放的每一帧：记录中时写入回放记录，带有抓包时的时间，不计入实时设备的趋势"""
+        if not len(frame.phase_values):
+            return
+        with self.record_lock:
+            if not self.recording or self.replay_writer is None:
+                return
+            self.recorder.append(frame.timestamp_ns, frame.phase_values, frame.uhf_db_values,
+                                 int(frame.discharge_counts.sum()), device=self.replay_device)
+            self.replay_writer.write(frame)
+
+    def ingest_frame(self, frame):
+        """把一帧写入PRPS缓冲和累加PRPD直方图，只用于显示"""
+        # 当前帧作为一个周期写入PRPS滚动缓冲
+        self.prps_buffer.push(frame.phase_values, frame.uhf_db_values)
+        # 累加PRPD直方图，每帧只更新固定大小的计数数组
+        if len(frame.phase_values):
+            self.prpd_histogram.add(frame.phase_values, frame.uhf_db_values)
 
     def update_plot(self):
+        if self.chart_view is None:
+            return
         try:
-            # 调用原始的read_data函数，输出会被重定向到日志区域
-            read_data(client)
-            discharge_counts_sum = sum(discharge_counts)
-            uhf_db_max = max(uhf_db_values) if uhf_db_values else 0.0
-            print(f"放电次数总和: {discharge_counts_sum}")
-            print(f"uhf_db最大值: {uhf_db_max}")
+            # 取出上次绘图之后采集到的所有帧，逐帧更新显示用的累加数据，但只按最新一帧绘图；
+            # 被覆盖的帧只影响显示，记录和趋势已在采集线程中处理
+            frames, lost = self.frame_buffer.frames_since(self.last_frame_seq)
+            self.frames_skipped += lost
+            if not frames:
+                return
+            for frame in frames:
+                self.ingest_frame(frame)
+            frame = frames[-1]
+            self.last_frame_seq = frame.seq
+            
+            # 窗口最小化或图表不可见时不绘图
+            if self.isMinimized() or not self.chart_view.isVisible():
+                self.frames_skipped += len(frames)
+                return
+            self.frames_skipped += len(frames) - 1
+            self.frames_rendered += 1
+            
+            discharge_counts = frame.discharge_counts
+            uhf_db_values = frame.uhf_db_values
+            phase_values = frame.phase_values
+            has_data = len(phase_values) > 0
+            discharge_counts_sum = int(discharge_counts.sum())
+            uhf_db_max = float(uhf_db_values.max()) if has_data else 0.0
 
             # 更新LCD显示
             self.discharge_lcd.display(discharge_counts_sum)
             self.uhf_db_lcd.display(f"{uhf_db_max:.2f}")
 
-            # 如果正在记录，添加数据
-            if self.recording and phase_values and uhf_db_values:
-                current_time = QDateTime.currentDateTime().toString('yyyy-MM-dd hh:mm:ss')
-                for i in range(min(len(phase_values), len(uhf_db_values))):
-                    self.record_data.append({
-                        '时间': current_time,
-                        '相位': phase_values[i],
-                        '幅值': uhf_db_values[i],
-                        '放电次数': discharge_counts_sum
-                    })
-
-            # 更新PRPD图
-            if self.show_prpd.isChecked():
-                self.ax1.clear()
-                # 重新设置PRPD图的基本显示信息
-                self.canvas.setup_prpd_plot()
-                
-                # 如果存在之前的colorbar，先移除它
-                if hasattr(self.canvas, 'colorbar') and self.canvas.colorbar is not None:
-                    try:
-                        self.canvas.colorbar.remove()
-                    except:
-                        pass  # 如果移除失败，忽略错误
-                    self.canvas.colorbar = None
-                
-                if phase_values and uhf_db_values:
-                    # 更新历史数据
-                    if self.show_accumulated_prpd.isChecked():
-                        # 添加新数据到历史记录
-                        self.prpd_history.append((phase_values.copy(), uhf_db_values.copy()))
-                        # 保持历史记录在指定长度内
-                        if len(self.prpd_history) > self.max_history:
-                            self.prpd_history.pop(0)
-                        
-                        # 合并所有历史数据
-                        all_phases = []
-                        all_uhf_dbs = []
-                        for hist_phase, hist_uhf in self.prpd_history:
-                            all_phases.extend(hist_phase)
-                            all_uhf_dbs.extend(hist_uhf)
-                        
-                        # 绘制累加的散点图
-                        scatter = self.ax1.scatter(all_phases, all_uhf_dbs, c=all_uhf_dbs, 
-                                                 cmap='viridis', alpha=0.7, s=50, edgecolors='w')
-                        # 更新标题显示累加次数
-                        self.ax1.set_title(f'PRPD图 (相位分辨局部放电) - 累加模式 ({len(self.prpd_history)}次)', 
-                                         fontsize=14, fontweight='bold')
-                    else:
-                        # 清空历史数据
-                        self.prpd_history = []
-                        # 只绘制当前数据
-                        scatter = self.ax1.scatter(phase_values, uhf_db_values, c=uhf_db_values, 
-                                                 cmap='viridis', alpha=0.7, s=50, edgecolors='w')
-                    
-                    # 使用固定位置创建colorbar，避免挤压主图
-                    divider = make_axes_locatable(self.ax1)
-                    cax = divider.append_axes("right", size="5%", pad=0.05)
-                    self.canvas.colorbar = self.canvas.fig.colorbar(scatter, cax=cax, label='幅值 (dB)')
-                
-            # 更新PRPS图
+            # 更新PRPS图，瀑布图只替换图像数据
             if self.show_prps.isChecked():
-                self.ax2.clear()
-                # 重新设置PRPS图的基本显示信息
-                self.canvas.setup_prps_plot()
-                
-                if phase_values and uhf_db_values:
-                    colors = plt.cm.viridis(np.array(uhf_db_values) / max(uhf_db_values) if max(uhf_db_values) > 0 else 0)
-                    self.ax2.bar3d(
-                        phase_values, 
-                        np.arange(len(phase_values)) % 50, 
-                        np.zeros(len(uhf_db_values)), 
-                        5, 1, uhf_db_values, 
-                        shade=True, 
-                        color=colors,
-                        alpha=0.8
-                    )
+                self.chart_view.update_prps(self.prps_buffer.view())
             
-            # 调整图表布局，使用固定的布局比例
-            self.canvas.fig.tight_layout()
-            # 确保两个子图的宽度比例保持不变
-            self.canvas.fig.subplots_adjust(wspace=0.3)  # 增加子图之间的间距
-            self.canvas.draw()
+            # 更新PRPD图，只替换散点或密度图像的数据，坐标轴和颜色条保持不变
+            if self.show_prpd.isChecked():
+                if self.show_accumulated_prpd.isChecked():
+                    self.chart_view.update_prpd_density(self.prpd_histogram.density(),
+                                                        f'累加模式 ({self.prpd_histogram.frames}帧)')
+                else:
+                    self.chart_view.update_prpd(phase_values, uhf_db_values)
         except Exception as e:
             import traceback
             print(f"更新图表时发生错误: {str(e)}")
             print(traceback.format_exc())
             self.status_bar.showMessage(f"更新图表时发生错误: {str(e)}")
     
+    def flush_log(self):
+        # 把缓冲区中的日志一次性追加到文本区域
+        lines = self.log_sink.drain()
+        if lines:
+            scrollbar = self.log_text.verticalScrollBar()
+            position = scrollbar.value()
+            cursor = QTextCursor(self.log_text.document())
+            cursor.movePosition(QTextCursor.End)
+            if not self.log_text.document().isEmpty():
+                cursor.insertBlock()
+            cursor.insertText("\n".join(lines))
+            if self.auto_scroll.isChecked():
+                scrollbar.setValue(scrollbar.maximum())
+            else:
+                scrollbar.setValue(position)
+        self.log_stats.setText(f"已写入: {self.log_sink.written}  丢弃: {self.log_sink.dropped}  "
+                               f"过滤: {self.log_sink.suppressed}")
+
+    def change_log_level(self, index):
+        self.log_sink.level = self.log_level.itemData(index)
+        self.status_bar.showMessage(f"日志级别已更新为 {self.log_level.currentText()}")
+
     # 数据视图相关功能已移除
     def clear_log(self):
         # 清空日志
@@ -791,65 +1046,444 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, "保存错误", f"保存日志时发生错误: {str(e)}")
 
     def connect_device(self):
-        try:
-            if not client.connect():
-                client.close()
-                client.connect()
-            self.connection_value.setText("已连接")
-            self.connection_value.setStyleSheet("font-weight: bold; color: green;")
-            self.status_bar.showMessage("设备连接成功")
-        except Exception as e:
-            self.connection_value.setText("连接失败")
-            self.connection_value.setStyleSheet("font-weight: bold; color: red;")
-            self.status_bar.showMessage(f"设备连接失败: {str(e)}")
+        # 连接（含唤醒等待）在采集线程中执行，界面不等待
+        if self.connection_job is not None:
+            self.status_bar.showMessage("正在连接或断开设备，请稍候")
+            return
+        self.connection_value.setText("连接中...")
+        self.connection_value.setStyleSheet("font-weight: bold; color: orange;")
+        self.connection_job = ('connect', self.acquisition.call(connect_session))
+        self.connection_timer.start(100)
 
     def disconnect_device(self):
-        try:
-            client.close()
+        if self.connection_job is not None:
+            self.status_bar.showMessage("正在连接或断开设备，请稍候")
+            return
+        # 先暂停采集，关闭操作在当前读取结束后执行
+        self.acquisition.pause()
+        self.connection_job = ('disconnect', self.acquisition.call(session.close))
+        self.connection_timer.start(100)
+
+    def check_connection(self):
+        action, command = self.connection_job
+        if not command.done:
+            return
+        self.connection_timer.stop()
+        self.connection_job = None
+        if action == 'disconnect':
+            if command.error is not None:
+                self.status_bar.showMessage(f"断开连接失败: {str(command.error)}")
+                return
             self.connection_value.setText("已断开")
             self.connection_value.setStyleSheet("font-weight: bold; color: red;")
             self.status_bar.showMessage("设备已断开连接")
-        except Exception as e:
-            self.status_bar.showMessage(f"断开连接失败: {str(e)}")
+        elif command.error is not None:
+            self.connection_value.setText("连接失败")
+            self.connection_value.setStyleSheet("font-weight: bold; color: red;")
+            self.status_bar.showMessage(f"设备连接失败: {str(command.error)}")
+        else:
+            if self.replay_worker is not None:
+                # 回放期间不恢复实时采集，回放结束后恢复
+                self.replay_resume_live = True
+            else:
+                self.acquisition.resume()
+            self.connection_value.setText("已连接")
+            self.connection_value.setStyleSheet("font-weight: bold; color: green;")
+            self.status_bar.showMessage("设备连接成功")
 
     def toggle_recording(self):
         if not self.recording:
-            self.recording = True
             self.record_button.setText("停止记录")
             self.record_button.setStyleSheet("background-color: #e74c3c; color: white;")
-            self.record_data = []
+            # 同时写入磁盘，写入线程启动时会修复上次异常退出留下的段文件
+            writer = self.create_segment_writer(os.path.join(RECORD_DIR, f"{DEVICE_HOST}_{DEVICE_PORT}"),
+                                                f"{DEVICE_HOST}:{DEVICE_PORT}", decoder.plan.group_count,
+                                                previous=self.segment_writer)
+            with self.record_lock:
+                self.recorder.clear()
+                self.segment_writer = writer
+                self.recording = True
+            if self.replay_worker is not None:
+                self.start_replay_recording()
             self.status_bar.showMessage("开始记录数据...")
         else:
-            self.recording = False
+            with self.record_lock:
+                self.recording = False
             self.record_button.setText("开始记录")
             self.record_button.setStyleSheet("")
-            self.status_bar.showMessage(f"数据记录已停止，共记录 {len(self.record_data)} 条数据")
+            # 写入线程在后台写完剩余数据后关闭文件，界面不等待
+            self.segment_writer.stop()
+            replay_writer = self.stop_replay_recording()
+            message = f"数据记录已停止，共记录 {len(self.recorder)} 条数据，已写入 {self.segment_writer.directory}"
+            if replay_writer is not None:
+                message += f"，回放数据写入 {replay_writer.directory}"
+            if self.segment_writer.error is not None:
+                message += f"（写入磁盘失败: {self.segment_writer.error}）"
+            if self.segment_writer.dropped:
+                message += f"（磁盘写入跟不上，{self.segment_writer.dropped} 帧未写入磁盘）"
+            if self.recorder.dropped:
+                message += f"（超出 {RECORD_MEMORY_BUDGET_MB} MB 内存上限，最早的 {self.recorder.dropped} 条已丢弃）"
+            self.status_bar.showMessage(message)
+
+    def create_segment_writer(self, directory, device, group_count, previous=None):
+        """
+        创建并启动段文件写入线程。previous 为同一目录上一次的写入线程，可能还在写队列中剩余的帧，
+        新线程等它写完后再修复和编号段文件；修复结果由 check_segment_writers 在状态栏提示
+        """
+        writer = SegmentWriter(directory, device=device, group_count=group_count,
+                               max_segment_bytes=RECORD_SEGMENT_MB * 1024 * 1024,
+                               max_segment_seconds=RECORD_SEGMENT_SECONDS, previous=previous)
+        writer.start()
+        self.unchecked_writers.append(writer)
+        self.record_check_timer.start(100)
+        return writer
+
+    def check_segment_writers(self):
+        # 写入线程修复完上次的段文件后，在开始记录时就提示无法写入磁盘或已隔离损坏的段文件
+        for writer in list(self.unchecked_writers):
+            if not writer.ready.is_set():
+                continue
+            self.unchecked_writers.remove(writer)
+            if writer.error is not None:
+                self.status_bar.showMessage(f"记录目录 {writer.directory} 无法写入，本次记录只保存在内存中: {writer.error}")
+            elif writer.quarantined:
+                self.status_bar.showMessage(f"上次的段文件 {writer.quarantined[-1][0]} 已损坏，已改名保留，"
+                                            f"记录数据写入新的段文件")
+        if not self.unchecked_writers:
+            self.record_check_timer.stop()
+
+    def start_replay_recording(self):
+        """回放期间记录时，回放的帧写入单独的 RECORD_DIR/replay_<抓包文件名> 目录，内存中的记录以该名称作为设备"""
+        directory = os.path.join(RECORD_DIR, self.replay_device)
+        writer = self.create_segment_writer(directory, self.replay_device, self.replay.decoder.group_count,
+                                            previous=self.replay_writers.get(directory))
+        self.replay_writers[directory] = writer
+        with self.record_lock:
+            self.replay_writer = writer
+
+    def stop_replay_recording(self):
+        """停止写入回放记录，返回停止的写入线程（没有在写入时返回 None）"""
+        with self.record_lock:
+            writer, self.replay_writer = self.replay_writer, None
+        if writer is not None:
+            writer.stop()
+        return writer
+
+    def toggle_capture(self, checked):
+        if checked:
+            path = os.path.join(CAPTURE_DIR, f"capture_{datetime.now().strftime('%Y%m%d_%H%M%S')}.gcap")
+            try:
+                os.makedirs(CAPTURE_DIR, exist_ok=True)
+                session.capture = CaptureWriter(path, model=decoder.plan.model)
+            except OSError as e:
+                self.capture_check.setChecked(False)
+                self.status_bar.showMessage(f"创建抓包文件失败: {str(e)}")
+                return
+            self.status_bar.showMessage(f"开始保存原始报文到 {path}")
+        elif session.capture is not None:
+            capture, session.capture = session.capture, None
+            capture.close()
+            self.status_bar.showMessage(f"已保存 {capture.frames} 帧原始报文到 {capture.path}")
+
+    def replay_room(self):
+        """环形缓冲区中还可以写入而不覆盖未绘图帧的数量，回放线程据此等待界面跟上"""
+        return self.frame_buffer.capacity - (self.frame_buffer.seq - 1 - self.last_frame_seq)
+
+    def start_replay(self):
+        if self.replay_worker is not None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "选择抓包文件", CAPTURE_DIR, "抓包文件 (*.gcap)")
+        if not path:
+            return
+        speed = self.replay_speed.currentData()
+        try:
+            self.replay = ReplaySource(path, speed=speed, batch=self.frame_buffer.capacity, ready=self.replay_room)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "回放错误", f"读取抓包文件失败: {str(e)}")
+            return
+        if self.replay.decoder.group_count > self.frame_buffer.group_count:
+            # 回放与实时采集共用环形缓冲区，缓冲区按当前寄存器表的组数分配
+            QMessageBox.critical(self, "回放错误",
+                                 f"抓包文件的寄存器表 {self.replay.model} 有 {self.replay.decoder.group_count} 组，"
+                                 f"超过当前寄存器表 {decoder.plan.model} 的 {self.frame_buffer.group_count} 组")
+            self.replay = None
+            return
+        # 回放帧经过与实时采集相同的环形缓冲区、记录和绘图流程，回放期间暂停实时采集；
+        # 回放的帧带有抓包时的时间，记录中时写入单独的回放记录，不与实时记录混在一起
+        self.replay_device = f"replay_{os.path.splitext(os.path.basename(path))[0]}"
+        self.replay_resume_live = not self.acquisition.paused
+        self.acquisition.pause()
+        if self.recording:
+            self.start_replay_recording()
+        self.replay_worker = AcquisitionWorker(self.replay.read_frames, self.replay.decoder, self.frame_buffer,
+                                               scheduler=PollScheduler(REPLAY_POLL_INTERVAL),
+                                               on_frame=self.process_replay_frame)
+        self.replay_worker.start()
+        if not speed:
+            # 尽快回放时绘图定时器不再限速，测量整条处理流程的吞吐量
+            self.timer.start(0)
+        self.replay_timer.start(200)
+        self.replay_button.setEnabled(False)
+        self.stop_replay_button.setEnabled(True)
+        self.status_bar.showMessage(f"正在回放 {os.path.basename(path)}（{len(self.replay.records)} 帧，"
+                                    f"{self.replay_speed.currentText()}）...")
+
+    def check_replay(self):
+        if self.replay is not None and self.replay.finished:
+            self.stop_replay()
+
+    def stop_replay(self):
+        if self.replay_worker is None:
+            return
+        self.replay_worker.stop(timeout=1.0)
+        self.replay_timer.stop()
+        self.timer.start(1000 // self.render_fps.value())
+        replay = self.replay
+        if replay.finished:
+            elapsed = replay.elapsed
+        else:
+            elapsed = time.monotonic() - replay.started if replay.started is not None else 0.0
+        frames = self.replay_worker.frame_count
+        self.replay_worker = None
+        self.replay = None
+        if self.replay_resume_live:
+            self.acquisition.resume()
+        replay_writer = self.stop_replay_recording()
+        self.replay_button.setEnabled(True)
+        self.stop_replay_button.setEnabled(False)
+        rate = f"，{frames / elapsed:.0f} 帧/秒" if elapsed > 0 else ""
+        recorded = f"，已记录到 {replay_writer.directory}" if replay_writer is not None else ""
+        self.status_bar.showMessage(f"回放{'完成' if replay.finished else '已停止'}：{frames} 帧，"
+                                    f"耗时 {elapsed:.2f} s{rate}{recorded}")
 
     def export_data(self):
-        if not self.record_data:
+        if self.export_job is not None:
+            QMessageBox.information(self, "正在导出", "上一次导出尚未完成，请稍候")
+            return
+        if not len(self.recorder):
             QMessageBox.warning(self, "导出失败", "没有可导出的数据，请先记录数据")
             return
             
-        file_name, _ = QFileDialog.getSaveFileName(self, "导出数据", 
-                                                  f"GIS局放数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", 
-                                                  "CSV文件 (*.csv)")
-        if file_name:
-            try:
-                with open(file_name, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                    fieldnames = ['时间', '相位', '幅值', '放电次数']
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    for data in self.record_data:
-                        writer.writerow(data)
-                self.status_bar.showMessage(f"数据已成功导出到 {file_name}")
-            except Exception as e:
-                QMessageBox.critical(self, "导出错误", f"导出数据时发生错误: {str(e)}")
+        filters = [f"{name} (*{extension})" for name, extension in EXPORT_FORMATS.values()]
+        file_name, selected = QFileDialog.getSaveFileName(self, "导出数据", 
+                                                         f"GIS局放数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", 
+                                                         ";;".join(filters))
+        if not file_name:
+            return
+        fmt = list(EXPORT_FORMATS)[filters.index(selected)] if selected in filters else 'csv'
+        extension = EXPORT_FORMATS[fmt][1]
+        if fmt != 'csv' and file_name.lower().endswith('.csv'):
+            file_name = file_name[:-len('.csv')]
+        if not file_name.lower().endswith(extension):
+            file_name += extension
+        
+        # 导出当前数据的快照，导出期间可以继续记录
+        with self.record_lock:
+            blocks, devices = self.recorder.blocks(), list(self.recorder.devices)
+        self.export_job = ExportJob(blocks, file_name, fmt, devices)
+        self.export_progress = QProgressDialog("正在导出数据...", "取消", 0, 1000, self)
+        self.export_progress.setWindowTitle("导出数据")
+        self.export_progress.setMinimumDuration(500)
+        self.export_progress.canceled.connect(self.export_job.cancel)
+        self.export_job.start()
+        self.export_timer.start(100)
+
+    def check_export(self):
+        # 刷新导出进度，导出结束后显示结果
+        job = self.export_job
+        if job.total_rows:
+            self.export_progress.setValue(min(job.rows_done * 1000 // job.total_rows, 999))
+        if not job.done:
+            return
+        self.export_timer.stop()
+        self.export_progress.reset()
+        self.export_job = None
+        if isinstance(job.error, ExportCancelled):
+            self.status_bar.showMessage("数据导出已取消")
+        elif job.error is not None:
+            QMessageBox.critical(self, "导出错误", f"导出数据时发生错误: {str(job.error)}")
+        else:
+            self.status_bar.showMessage(f"数据已成功导出到 {job.path}（{job.total_rows} 条，耗时 {job.elapsed:.1f} 秒）")
+
+    def show_history(self):
+        """按时间范围回看记录目录中的历史数据，显示该时段的累加PRPD图和最后的PRPS图"""
+        store = HistoryStore(RECORD_DIR)
+        devices = store.devices()
+        if not devices:
+            QMessageBox.information(self, "历史回看", f"{RECORD_DIR} 目录中还没有记录的数据")
+            return
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("历史回看")
+        dialog.resize(1000, 560)
+        layout = QVBoxLayout(dialog)
+        query_layout = QHBoxLayout()
+        device_combo = QComboBox()
+        device_combo.addItems(devices)
+        query_layout.addWidget(QLabel("设备:"))
+        query_layout.addWidget(device_combo)
+        start_edit = QDateTimeEdit()
+        end_edit = QDateTimeEdit()
+        for edit in (start_edit, end_edit):
+            edit.setDisplayFormat('yyyy-MM-dd hh:mm:ss')
+            edit.setCalendarPopup(True)
+        query_layout.addWidget(QLabel("开始:"))
+        query_layout.addWidget(start_edit)
+        query_layout.addWidget(QLabel("结束:"))
+        query_layout.addWidget(end_edit)
+        query_button = QPushButton("查询")
+        query_layout.addWidget(query_button)
+        query_layout.addStretch()
+        layout.addLayout(query_layout)
+        panel = HeatmapPanel(prps_cycles=PRPS_CYCLES)
+        panel.set_prpd_accumulated(True)
+        layout.addWidget(panel, 1)
+        result_label = QLabel()
+        layout.addWidget(result_label)
+        
+        def select_device():
+            # 默认查询该设备最后5分钟的记录
+            store.refresh(device_combo.currentText())
+            time_range = store.time_range(device_combo.currentText())
+            if time_range is not None:
+                end = QDateTime.fromMSecsSinceEpoch(time_range[1] // 1_000_000 + 1000)
+                end_edit.setDateTime(end)
+                start_edit.setDateTime(end.addSecs(-300))
+        
+        def query():
+            started = time.perf_counter()
+            results = store.query(device_combo.currentText(),
+                                  start_edit.dateTime().toMSecsSinceEpoch() * 1_000_000,
+                                  end_edit.dateTime().toMSecsSinceEpoch() * 1_000_000)
+            points = store.points(results)
+            histogram = PrpdHistogram(mode='all')
+            histogram.add(points['phase'], points['uhf_db'])
+            prps = PrpsBuffer(PRPS_CYCLES)
+            for records in results[-PRPS_CYCLES:]:
+                for record in records[-PRPS_CYCLES:]:
+                    prps.push(record['phase'][:record['size']], record['uhf_db'][:record['size']])
+            frames = sum(len(records) for records in results)
+            panel.update_prpd_density(histogram.density(), f'{frames}帧')
+            panel.update_prps(prps.view())
+            result_label.setText(f"查询到 {frames} 帧、{len(points['phase'])} 个放电点，"
+                                 f"耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+        
+        device_combo.currentIndexChanged.connect(select_device)
+        query_button.clicked.connect(query)
+        select_device()
+        query()
+        dialog.show()
+
+    def save_trends(self, background=False):
+        try:
+            self.trends.save(background)
+        except OSError as e:
+            print(f"保存趋势数据失败: {e}")
+
+    def show_trend(self):
+        """显示放电次数和幅值的趋势，按时间范围自动选择秒、分钟或小时级的汇总数据，打开期间每秒刷新"""
+        devices = self.trends.devices()
+        if not devices:
+            QMessageBox.information(self, "趋势图", "还没有趋势数据")
+            return
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("趋势图")
+        dialog.resize(1000, 600)
+        layout = QVBoxLayout(dialog)
+        query_layout = QHBoxLayout()
+        device_combo = QComboBox()
+        device_combo.addItems(devices)
+        if self.trend_device in devices:
+            device_combo.setCurrentText(self.trend_device)
+        query_layout.addWidget(QLabel("设备:"))
+        query_layout.addWidget(device_combo)
+        span_combo = QComboBox()
+        for name, span in TREND_SPANS:
+            span_combo.addItem(name, span)
+        query_layout.addWidget(QLabel("时间范围:"))
+        query_layout.addWidget(span_combo)
+        query_layout.addStretch()
+        layout.addLayout(query_layout)
+        panel = TrendPanel()
+        layout.addWidget(panel, 1)
+        result_label = QLabel()
+        layout.addWidget(result_label)
+        level_names = {'second': '秒', 'minute': '分钟', 'hour': '小时'}
+        
+        def refresh():
+            started = time.perf_counter()
+            end = time.time()
+            start = end - span_combo.currentData()
+            level, rows = self.trends.query(device_combo.currentText(), start, end)
+            panel.set_trend(rows, level.width, (start, end))
+            result_label.setText(f"按{level_names.get(level.name, level.name)}汇总，{len(rows)} 个时间桶，"
+                                 f"共 {int(rows['count'].sum())} 帧，查询耗时 {(time.perf_counter() - started) * 1000:.1f} ms")
+        
+        device_combo.currentIndexChanged.connect(refresh)
+        span_combo.currentIndexChanged.connect(refresh)
+        timer = QTimer(dialog)
+        timer.timeout.connect(refresh)
+        timer.start(1000)
+        dialog.finished.connect(timer.stop)
+        refresh()
+        dialog.show()
+
+    def toggle_accumulated_prpd(self, checked):
+        if self.chart_view is not None:
+            self.chart_view.set_prpd_accumulated(checked)
+
+    def change_display_backend(self, _=None):
+        # Matplotlib 画布创建之前不切换，create_canvas 完成后会再调用一次
+        if self.canvas is None:
+            return
+        backend = self.display_backend.currentData()
+        self.chart_view = self.heatmap_panel if backend == 'heatmap' else self.canvas
+        self.chart_stack.setCurrentIndex(1 if backend == 'heatmap' else 0)
+        self.chart_view.set_prpd_accumulated(self.show_accumulated_prpd.isChecked())
+        self.status_bar.showMessage(f"显示后端已切换为 {self.display_backend.currentText()}")
+
+    def change_accumulate_settings(self, _=None):
+        # 修改累加方式或帧数后重新开始累加
+        mode = self.accumulate_mode.currentData()
+        frames = self.accumulate_frames.value()
+        self.prpd_histogram.mode = mode
+        self.prpd_histogram.window = frames
+        self.prpd_histogram.decay = 0.5 ** (1.0 / frames)
+        self.prpd_histogram.clear()
+        self.status_bar.showMessage(f"累加方式已更新为 {self.accumulate_mode.currentText()}，{frames} 帧")
+
+    def toggle_verbose_decode(self, checked):
+        # 逐寄存器调试输出开销较大，仅在需要排查报文时开启
+        decoder.verbose = checked
+        # 寄存器调试输出为调试级别，开启时把日志级别降为调试，关闭时恢复（期间手动改过级别则不恢复）
+        if checked and self.log_sink.level > logging.DEBUG:
+            self.verbose_restore_level = self.log_sink.level
+            self.log_level.setCurrentIndex(self.log_level.findData(logging.DEBUG))
+        elif not checked and self.verbose_restore_level is not None:
+            if self.log_sink.level == logging.DEBUG:
+                self.log_level.setCurrentIndex(self.log_level.findData(self.verbose_restore_level))
+            self.verbose_restore_level = None
+        self.status_bar.showMessage("寄存器调试日志已开启" if checked else "寄存器调试日志已关闭")
 
     def change_refresh_rate(self, value):
-        self.timer.stop()
-        self.timer.start(value)
+        self.acquisition.interval = value / 1000
         self.status_bar.showMessage(f"刷新率已更新为 {value} 毫秒")
 
+    def change_render_fps(self, value):
+        self.timer.start(1000 // value)
+        self.status_bar.showMessage(f"最大绘图帧率已更新为 {value} FPS")
+
+    def toggle_adaptive_refresh(self, checked):
+        self.scheduler.adaptive = checked
+        self.scheduler.current_interval = self.scheduler.interval
+        self.scheduler.reset()
+        self.status_bar.showMessage("自适应刷新已开启" if checked else "自适应刷新已关闭")
+
+    def change_pipeline_depth(self, value):
+        session.pipeline_depth = value
+        self.status_bar.showMessage(f"流水线请求数已更新为 {value}")
+
     def show_about(self):
         QMessageBox.about(self, "关于系统", 
                          "GIS局放监测系统 v1.2\n\n"
@@ -859,6 +1493,7 @@ class MainWindow(QMainWindow):
         
     def check_api_connection(self):
         """检查API服务连接状态"""
+        import requests
         try:
             response = requests.get(self.api_url.replace('/api/v1/predict', '/docs'))
             if response.status_code == 200:
@@ -886,14 +1521,23 @@ class MainWindow(QMainWindow):
         if not self.check_api_connection():
             return
         
-        # 保存当前PRPD图像
         try:
-            # 获取当前图表并保存为图像
-            self.canvas.fig.savefig(self.pd_image_path, dpi=100, bbox_inches='tight')
-            print(f"已保存PRPD图像到: {self.pd_image_path}")
+            # 累加模式使用累加直方图中的放电点，否则使用最新一帧
+            if self.show_accumulated_prpd.isChecked():
+                phase_values, uhf_db_values = self.prpd_histogram.points()
+            else:
+                frame = self.frame_buffer.latest()
+                if frame is None:
+                    QMessageBox.warning(self, "识别错误", "暂无采集数据，无法识别")
+                    return
+                phase_values, uhf_db_values = frame.phase_values, frame.uhf_db_values
+            
+            # 按训练图像的样式直接栅格化为64×64灰度数组，不再保存整张图表
+            image = self.pd_rasterizer.render(phase_values, uhf_db_values)
+            print(f"已生成PRPD识别数组: {len(phase_values)} 个放电点")
             
             # 调用识别函数
-            result = recognize_pd_type(self.pd_image_path)
+            result = recognize_pd_array(image)
             
             if 'error' in result:
                 QMessageBox.warning(self, "识别错误", f"识别过程中发生错误: {result['error']}")
@@ -938,17 +1582,29 @@ class MainWindow(QMainWindow):
             self.status_bar.showMessage("局放类型识别失败")
         
     def closeEvent(self, event):
+        # 停止回放和采集线程并关闭连接
+        self.stop_replay()
+        self.acquisition.stop(timeout=1.0)
+        if not self.acquisition.is_alive():
+            # 采集线程仍在读取时不在界面线程中关闭会话，退出进程时连接随之关闭
+            session.close()
+        if session.capture is not None:
+            session.capture.close()
+        # 等待记录文件写完并关闭
+        for writer in [self.segment_writer, *self.replay_writers.values()]:
+            if writer is not None:
+                writer.close(timeout=2.0)
+        self.save_trends()
         # 恢复标准输出
         sys.stdout = sys.__stdout__
         sys.stderr = sys.__stderr__
         super().closeEvent(event)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    app.setStyle('Fusion')  # 使用Fusion风格
-    window = MainWindow()
+    with profiler.measure("创建QApplication"):
+        app = QApplication(sys.argv)
+        app.setStyle('Fusion')  # 使用Fusion风格
+    with profiler.measure("创建主窗口"):
+        window = MainWindow()
     window.show()
     sys.exit(app.exec_())
-
-# 关闭连接
-client.close()
@@ -5,30 +5,30 @@ a = Analysis(
     ['3_11_gis_modbusTCPGUI_v5.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=[('register_maps', 'register_maps')],
+    # 以下模块在主窗口显示后才导入，这里显式列出以免被遗漏
+    hiddenimports=['gis_canvas', 'resources_rc', 'pymodbus.client.sync', 'requests'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter', 'IPython', 'PyQt5.QtWebEngineWidgets', 'PyQt5.QtWebEngineCore'],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+# 使用目录模式（onedir）打包：单文件模式每次启动都要把所有依赖解压到临时目录，冷启动需要数秒；
+# 同样不使用UPX压缩，避免每次加载DLL时解压
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='3_11_gis_modbusTCPGUI_v5',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +37,12 @@ exe = EXE(
     entitlements_file=None,
     icon=['images\\GIS_PD.ico'],
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='3_11_gis_modbusTCPGUI_v5',
+)
@@ -0,0 +1,306 @@
+"""
+后台数据采集：采集线程负责与设备通信和解码，解码结果写入有界环形缓冲区，
+界面线程在绘图时只取最新的快照，不会被网络等待阻塞。
+记录、趋势等每一帧都要处理的工作由 on_frame 回调在采集线程中完成，界面来不及绘图、环形缓冲区覆盖旧帧时也不会漏掉。
+
+读取节奏由 PollScheduler 控制：按固定节拍读取，读取耗时超过周期时跳过错过的节拍并计数，
+不会积压重叠的读取；开启自适应后按放电活动调整轮询周期。
+
+连接、断开等同样使用设备会话的操作通过 AcquisitionWorker.call 提交给采集线程，在两次读取之间执行，
+会话只在采集线程中使用，不需要加锁，界面也不会等待唤醒超时。
+"""
+import math
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from gis_protocol import GROUP_COUNT
+
+# 一帧解码结果的快照
+Frame = namedtuple('Frame', ['seq', 'timestamp_ns', 'discharge_counts', 'uhf_db_values', 'phase_values'])
+
+
+class FrameRingBuffer:
+    """
+    有界环形帧缓冲区。
+
+    采集线程调用 push 写入，界面线程调用 latest 读取；所有存储在创建时预分配，
+    写满后覆盖最旧的帧。锁只保护一次数组拷贝，持有时间在微秒级。
+    """
+
+    def __init__(self, capacity=64, group_count=GROUP_COUNT):
+        self.capacity = capacity
+        self.group_count = group_count
+        self._counts = np.zeros((capacity, group_count), dtype=np.int32)
+        self._uhf_db = np.zeros((capacity, group_count), dtype=np.float64)
+        self._phase = np.zeros((capacity, group_count), dtype=np.float64)
+        self._sizes = np.zeros(capacity, dtype=np.int32)
+        self._timestamps = np.zeros(capacity, dtype=np.int64)
+        self._seq = 0  # 已写入的总帧数
+        self._lock = threading.Lock()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def push(self, decoder, timestamp_ns=None):
+        """把解码器当前的结果拷贝到缓冲区，返回该帧的序号"""
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        size = decoder.size
+        with self._lock:
+            slot = self._seq % self.capacity
+            self._counts[slot, :size] = decoder.discharge_counts
+            self._uhf_db[slot, :size] = decoder.uhf_db_values
+            self._phase[slot, :size] = decoder.phase_values
+            self._sizes[slot] = size
+            self._timestamps[slot] = timestamp_ns
+            self._seq += 1
+            return self._seq - 1
+
+    def _frame(self, seq):
+        slot = seq % self.capacity
+        size = self._sizes[slot]
+        return Frame(seq, int(self._timestamps[slot]),
+                     self._counts[slot, :size].copy(),
+                     self._uhf_db[slot, :size].copy(),
+                     self._phase[slot, :size].copy())
+
+    def get(self, seq):
+        """返回序号为 seq 的帧的拷贝，已被覆盖或还没有写入时返回 None"""
+        with self._lock:
+            if not max(self._seq - self.capacity, 0) <= seq < self._seq:
+                return None
+            return self._frame(seq)
+
+    def latest(self):
+        """返回最新一帧的拷贝，缓冲区为空时返回 None"""
+        with self._lock:
+            if self._seq == 0:
+                return None
+            return self._frame(self._seq - 1)
+
+    def frames_since(self, seq):
+        """
+        返回序号大于 seq 的所有帧（按时间顺序）及因缓冲区写满已被覆盖的帧数。
+
+        界面按自己的帧率读取时，两次读取之间采集到的多帧可以一起处理。
+        """
+        with self._lock:
+            first = max(seq + 1, self._seq - self.capacity, 0)
+            lost = first - (seq + 1)
+            return [self._frame(i) for i in range(first, self._seq)], lost
+
+
+class PollScheduler:
+    """
+    轮询节拍调度器。
+
+    节拍按 interval 对齐，每次读取结束后调用 next_delay 得到距下一个节拍的等待时间。
+    读取耗时超过周期时，错过的节拍直接丢弃并计入 overdue_ticks，下一次读取对齐到之后最近的节拍，
+    因此读取永远不会重叠或排队。
+
+    adaptive 为真时根据每帧的放电活动调整周期：放电次数总和达到 count_threshold 或 uhf_db
+    最大值达到 uhf_threshold 时立即切换到 min_interval，设备安静时每帧把周期放大 backoff 倍，
+    直到 max_interval。关闭自适应时始终使用 interval。
+    """
+
+    def __init__(self, interval=1.0, adaptive=False, min_interval=0.1, max_interval=5.0,
+                 count_threshold=100, uhf_threshold=60.0, backoff=1.5):
+        self.interval = interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.count_threshold = count_threshold
+        self.uhf_threshold = uhf_threshold
+        self.backoff = backoff
+        self.current_interval = interval
+        self._deadline = None
+        # 统计指标
+        self.ticks = 0
+        self.overdue_ticks = 0
+        self.active = False
+
+    def reset(self):
+        """重新开始计时（暂停、出错重连后调用）"""
+        self._deadline = None
+
+    def observe(self, discharge_counts, uhf_db_values):
+        """根据一帧数据的放电活动更新轮询周期"""
+        if not self.adaptive:
+            self.current_interval = self.interval
+            return
+        self.active = (len(discharge_counts) > 0 and
+                       (int(discharge_counts.sum()) >= self.count_threshold or
+                        float(uhf_db_values.max()) >= self.uhf_threshold))
+        if self.active:
+            self.current_interval = self.min_interval
+        else:
+            self.current_interval = min(max(self.current_interval, self.min_interval) * self.backoff,
+                                        self.max_interval)
+
+    def next_delay(self, now=None):
+        """一次读取结束后调用，返回距下一个节拍的等待时间（秒）"""
+        if now is None:
+            now = time.monotonic()
+        interval = self.current_interval if self.adaptive else self.interval
+        self.ticks += 1
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += interval
+        if now > self._deadline:
+            # 读取耗时超过周期，丢弃错过的节拍
+            missed = math.ceil((now - self._deadline) / interval)
+            self.overdue_ticks += missed
+            self._deadline += missed * interval
+        return max(0.0, self._deadline - now)
+
+    def metrics(self):
+        return {
+            'interval': self.current_interval if self.adaptive else self.interval,
+            'ticks': self.ticks,
+            'overdue_ticks': self.overdue_ticks,
+            'active': self.active,
+        }
+
+
+class WorkerCommand:
+    """提交给采集线程执行的操作，执行完成后 done 为 True，结果在 result 或 error 中，由界面定时查询"""
+
+    def __init__(self, func):
+        self.func = func
+        self.result = None
+        self.error = None
+        self.done = False
+
+    def run(self):
+        try:
+            self.result = self.func()
+        except Exception as e:
+            self.error = e
+        self.done = True
+
+
+class AcquisitionWorker(threading.Thread):
+    """
+    采集线程：循环调用 read_frames 读取并解码数据，每解码一帧就写入环形缓冲区。
+
+    read_frames(on_frame) 每解码出一帧调用一次 on_frame(groups)，返回本次读取的帧数，解码结果从 decoder 中读取；
+    回放等数据源可以调用 on_frame(groups, timestamp_ns) 给出帧的原始采集时间，否则按写入缓冲区的时间记录。
+    读取节拍由 scheduler 决定，未指定时按固定周期 interval（秒）轮询。
+    on_frame 不为 None 时，每帧写入缓冲区后在采集线程中以该帧的快照（Frame）调用一次，应尽快返回。
+    """
+
+    def __init__(self, read_frames, decoder, buffer, interval=1.0, retry_delay=1.0, max_retry_delay=30.0,
+                 scheduler=None, on_frame=None):
+        super().__init__(name='AcquisitionWorker', daemon=True)
+        self.read_frames = read_frames
+        self.decoder = decoder
+        self.buffer = buffer
+        self.scheduler = scheduler or PollScheduler(interval)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.on_frame = on_frame
+        self.frame_count = 0
+        self.error_count = 0
+        self.last_latency = 0.0
+        self._stop_event = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._wakeup = threading.Event()
+        self._commands = deque()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+        self._wakeup.set()
+
+    def call(self, func):
+        """在采集线程中执行 func（暂停时也会执行），立即返回 WorkerCommand"""
+        command = WorkerCommand(func)
+        self._commands.append(command)
+        self._wakeup.set()
+        return command
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._running.set()
+        self._wakeup.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def interval(self):
+        return self.scheduler.interval
+
+    @interval.setter
+    def interval(self, value):
+        self.scheduler.interval = value
+        self.scheduler.reset()
+
+    def _on_frame(self, groups, timestamp_ns=None):
+        seq = self.buffer.push(self.decoder, timestamp_ns)
+        self.frame_count += 1
+        self.scheduler.observe(self.decoder.discharge_counts, self.decoder.uhf_db_values)
+        if self.on_frame is not None:
+            try:
+                self.on_frame(self.buffer.get(seq))
+            except Exception as e:
+                print(f"处理采集帧失败: {e}")
+
+    def _run_commands(self):
+        while self._commands:
+            self._commands.popleft().run()
+
+    def _wait(self, delay=None):
+        """等待 delay 秒（None 表示等到恢复采集），期间执行提交的操作，停止时立即返回"""
+        deadline = None if delay is None else time.monotonic() + delay
+        while not self._stop_event.is_set():
+            self._run_commands()
+            if deadline is None:
+                if self._running.is_set():
+                    return
+                self._wakeup.wait()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._wakeup.wait(remaining)
+            self._wakeup.clear()
+
+    def run(self):
+        consecutive_errors = 0
+        while not self._stop_event.is_set():
+            self._run_commands()
+            if not self._running.is_set():
+                self._wait()
+                self.scheduler.reset()
+            if self._stop_event.is_set():
+                break
+
+            started = time.monotonic()
+            try:
+                self.read_frames(self._on_frame)
+                consecutive_errors = 0
+                finished = time.monotonic()
+                delay = self.scheduler.next_delay(finished)
+            except Exception as e:
+                consecutive_errors += 1
+                self.error_count += 1
+                print(f"采集线程读取失败: {e}")
+                # 连续失败时指数退避，避免频繁重连占满网络和日志
+                finished = time.monotonic()
+                delay = min(self.retry_delay * 2 ** (consecutive_errors - 1), self.max_retry_delay)
+                delay = max(0.0, delay - (finished - started))
+                self.scheduler.reset()
+            self.last_latency = finished - started
+
+            self._wait(delay)
@@ -0,0 +1,147 @@
+"""
+PRPD/PRPS 图表画布。
+
+Matplotlib 导入较慢，本模块在主窗口显示之后才导入，不影响窗口的启动速度。
+
+PRPD图的坐标轴、参考波形、图例和颜色条只在创建时绘制一次，散点和标注设为 animated，
+每帧只更新散点数据并用 blit 重绘PRPD区域；累加模式下改为显示放电密度图像。
+PRPS图为滚动瀑布图，每帧只替换图像数据。
+整图重绘时按子图缓存背景，布局只在窗口大小变化时重新计算。
+"""
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+from mpl_toolkits.axes_grid1 import make_axes_locatable
+
+from gis_prpd import AMPLITUDE_BINS, AMPLITUDE_RANGE, PHASE_BINS
+from gis_prpd_style import PRPD_SCATTER_STYLE, apply_font_settings, setup_prpd_axes
+
+apply_font_settings()
+
+# 自定义 Matplotlib 画布类
+class MplCanvas(FigureCanvasQTAgg):
+    def __init__(self, parent=None, width=5, height=4, dpi=100, prps_cycles=50):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.fig.set_facecolor('#f0f0f0')
+        # 使用GridSpec来控制子图的大小和位置
+        gs = GridSpec(1, 2, width_ratios=[1, 1])  # 1行2列，宽度比例1:1
+        self.ax1 = self.fig.add_subplot(gs[0, 0])  # 左侧PRPD图
+        self.ax2 = self.fig.add_subplot(gs[0, 1])  # 右侧PRPS图（瀑布图）
+        self.colorbar = None  # 添加colorbar属性以便跟踪和管理
+        self.cmap = matplotlib.colormaps['viridis']
+        self.prps_cycles = prps_cycles
+        super(MplCanvas, self).__init__(self.fig)
+        self.setStyleSheet("background-color: #f0f0f0;")
+        
+        # 初始化图表显示
+        self.setup_prpd_plot()
+        self.setup_prps_plot()
+        self.create_prpd_artists()
+        self.create_prps_artists()
+        
+        # 调整布局
+        self.update_layout()
+        
+        # 整图重绘后缓存各子图背景，窗口大小变化时重新计算布局
+        self._backgrounds = {}
+        self.mpl_connect('draw_event', self._on_draw)
+        self.mpl_connect('resize_event', self._on_resize)
+        
+    def setup_prpd_plot(self):
+        """设置PRPD图的基本显示信息"""
+        setup_prpd_axes(self.ax1)
+        
+    def create_prpd_artists(self):
+        """创建PRPD图中每帧更新的散点、标注和固定的颜色条"""
+        self.prpd_scatter = self.ax1.scatter(np.empty(0), np.empty(0), c=np.empty(0), animated=True,
+                                             **PRPD_SCATTER_STYLE)
+        # 累加模式下显示的放电密度图像，计数为0的区间（NaN）透明
+        self.prpd_density = self.ax1.imshow(np.full((AMPLITUDE_BINS, PHASE_BINS), np.nan, dtype=np.float32),
+                                            cmap=self.cmap, vmin=0, vmax=1, origin='lower', aspect='auto',
+                                            interpolation='nearest', extent=(0, 360) + AMPLITUDE_RANGE,
+                                            alpha=0.9, animated=True, visible=False)
+        self.prpd_info = self.ax1.text(0.02, 0.97, '', transform=self.ax1.transAxes, fontsize=10,
+                                       va='top', animated=True)
+        self.prpd_accumulated = False
+        # 使用固定位置创建colorbar，避免挤压主图
+        divider = make_axes_locatable(self.ax1)
+        cax = divider.append_axes("right", size="5%", pad=0.05)
+        self.colorbar = self.fig.colorbar(self.prpd_scatter, cax=cax, label='幅值 (dB)')
+        
+    def create_prps_artists(self):
+        """创建PRPS瀑布图图像，颜色表示幅值，与PRPD图共用颜色条的范围"""
+        self.prps_image = self.ax2.imshow(np.zeros((self.prps_cycles, PHASE_BINS), dtype=np.float32),
+                                          cmap=self.cmap, vmin=0, vmax=80, origin='lower', aspect='auto',
+                                          interpolation='nearest', extent=(0, 360, 0, self.prps_cycles),
+                                          animated=True)
+        
+    def update_layout(self):
+        self.fig.tight_layout()
+        self.fig.subplots_adjust(wspace=0.3)
+        
+    def _animated_artists(self, ax):
+        if ax is self.ax1:
+            return (self.prpd_density, self.prpd_scatter, self.prpd_info)
+        return (self.prps_image,)
+        
+    def _on_resize(self, event):
+        self._backgrounds = {}
+        self.update_layout()
+        
+    def _on_draw(self, event):
+        for ax in (self.ax1, self.ax2):
+            self._backgrounds[ax] = self.copy_from_bbox(ax.bbox)
+            for artist in self._animated_artists(ax):
+                ax.draw_artist(artist)
+        
+    def _blit_axes(self, ax):
+        """用缓存的背景重绘一个子图中的动态元素"""
+        background = self._backgrounds.get(ax)
+        if background is None:
+            # 还没有缓存背景（首次显示或刚调整过大小），整图重绘一次
+            self.draw_idle()
+            return
+        self.restore_region(background)
+        for artist in self._animated_artists(ax):
+            ax.draw_artist(artist)
+        self.blit(ax.bbox)
+        
+    def update_prpd(self, phase_values, uhf_db_values, info=''):
+        """更新PRPD散点数据并重绘PRPD区域"""
+        self.prpd_scatter.set_offsets(np.column_stack((phase_values, uhf_db_values)))
+        self.prpd_scatter.set_array(np.asarray(uhf_db_values))
+        self.prpd_info.set_text(info)
+        self._blit_axes(self.ax1)
+        
+    def set_prpd_accumulated(self, accumulated):
+        """切换PRPD图的显示方式：单帧散点或累加密度图，颜色条随之切换，需要整图重绘一次"""
+        if accumulated == self.prpd_accumulated:
+            return
+        self.prpd_accumulated = accumulated
+        self.prpd_scatter.set_visible(not accumulated)
+        self.prpd_density.set_visible(accumulated)
+        self.colorbar.update_normal(self.prpd_density if accumulated else self.prpd_scatter)
+        self.colorbar.set_label('相对放电密度' if accumulated else '幅值 (dB)')
+        self.prpd_info.set_text('')
+        self.draw_idle()
+        
+    def update_prpd_density(self, density, info=''):
+        """更新累加模式的放电密度图像，density 为 (幅值区间, 相位区间) 的归一化数组"""
+        self.prpd_density.set_data(density)
+        self.prpd_info.set_text(info)
+        self._blit_axes(self.ax1)
+        
+    def update_prps(self, cycles):
+        """更新PRPS瀑布图，cycles 为 (周期数, 相位区间数) 的幅值数组，最后一行为最新周期"""
+        self.prps_image.set_data(cycles)
+        self._blit_axes(self.ax2)
+        
+    def setup_prps_plot(self):
+        """设置PRPS图的基本显示信息"""
+        self.ax2.set_title('PRPS图 (相位分辨局部放电谱)', fontsize=14, fontweight='bold')
+        self.ax2.set_xlabel('相位 (°)', fontsize=12)
+        self.ax2.set_ylabel('周期', fontsize=12)
+        self.ax2.set_xlim(0, 360)
+        self.ax2.set_ylim(0, self.prps_cycles)
@@ -0,0 +1,165 @@
+"""
+原始报文抓包与回放。
+
+抓包：DeviceSession.capture 设置为 CaptureWriter 后，每一帧回复的寄存器数据（9字节报文头之后的部分）
+连同单调时钟和系统时间写入抓包文件，写入在采集线程中进行，经 1 MB 缓冲后落盘。
+
+回放：ReplaySource.read_frames 与 DeviceSession.read_frames 接口相同，可以直接交给 AcquisitionWorker，
+数据经过同一个解码器、环形缓冲区、记录和绘图流程，每帧的时间为抓包时记录的系统时间；
+界面在回放期间记录时写入单独的回放记录目录。speed 为回放倍速，按抓包时的单调时钟间隔除以倍速发出，
+speed 为 0 时不等待，尽快回放，可用于测试整条处理流程的吞吐量。
+
+文件格式（小端）：
+    文件头  magic b'GISCAP1\\0'，版本 u2，保留 u2，寄存器表型号 32字节 UTF-8（补0），创建时间 i8 (ns)，共52字节
+    记录    单调时钟 i8 (ns)，系统时间 i8 (ns)，数据长度 u4，CRC32 u4（覆盖数据），数据
+    文件末尾不完整或校验失败的记录（例如抓包时程序崩溃）在回放时忽略。
+
+命令行测试解码吞吐量：
+    python gis_capture.py captures/capture_20250301_120000.gcap
+"""
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from gis_protocol import RegisterDecoder, get_decode_plan
+
+MAGIC = b'GISCAP1\0'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sHH32sq')
+RECORD_HEADER = struct.Struct('<qqII')
+
+
+class CaptureWriter:
+    """抓包文件写入，write 在采集线程中调用，close 可以在任意线程调用"""
+
+    def __init__(self, path, model=''):
+        self.path = path
+        self._file = open(path, 'wb', buffering=1024 * 1024)
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, model.encode('utf-8')[:32], time.time_ns()))
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.bytes_written = FILE_HEADER.size
+
+    def write(self, data, monotonic_ns=None, wall_ns=None):
+        """写入一帧寄存器数据（bytes 或 memoryview）"""
+        header = RECORD_HEADER.pack(time.monotonic_ns() if monotonic_ns is None else monotonic_ns,
+                                    time.time_ns() if wall_ns is None else wall_ns,
+                                    len(data), zlib.crc32(data))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(header)
+            self._file.write(data)
+            self.frames += 1
+            self.bytes_written += len(header) + len(data)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_capture(path):
+    """
+    读取抓包文件，返回 (寄存器表型号, [(单调时钟ns, 系统时间ns, 数据), ...])，忽略末尾损坏的记录。
+    文件以内存映射方式打开，数据为映射内容的 memoryview，不会把整个文件读入内存。
+    """
+    if os.path.getsize(path) < FILE_HEADER.size:
+        raise ValueError("抓包文件头不完整")
+    with open(path, 'rb') as f:
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, model, _ = FILE_HEADER.unpack_from(content)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("不是有效的抓包文件")
+    view = memoryview(content)
+    records = []
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(content):
+        monotonic_ns, wall_ns, length, crc = RECORD_HEADER.unpack_from(content, offset)
+        data = view[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+        if len(data) < length or zlib.crc32(data) != crc:
+            break
+        records.append((monotonic_ns, wall_ns, data))
+        offset += RECORD_HEADER.size + length
+    return model.rstrip(b'\0').decode('utf-8', errors='replace'), records
+
+
+class ReplaySource:
+    """
+    抓包回放数据源。
+
+    read_frames(on_frame) 解码并发出所有已到回放时间的帧（尽快回放时每次最多 batch 帧），返回发出的帧数，
+    回放完毕后 finished 为 True，之后返回0。decoder 为空时按抓包文件记录的寄存器表创建解码器。
+    on_frame(groups, timestamp_ns) 的 timestamp_ns 为抓包时记录的系统时间，回放的帧保留原始采集时间。
+    ready() 返回当前还可以发出的帧数，用于等待下游（例如界面读取环形缓冲区）跟上，避免尽快回放时覆盖未处理的帧。
+    """
+
+    def __init__(self, path, decoder=None, speed=1.0, batch=64, ready=None):
+        self.model, self.records = read_capture(path)
+        if decoder is None:
+            decoder = RegisterDecoder(get_decode_plan(self.model) if self.model else None)
+        self.decoder = decoder
+        self.speed = speed
+        self.batch = batch
+        self.ready = ready
+        self.position = 0
+        self.finished = not self.records
+        self.started = None     # 开始回放的单调时钟（秒）
+        self.elapsed = 0.0      # 回放所用时间（秒）
+        if self.model and self.model != decoder.plan.model:
+            print(f"警告：抓包文件的寄存器表 {self.model} 与当前解码器 {decoder.plan.model} 不一致")
+
+    def read_frames(self, on_frame=None):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        origin = self.records[0][0] if self.records else 0
+        frames = 0
+        limit = self.batch if self.ready is None else min(self.batch, self.ready())
+        while self.position < len(self.records) and frames < limit:
+            monotonic_ns, wall_ns, data = self.records[self.position]
+            if self.speed and self.started + (monotonic_ns - origin) / 1e9 / self.speed > now:
+                break
+            self.position += 1
+            groups = self.decoder.decode(data)
+            if groups:
+                frames += 1
+                if on_frame is not None:
+                    on_frame(groups, wall_ns)
+        if self.position >= len(self.records) and not self.finished:
+            self.finished = True
+            self.elapsed = time.monotonic() - self.started
+        return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放抓包文件，测试解码和环形缓冲区的吞吐量")
+    parser.add_argument('path', help="抓包文件")
+    parser.add_argument('--speed', type=float, default=0.0, help="回放倍速，0 表示尽快回放")
+    parser.add_argument('--repeat', type=int, default=1, help="重复回放的次数")
+    args = parser.parse_args()
+
+    from gis_acquisition import FrameRingBuffer
+
+    source = ReplaySource(args.path, speed=args.speed)
+    model, decoder = source.model, source.decoder
+    buffer = FrameRingBuffer(group_count=decoder.group_count)
+    frames = 0
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        source = ReplaySource(args.path, decoder, speed=args.speed)
+        while not source.finished:
+            frames += source.read_frames(lambda groups, timestamp_ns: buffer.push(decoder, timestamp_ns))
+            if args.speed and not source.finished:
+                time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    print(f"型号 {model}，回放 {frames} 帧，耗时 {elapsed:.2f} s，{frames / elapsed:.0f} 帧/秒")
+
+
+if __name__ == '__main__':
+    main()
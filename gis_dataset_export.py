@@ -0,0 +1,208 @@
+"""
+无界面批量导出PRPD图像，用于生成局放类型识别的训练数据集。
+
+读取记录的相位/幅值数据，按 gis_prpd_style 中与界面相同的样式用 Agg 后端绘制PRPD图，
+多进程并行输出到 prpd_dataset/<类型>/<类型><编号>.png，编号接着目录中已有的最大编号继续，不会覆盖已有图像。
+
+界面样式（纵轴 0~80 dB、参考正弦 40+40·sin、500×400）与识别服务 test_dataset 中的训练图像
+（Chart.js 导出，纵轴 0~100、参考正弦 50+50·sin、1250×625 等）不同，默认不写入 test_dataset，
+以免两种样式混在同一个训练集中；确实需要写入时加 --allow-training-dataset。
+
+支持的输入：
+    .csv   界面"导出数据"生成的CSV，时间戳(ns)和设备都相同的连续行为一帧；
+           没有时间戳列的旧文件按时间（精确到秒）分组，同一秒内的多帧会合并为一帧
+    .npz   界面导出的NPZ（gis_export 的 timestamp_ns、phase、uhf_db、device 列），与CSV一样按 (时间戳, 设备) 分组
+    .gcap  原始报文抓包文件（gis_capture），按文件中记录的寄存器表逐帧解码
+    .seg   记录目录中的段文件（gis_segments），跳过 CRC 校验失败的记录
+
+用法:
+    python gis_dataset_export.py GIS局放数据_20250301_120000.csv --category corona
+    python gis_dataset_export.py data/*.npz --category void --frames 10 --workers 8
+    python gis_dataset_export.py recordings/192.168.0.150_6789/*.seg captures/*.gcap --category surface
+"""
+import argparse
+import csv
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prpd_dataset')
+# 识别服务的训练图像目录
+TRAINING_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pd_recognition_system', 'test_dataset')
+
+# 工作进程中复用的图表，每个进程只创建一次
+_figure = None
+
+
+def load_csv_frames(path):
+    """读取界面导出的CSV，按 (时间戳, 设备) 分组为帧，返回 [(相位数组, 幅值数组), ...]"""
+    frames = []
+    current_key, phases, amplitudes = None, [], []
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        time_column = '时间戳(ns)' if '时间戳(ns)' in (reader.fieldnames or []) else '时间'
+        for row in reader:
+            key = (row[time_column], row.get('设备'))
+            if key != current_key and phases:
+                frames.append((np.array(phases), np.array(amplitudes)))
+                phases, amplitudes = [], []
+            current_key = key
+            phases.append(float(row['相位']))
+            amplitudes.append(float(row['幅值']))
+    if phases:
+        frames.append((np.array(phases), np.array(amplitudes)))
+    return frames
+
+
+def load_npz_frames(path):
+    """读取界面导出的NPZ，时间戳和设备都相同的连续行为一帧"""
+    with np.load(path) as data:
+        timestamps = data['timestamp_ns']
+        devices = data['device']
+        phase_values = data['phase']
+        uhf_db_values = data['uhf_db']
+    starts = np.flatnonzero((timestamps[1:] != timestamps[:-1]) | (devices[1:] != devices[:-1])) + 1
+    return list(zip(np.split(phase_values, starts), np.split(uhf_db_values, starts))) if len(timestamps) else []
+
+
+def load_capture_frames(path):
+    """读取抓包文件，按文件中记录的寄存器表逐帧解码"""
+    from gis_capture import read_capture
+    from gis_protocol import RegisterDecoder, get_decode_plan
+
+    model, records = read_capture(path)
+    decoder = RegisterDecoder(get_decode_plan(model) if model else None)
+    frames = []
+    for _, _, data in records:
+        if decoder.decode(data):
+            frames.append((decoder.phase_values.copy(), decoder.uhf_db_values.copy()))
+    return frames
+
+
+def load_segment_frames(path):
+    """读取记录的段文件，CRC 校验失败的记录跳过"""
+    from gis_segments import read_segment, verify_records
+
+    _, records = read_segment(path)
+    records = records[verify_records(records)]
+    return [(record['phase'][:record['size']].astype(np.float64),
+             record['uhf_db'][:record['size']].astype(np.float64)) for record in records]
+
+
+# 扩展名 -> 读取函数，其他扩展名按CSV读取
+FRAME_LOADERS = {
+    '.npz': load_npz_frames,
+    '.gcap': load_capture_frames,
+    '.seg': load_segment_frames,
+}
+
+
+def load_frames(path):
+    """读取一个数据文件，返回 [(相位数组, 幅值数组), ...]，每项为一帧"""
+    return FRAME_LOADERS.get(os.path.splitext(path)[1].lower(), load_csv_frames)(path)
+
+
+def group_frames(frames, frames_per_image):
+    """每 frames_per_image 帧合并为一张图，不足的尾部丢弃"""
+    groups = []
+    for start in range(0, len(frames) - frames_per_image + 1, frames_per_image):
+        chunk = frames[start:start + frames_per_image]
+        groups.append((np.concatenate([frame[0] for frame in chunk]),
+                       np.concatenate([frame[1] for frame in chunk])))
+    return groups
+
+
+def next_index(directory, category):
+    """目录中已有 <类型><编号>.png 的最大编号 + 1"""
+    pattern = re.compile(rf'^{re.escape(category)}(\d+)\.png$')
+    indices = [int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m]
+    return max(indices, default=0) + 1
+
+
+def _init_worker(width, height, dpi):
+    global _figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from gis_prpd_style import PRPD_SCATTER_STYLE, apply_font_settings, setup_prpd_axes
+
+    apply_font_settings()
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    setup_prpd_axes(ax)
+    scatter = ax.scatter(np.empty(0), np.empty(0), c=np.empty(0), animated=True, **PRPD_SCATTER_STYLE)
+    fig.tight_layout()
+    # 坐标轴、参考波形和图例只绘制一次，之后每张图只在背景上重绘散点
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    _figure = (fig, ax, scatter, background)
+
+
+def _render_batch(jobs):
+    """在工作进程中绘制一批图像，jobs 为 [(输出路径, 相位数组, 幅值数组), ...]"""
+    from matplotlib.image import imsave
+
+    fig, ax, scatter, background = _figure
+    for path, phase_values, uhf_db_values in jobs:
+        scatter.set_offsets(np.column_stack((phase_values, uhf_db_values)))
+        scatter.set_array(uhf_db_values)
+        fig.canvas.restore_region(background)
+        ax.draw_artist(scatter)
+        imsave(path, np.asarray(fig.canvas.buffer_rgba()))
+    return len(jobs)
+
+
+def export_images(point_sets, output_dir, category, workers=None, batch_size=32,
+                  width=5.0, height=4.0, dpi=100):
+    """并行绘制 point_sets 中的每组点，返回写入的文件数"""
+    directory = os.path.join(output_dir, category)
+    os.makedirs(directory, exist_ok=True)
+    start = next_index(directory, category)
+    jobs = [(os.path.join(directory, f"{category}{start + i}.png"), phase_values, uhf_db_values)
+            for i, (phase_values, uhf_db_values) in enumerate(point_sets)]
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+    written = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(width, height, dpi)) as pool:
+        for count in pool.map(_render_batch, batches):
+            written += count
+            print(f"已导出 {written}/{len(jobs)} 张")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导出PRPD训练图像")
+    parser.add_argument('inputs', nargs='+', help="CSV、NPZ、抓包（.gcap）或段文件（.seg）")
+    parser.add_argument('--category', required=True, help="局放类型，即输出的子目录名，例如 corona")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="数据集根目录")
+    parser.add_argument('--frames', type=int, default=1, help="每张图合并的帧数")
+    parser.add_argument('--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--batch-size', type=int, default=32, help="每个任务绘制的图像数")
+    parser.add_argument('--width', type=float, default=5.0, help="图像宽度（英寸）")
+    parser.add_argument('--height', type=float, default=4.0, help="图像高度（英寸）")
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--allow-training-dataset', action='store_true',
+                        help="允许输出到识别服务的 test_dataset（样式与其中的训练图像不同）")
+    args = parser.parse_args()
+    if os.path.abspath(args.output) == TRAINING_DATASET and not args.allow_training_dataset:
+        parser.error(f"{args.output} 是识别服务的训练图像目录，其中的图像为 Chart.js 样式，与这里绘制的界面样式不同；"
+                     f"请输出到其他目录，或加 --allow-training-dataset")
+
+    started = time.monotonic()
+    point_sets = []
+    for path in args.inputs:
+        point_sets.extend(group_frames(load_frames(path), args.frames))
+    print(f"读取 {len(args.inputs)} 个文件，共 {len(point_sets)} 张图像，耗时 {time.monotonic() - started:.1f} s")
+
+    written = export_images(point_sets, args.output, args.category, args.workers, args.batch_size,
+                            args.width, args.height, args.dpi)
+    elapsed = time.monotonic() - started
+    print(f"导出完成: {written} 张图像，耗时 {elapsed:.1f} s ({written / elapsed:.1f} 张/秒)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""
+记录数据的批量导出：CSV，以及供后续分析使用的 NPZ（可选压缩）。
+
+数据按块处理，每块一次性格式化和写入，不逐行调用 csv 模块：
+    CSV  幅值按定点小数格式化，各位数字用整数运算整列算出，拼成 (行数, 最大宽度) 的字符矩阵，
+         再用掩码去掉前导0和空位，一次得到整块的字节串；舍入按数值的精确值进行，结果与逐个 f"{x:.2f}" 格式化相同。
+         相位保持完整精度（与 repr(float) 相同），时间字符串和相位都是每个不同的值只格式化一次。
+         整数纳秒时间戳列放在最后，同一帧的各行时间戳相同，可与设备列一起区分同一秒内的多帧。
+    NPZ  每列作为一个 .npy 成员写入 zip，先写出总长度的数组头，再逐块追加数据，不需要先拼接整列。
+导出在后台线程中运行（ExportJob），提供进度和取消；取消或失败时删除写了一半的文件。
+
+命令行用于测试导出吞吐量：
+    python gis_export.py --rows 10000000 --formats csv npz npz_compressed
+    python gis_export.py --check          # 定点小数格式化与 f-string 逐个比较
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+import numpy as np
+
+# 格式名称 -> (说明, 扩展名)
+EXPORT_FORMATS = {
+    'csv': ('CSV文件', '.csv'),
+    'npz': ('NPZ文件', '.npz'),
+    'npz_compressed': ('压缩NPZ文件', '.npz'),
+}
+
+# CSV 列：(列名, 记录列, 格式)，格式为 'time'（本地时间，精确到秒）、'int'（整数）或小数位数
+CSV_COLUMNS = (
+    ('时间', 'timestamp_ns', 'time'),
+    ('相位', 'phase', 'repr'),
+    ('幅值', 'uhf_db', 2),
+    ('放电次数', 'discharge_count', 0),
+    ('设备', 'device', 'device'),  # 只在多设备时输出
+    ('时间戳(ns)', 'timestamp_ns', 'int'),
+)
+
+NPZ_COLUMNS = ('timestamp_ns', 'phase', 'uhf_db', 'discharge_count', 'device')
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def text_matrix(texts):
+    """把字节串数组转换为 (个数, 最大长度) 的字符矩阵和有效字符掩码"""
+    texts = np.asarray(texts, dtype=np.bytes_)
+    width = max(texts.dtype.itemsize, 1)
+    chars = np.frombuffer(texts.astype(f'S{width}').tobytes(), dtype=np.uint8).reshape(len(texts), width)
+    lengths = np.char.str_len(texts)
+    keep = np.arange(width) < lengths[:, None]
+    return chars, keep
+
+
+def format_seconds(timestamps_ns):
+    """把纳秒时间戳格式化为本地时间（精确到秒）的字符矩阵，每个不同的秒只格式化一次"""
+    seconds, inverse = np.unique(timestamps_ns // 1_000_000_000, return_inverse=True)
+    texts = [datetime.fromtimestamp(s).strftime('%Y-%m-%d %H:%M:%S').encode() for s in seconds.tolist()]
+    chars, keep = text_matrix(texts)
+    return chars[inverse], keep[inverse]
+
+
+def format_repr(values):
+    """按 repr(float(x)) 格式化（完整精度，与逐行写入 Python float 的结果相同），每个不同的值只格式化一次"""
+    unique, inverse = np.unique(values, return_inverse=True)
+    chars, keep = text_matrix([repr(value).encode() for value in unique.tolist()])
+    return chars[inverse], keep[inverse]
+
+
+def _split(a):
+    """把 float64 拆成高低两半，每半不超过26位有效数字，两半的乘积都是精确的"""
+    c = 134217729.0 * a  # 2**27 + 1
+    high = c - (c - a)
+    return high, a - high
+
+
+def round_scaled(values, decimals):
+    """
+    values * 10**decimals 按精确值舍入为整数（恰好一半时取偶数），与 f"{x:.{decimals}f}" 的舍入相同，values 不小于0。
+    乘积在 float64 中可能先被舍入（例如 12.345 * 100 得到 1234.5，实际值略大于 1234.5），
+    这里用 Dekker 乘法求出乘积的舍入误差，按 乘积 + 误差 判断小数部分与 0.5 的大小。
+    """
+    scale = float(10 ** decimals)
+    product = values * scale
+    a_high, a_low = _split(values)
+    s_high, s_low = _split(scale)
+    error = ((a_high * s_high - product) + a_high * s_low + a_low * s_high) + a_low * s_low
+    whole = np.floor(product)
+    # 乘积不小于 2**52 时本身是整数，误差可能超过1，误差的整数部分计入结果（这时误差是 1/128 的倍数，减去整数部分是精确的）
+    carry = np.where(product >= 2.0 ** 52, np.floor(error), 0.0)
+    error -= carry
+    # product - whole 和减去 0.5 都是精确的，与 error 相加的符号即为精确值的小数部分减 0.5 的符号
+    half = (product - whole - 0.5) + error
+    result = whole.astype(np.int64) + carry.astype(np.int64)
+    result += (half > 0) | ((half == 0) & (result % 2 == 1))
+    return result
+
+
+def format_fixed(values, decimals):
+    """
+    把一列数值格式化为定点小数的字符矩阵和掩码，每行去掉掩码为 False 的字符后即为该数的文本。
+    结果与逐个 f"{x:.{decimals}f}" 相同（包括舍入为0的负数输出 -0.00），整数部分去掉前导0；
+    NaN 和无穷输出为空字段。python gis_export.py --check 与 f-string 逐个比较。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    scaled = round_scaled(np.abs(np.where(finite, values, 0.0)), decimals)
+    chars, keep = format_scaled(scaled, np.signbit(values), decimals)
+    keep &= finite[:, None]
+    return chars, keep
+
+
+def format_int(values):
+    """把一列整数（例如纳秒时间戳，超出 float64 的精确范围）按整数运算格式化为字符矩阵和掩码"""
+    values = np.asarray(values, dtype=np.int64)
+    return format_scaled(np.abs(values), values < 0, 0)
+
+
+def format_scaled(scaled, negative, decimals):
+    """scaled 为乘以 10**decimals 后的非负整数，negative 为是否输出负号"""
+    digits = max(len(str(int(scaled.max()))) if len(scaled) else 1, decimals + 1)
+    # 每一位数字，从最高位到最低位
+    powers = 10 ** np.arange(digits - 1, -1, -1, dtype=np.int64)
+    chars = (scaled[:, None] // powers % 10).astype(np.uint8) + ord('0')
+    # 整数部分只保留从第一个非0位开始的数字，个位始终保留
+    keep = (scaled[:, None] >= powers) | (powers <= 10 ** decimals)
+    sign = np.full((len(scaled), 1), ord('-'), dtype=np.uint8)
+    sign_keep = np.asarray(negative)[:, None]
+    parts = [(sign, sign_keep), (chars[:, :digits - decimals], keep[:, :digits - decimals])]
+    if decimals:
+        point = np.full((len(scaled), 1), ord('.'), dtype=np.uint8)
+        parts += [(point, np.ones_like(sign_keep)), (chars[:, digits - decimals:], keep[:, digits - decimals:])]
+    chars = np.hstack([part[0] for part in parts])
+    keep = np.hstack([part[1] for part in parts])
+    return chars, keep
+
+
+def format_csv_block(columns, devices=None):
+    """把一块记录（{列名: 数组}）格式化为 CSV 字节串，devices 为 None 时不输出设备列"""
+    rows = len(columns['timestamp_ns'])
+    separator = np.full((rows, 1), ord(','), dtype=np.uint8)
+    newline = np.full((rows, 1), ord('\n'), dtype=np.uint8)
+    on = np.ones((rows, 1), dtype=bool)
+    parts = []
+    for _, name, fmt in CSV_COLUMNS:
+        if fmt == 'time':
+            parts.append(format_seconds(columns[name]))
+        elif fmt == 'repr':
+            parts.append(format_repr(columns[name]))
+        elif fmt == 'int':
+            parts.append(format_int(columns[name]))
+        elif fmt == 'device':
+            if devices is None:
+                continue
+            chars, keep = text_matrix([device.encode('utf-8') for device in devices])
+            parts.append((chars[columns[name]], keep[columns[name]]))
+        else:
+            parts.append(format_fixed(columns[name], fmt))
+        parts.append((separator, on))
+    parts[-1] = (newline, on)
+    chars = np.hstack([part[0] for part in parts])
+    keep = np.hstack([part[1] for part in parts])
+    return chars[keep].tobytes()
+
+
+def _check(cancelled):
+    if cancelled is not None and cancelled():
+        raise ExportCancelled()
+
+
+def export_csv(blocks, path, devices=None, progress=None, cancelled=None):
+    """
+    导出为 CSV（UTF-8 带BOM，Excel 可直接打开），blocks 为 {列名: 数组} 的列表。
+    devices 为设备名称列表，多于一个设备时增加“设备”列。progress(已完成行数, 总行数) 每块调用一次。
+    """
+    total = sum(len(block['timestamp_ns']) for block in blocks)
+    with_device = devices is not None and len(devices) > 1
+    header = [column[0] for column in CSV_COLUMNS if with_device or column[2] != 'device']
+    done = 0
+    with open(path, 'wb') as f:
+        f.write(('\ufeff' + ','.join(header) + '\n').encode('utf-8'))
+        for block in blocks:
+            _check(cancelled)
+            f.write(format_csv_block(block, devices if with_device else None))
+            done += len(block['timestamp_ns'])
+            if progress is not None:
+                progress(done, total)
+    return total
+
+
+def export_npz(blocks, path, devices=None, compress=False, progress=None, cancelled=None):
+    """
+    导出为 NPZ，每列一个一维数组，另有 devices（设备名称）数组，可用 np.load 直接读取。
+    各列逐块写入 zip 成员，不需要先在内存中拼接整列。
+    """
+    total = sum(len(block['timestamp_ns']) for block in blocks)
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    done = 0
+    with zipfile.ZipFile(path, 'w', compression=compression, compresslevel=1 if compress else None,
+                         allowZip64=True) as archive:
+        for name in NPZ_COLUMNS:
+            dtype = blocks[0][name].dtype if blocks else np.dtype(np.float32)
+            with archive.open(name + '.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                         'fortran_order': False, 'shape': (total,)})
+                for block in blocks:
+                    _check(cancelled)
+                    f.write(np.ascontiguousarray(block[name]).tobytes())
+                    done += len(block[name])
+                    if progress is not None:
+                        progress(done // len(NPZ_COLUMNS), total)
+        with archive.open('devices.npy', 'w') as f:
+            np.lib.format.write_array(f, np.array(devices or [], dtype=np.str_))
+    return total
+
+
+def export(blocks, path, fmt='csv', devices=None, progress=None, cancelled=None):
+    """按格式导出，取消或出错时删除写了一半的文件"""
+    try:
+        if fmt == 'csv':
+            return export_csv(blocks, path, devices, progress, cancelled)
+        if fmt in ('npz', 'npz_compressed'):
+            return export_npz(blocks, path, devices, fmt == 'npz_compressed', progress, cancelled)
+        raise ValueError(f"未知的导出格式: {fmt}")
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+class ExportJob(threading.Thread):
+    """
+    后台导出线程。界面用定时器读取 rows_done / total_rows 显示进度，调用 cancel 取消；
+    结束后 done 为 True，error 为出错时的异常（取消时为 ExportCancelled）。
+    """
+
+    def __init__(self, blocks, path, fmt='csv', devices=None):
+        super().__init__(daemon=True, name='ExportJob')
+        self.blocks = blocks
+        self.path = path
+        self.fmt = fmt
+        self.devices = devices
+        self.total_rows = sum(len(block['timestamp_ns']) for block in blocks)
+        self.rows_done = 0
+        self.elapsed = 0.0
+        self.error = None
+        self.done = False
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, done, total):
+        self.rows_done = done
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            export(self.blocks, self.path, self.fmt, self.devices, self._progress, self._cancel.is_set)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - started
+            self.done = True
+
+
+def synthetic_blocks(rows, block_rows=65536, groups=50, seed=0):
+    """生成测试用的记录块：每帧 groups 个点，帧间隔 20 ms"""
+    rng = np.random.default_rng(seed)
+    start_ns = time.time_ns()
+    blocks = []
+    for first in range(0, rows, block_rows):
+        n = min(block_rows, rows - first)
+        frame = (np.arange(first, first + n) // groups).astype(np.int64)
+        blocks.append({
+            'timestamp_ns': start_ns + frame * 20_000_000,
+            'phase': rng.uniform(0, 360, n).astype(np.float32),
+            'uhf_db': rng.uniform(0, 80, n).astype(np.float32),
+            'discharge_count': rng.integers(0, 3000, n).astype(np.int32),
+            'device': np.zeros(n, dtype=np.int16),
+        })
+    return blocks
+
+
+def check_format_fixed(rows=200_000, seed=0):
+    """format_fixed 与逐个 f-string 格式化比较：随机的 float32、float64、恰好在舍入边界上的值和各种数量级，返回不一致的个数"""
+    rng = np.random.default_rng(seed)
+    wide = rng.choice([-1.0, 1.0], rows) * 10 ** rng.uniform(-6, 14, rows)
+    cases = {
+        'float32': rng.uniform(-400, 400, rows).astype(np.float32),
+        'float64': rng.uniform(-400, 400, rows),
+        '舍入边界': np.round(rng.uniform(-400, 400, rows), 3),
+        '各数量级': np.concatenate([wide, np.round(wide, 3)]),
+        '特殊值': np.array([-12.345, 2.675, -91.805, 0.005, -0.004, 0.0, -0.0, 1e15 + 0.125, np.nan, np.inf, -np.inf]),
+    }
+    mismatched = 0
+    for name, values in cases.items():
+        for decimals in (0, 1, 2, 3):
+            chars, keep = format_fixed(values, decimals)
+            texts = [bytes(row[mask]).decode() for row, mask in zip(chars, keep)]
+            expected = [f"{x:.{decimals}f}" if np.isfinite(x) else '' for x in values.tolist()]
+            bad = [(x, text, ref) for x, text, ref in zip(values.tolist(), texts, expected) if text != ref]
+            mismatched += len(bad)
+            print(f"{name:>8} {decimals} 位小数: {len(values)} 个，不一致 {len(bad)}"
+                  + (f"，例如 {bad[0][0]!r}: {bad[0][1]} / {bad[0][2]}" if bad else ''))
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测试记录数据的导出吞吐量")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="导出的行数")
+    parser.add_argument('--formats', nargs='+', default=list(EXPORT_FORMATS), choices=list(EXPORT_FORMATS))
+    parser.add_argument('--output', default=None, help="输出目录，默认为临时目录，测试后删除")
+    parser.add_argument('--keep', action='store_true', help="保留导出的文件")
+    parser.add_argument('--check', action='store_true', help="只比较定点小数格式化与 f-string 的结果")
+    args = parser.parse_args()
+
+    if args.check:
+        mismatched = check_format_fixed()
+        print("全部一致" if not mismatched else f"共 {mismatched} 个不一致")
+        return
+
+    started = time.perf_counter()
+    blocks = synthetic_blocks(args.rows)
+    print(f"生成 {args.rows} 行测试数据，耗时 {time.perf_counter() - started:.1f} s")
+    directory = args.output or tempfile.mkdtemp(prefix='gis_export_')
+    os.makedirs(directory, exist_ok=True)
+    for fmt in args.formats:
+        path = os.path.join(directory, f'benchmark_{fmt}{EXPORT_FORMATS[fmt][1]}')
+        started = time.perf_counter()
+        export(blocks, path, fmt, devices=['benchmark'])
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+        print(f"{fmt:>15}: {elapsed:6.2f} s  {args.rows / elapsed / 1e6:6.2f} M行/秒  "
+              f"{size / elapsed / 2 ** 20:7.1f} MB/秒  文件 {size / 2 ** 20:.0f} MB")
+        if not args.keep:
+            os.remove(path)
+    if not args.keep and args.output is None:
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+按时间范围查询记录的历史数据。
+
+记录目录（gis_segments 写入的 recordings/<设备>/）中的段文件打开时只读取64字节文件头和首末两条记录的时间，
+.idx 稀疏索引在第一次查询到该段文件时才读取，不读取记录本身，打开一周（168个段文件）的数据约10毫秒。
+查询时先用稀疏索引确定每个相关段文件中的记录范围，只对这一段做内存映射，再在映射的时间列上精确定位，
+返回直接映射文件内容的 numpy 记录数组，内存占用与查询窗口的大小成正比，与归档总量无关。
+同一个段文件内的记录按写入顺序即时间顺序排列。
+
+命令行：
+    python gis_history.py recordings/192.168.0.150_6789 --start "2025-03-04 14:00" --end "2025-03-04 14:05"
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from gis_segments import (HEADER_SIZE, INDEX_DTYPE, INDEX_STRIDE, build_index, index_path, read_header,
+                          record_dtype, segment_paths, verify_records)
+
+
+def to_ns(value):
+    """把 datetime、'YYYY-MM-DD HH:MM[:SS]' 字符串或纳秒整数转换为纳秒时间戳（本地时间）"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1_000_000_000)
+    return int(value)
+
+
+class SegmentInfo:
+    """一个段文件的元数据：文件头、记录数、首末记录时间和稀疏索引"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = read_header(f)
+            self.group_count = int(header['group_count'])
+            self.dtype = record_dtype(self.group_count)
+            self.device = header['device'].decode('utf-8', errors='replace')
+            self.records = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+            if self.records:
+                f.seek(HEADER_SIZE)
+                self.first_ns = int(np.frombuffer(f.read(8), dtype='<i8')[0])
+                f.seek(HEADER_SIZE + (self.records - 1) * self.dtype.itemsize)
+                self.last_ns = int(np.frombuffer(f.read(8), dtype='<i8')[0])
+            else:
+                self.first_ns = self.last_ns = int(header['created_ns'])
+        self._index = None
+
+    @property
+    def index(self):
+        """
+        稀疏索引，第一次查询到这个段文件时才读取；
+        缺失或与记录数不符（例如写入时崩溃）时从段文件重建。
+        """
+        if self._index is None:
+            path = index_path(self.path)
+            expected = (self.records + INDEX_STRIDE - 1) // INDEX_STRIDE
+            if os.path.exists(path) and os.path.getsize(path) == expected * INDEX_DTYPE.itemsize:
+                self._index = np.fromfile(path, dtype=INDEX_DTYPE)
+            else:
+                self._index = build_index(self.map(0, self.records)['timestamp_ns'])
+        return self._index
+
+    def map(self, first, last):
+        """只读映射第 first ~ last-1 条记录"""
+        if last <= first:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=HEADER_SIZE + first * self.dtype.itemsize,
+                         shape=(last - first,))
+
+    def query(self, start_ns, end_ns):
+        """返回时间在 [start_ns, end_ns) 内的记录（内存映射视图）"""
+        if not self.records or end_ns <= self.first_ns or start_ns > self.last_ns:
+            return self.map(0, 0)
+        # 稀疏索引给出包含目标范围的记录区间，误差不超过 INDEX_STRIDE 条
+        times = self.index['timestamp_ns']
+        first = self.index['record'][max(np.searchsorted(times, start_ns, 'right') - 1, 0)]
+        after = np.searchsorted(times, end_ns, 'left')
+        last = self.index['record'][after] if after < len(times) else self.records
+        window = self.map(int(first), int(last))
+        stamps = window['timestamp_ns']
+        return window[np.searchsorted(stamps, start_ns, 'left'):np.searchsorted(stamps, end_ns, 'left')]
+
+
+class HistoryStore:
+    """
+    一个记录根目录下所有设备的历史数据。
+
+    devices() 列出设备子目录，query(设备, 开始, 结束) 返回按时间顺序排列的记录数组列表（每个相关段文件一个），
+    points 把查询结果展开为放电点的列。段文件元数据在第一次查询该设备时读取并缓存，
+    refresh 重新扫描目录（例如正在记录时有新段文件）。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._segments = {}
+
+    def devices(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if segment_paths(os.path.join(self.root, name)))
+
+    def refresh(self, device=None):
+        if device is None:
+            self._segments.clear()
+        else:
+            self._segments.pop(device, None)
+
+    def segments(self, device):
+        if device not in self._segments:
+            self._segments[device] = [SegmentInfo(path) for _, path in
+                                      segment_paths(os.path.join(self.root, device))]
+        return self._segments[device]
+
+    def time_range(self, device):
+        """设备记录的最早和最晚时间（纳秒），没有记录时返回 None"""
+        segments = [segment for segment in self.segments(device) if segment.records]
+        if not segments:
+            return None
+        return min(s.first_ns for s in segments), max(s.last_ns for s in segments)
+
+    def query(self, device, start, end, verify=False):
+        """
+        返回 [start, end) 内的记录数组列表，start / end 可以是 datetime、字符串或纳秒时间戳。
+        verify=True 时过滤 CRC 校验失败的记录（会复制数据）。
+        """
+        start_ns, end_ns = to_ns(start), to_ns(end)
+        results = []
+        for segment in self.segments(device):
+            records = segment.query(start_ns, end_ns)
+            if len(records):
+                results.append(records[verify_records(records)] if verify else records)
+        return results
+
+    @staticmethod
+    def points(results):
+        """把记录数组展开为放电点的列：{timestamp_ns, phase, uhf_db, discharge_count}"""
+        columns = {'timestamp_ns': [], 'phase': [], 'uhf_db': [], 'discharge_count': []}
+        for records in results:
+            valid = np.arange(records.dtype['phase'].shape[0]) < records['size'][:, None]
+            columns['timestamp_ns'].append(np.broadcast_to(records['timestamp_ns'][:, None], valid.shape)[valid])
+            columns['phase'].append(records['phase'][valid])
+            columns['uhf_db'].append(records['uhf_db'][valid])
+            columns['discharge_count'].append(records['discharge_counts'][valid])
+        return {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in columns.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按时间范围查询记录的历史数据")
+    parser.add_argument('directory', help="设备的记录目录，例如 recordings/192.168.0.150_6789")
+    parser.add_argument('--start', help="开始时间，例如 '2025-03-04 14:00'，默认为最早的记录")
+    parser.add_argument('--end', help="结束时间，默认为最晚的记录")
+    parser.add_argument('--verify', action='store_true', help="检查每条记录的CRC")
+    args = parser.parse_args()
+
+    root, device = os.path.split(os.path.normpath(args.directory))
+    store = HistoryStore(root)
+    started = time.perf_counter()
+    segments = store.segments(device)
+    time_range = store.time_range(device)
+    opened = time.perf_counter() - started
+    if time_range is None:
+        print("没有记录")
+        return
+    total = sum(segment.records for segment in segments)
+    print(f"{len(segments)} 个段文件，共 {total} 帧，"
+          f"{datetime.fromtimestamp(time_range[0] / 1e9)} ~ {datetime.fromtimestamp(time_range[1] / 1e9)}，"
+          f"打开耗时 {opened * 1000:.1f} ms")
+
+    start = args.start or time_range[0]
+    end = args.end or time_range[1] + 1
+    started = time.perf_counter()
+    results = store.query(device, start, end, verify=args.verify)
+    frames = sum(len(records) for records in results)
+    queried = time.perf_counter() - started
+    print(f"查询到 {frames} 帧，耗时 {queried * 1000:.1f} ms")
+    if frames:
+        points = store.points(results)
+        print(f"放电点 {len(points['phase'])} 个，幅值最大 {points['uhf_db'].max():.2f} dB，"
+              f"放电次数总和 {int(points['discharge_count'].sum())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+有界、批量刷新的日志缓冲区。
+
+print 输出先写入固定容量的环形缓冲区，界面线程用定时器（例如10Hz）批量取出并一次性追加到日志控件，
+采集线程写入时只需加锁追加到 deque，不会直接操作控件。低于当前级别的日志直接过滤，
+缓冲区写满时丢弃最旧的行，两者都有计数。
+"""
+import logging
+import threading
+from collections import deque
+
+# 按关键字推断日志级别，print 输出本身不带级别信息
+LEVEL_RULES = [
+    ('Traceback', logging.ERROR),
+    ('错误', logging.ERROR),
+    ('失败', logging.ERROR),
+    ('超时', logging.WARNING),
+    ('不足', logging.WARNING),
+    ('寄存器地址', logging.DEBUG),
+]
+
+
+def classify(line, default=logging.INFO):
+    """根据内容推断一行日志的级别，不低于 default"""
+    for keyword, level in LEVEL_RULES:
+        if keyword in line:
+            # 调试输出始终按调试级别处理，其余关键字只会提高级别
+            return level if level == logging.DEBUG else max(level, default)
+    return default
+
+
+class LogSink:
+    """线程安全的日志环形缓冲区"""
+
+    def __init__(self, capacity=5000, level=logging.INFO):
+        self.capacity = capacity
+        self.level = level
+        self._lines = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0      # 缓冲区写满、尚未刷新到界面就被覆盖的行数
+        self.suppressed = 0   # 低于当前级别被过滤的行数
+
+    def write_line(self, line, level=logging.INFO):
+        if level < self.level:
+            with self._lock:
+                self.suppressed += 1
+            return
+        with self._lock:
+            if len(self._lines) == self.capacity:
+                self.dropped += 1
+            self._lines.append(line)
+            self.written += 1
+
+    def drain(self):
+        """取出所有待刷新的行"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+        return lines
+
+
+class StreamToSink:
+    """
+    文件对象适配器，用于替换 sys.stdout / sys.stderr。
+
+    每个线程单独缓存未结束的行（print 会分两次写入正文和换行符），遇到换行后整行写入 LogSink。
+    """
+
+    def __init__(self, sink, default_level=logging.INFO):
+        self.sink = sink
+        self.default_level = default_level
+        self._local = threading.local()
+
+    def write(self, text):
+        buf = getattr(self._local, 'buf', '') + text
+        if '\n' in buf:
+            *lines, buf = buf.split('\n')
+            for line in lines:
+                line = line.rstrip()
+                if line:
+                    self.sink.write_line(line, classify(line, self.default_level))
+        self._local.buf = buf
+        return len(text)
+
+    def flush(self):
+        buf = getattr(self._local, 'buf', '')
+        if buf:
+            self._local.buf = ''
+            self.sink.write_line(buf, classify(buf, self.default_level))
+
+    def isatty(self):
+        return False
@@ -0,0 +1,233 @@
+"""
+基于 asyncio 的多设备并发轮询服务。
+
+每台设备有独立的轮询周期、超时和重连退避，互不阻塞；一个慢速或掉线的传感器不会拖慢其他设备，
+整轮耗时接近最慢的单台设备。轮询节拍由 PollScheduler 控制，读取超时的节拍会被丢弃而不是排队，
+开启 adaptive 后设备安静时自动降低轮询频率，检测到放电活动时立即加快。请求构造、帧解析、寄存器解码和唤醒状态机（WakeState）
+复用 gis_protocol 中的逻辑，每台设备的解码结果写入各自的 FrameRingBuffer。
+单台设备的任何异常都只让该设备断开并退避重连，不会影响其他设备；按事务号匹配回复时，
+丢弃迟到回复的总时间也受单次读取超时限制。
+
+设备列表为 JSON 文件，例如：
+    [
+        {"name": "GIS-1", "host": "192.168.0.150", "port": 6789},
+        {"name": "GIS-2", "host": "192.168.0.151", "port": 6789, "interval": 0.5, "timeout": 2.0},
+        {"name": "GIS-3", "host": "192.168.0.152", "model": "gis_uhf_v1", "adaptive": true}
+    ]
+
+用法:
+    python gis_poller.py devices.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+from gis_acquisition import FrameRingBuffer, PollScheduler
+from gis_protocol import (DEFAULT_MODEL, DEFAULT_UNIT, MBAP_HEADER, RESPONSE_HEADER_BYTES, WAKE_UP_SEQUENCE,
+                          ModbusProtocolError, RegisterDecoder, WakeState, build_read_request,
+                          get_decode_plan, parse_mbap_header)
+
+
+@dataclass
+class DeviceConfig:
+    """单台设备的轮询配置"""
+    name: str
+    host: str
+    port: int = 6789
+    unit: int = DEFAULT_UNIT
+    model: str = DEFAULT_MODEL   # 寄存器表型号，对应 register_maps 目录下的文件名
+    interval: float = 1.0        # 轮询周期（秒）
+    timeout: float = 3.0         # 单次读取超时（秒）
+    wake_timeout: float = 5.0    # 唤醒回复等待上限（秒）
+    idle_timeout: float = 30.0   # 超过该时间没有成功读取则重新唤醒（秒）
+    retry_delay: float = 1.0     # 首次重连等待（秒）
+    max_retry_delay: float = 60.0
+    adaptive: bool = False       # 按放电活动自适应调整轮询周期
+    min_interval: float = 0.1    # 自适应时的最短周期（秒）
+    max_interval: float = 10.0   # 自适应时的最长周期（秒）
+
+
+def load_device_list(path):
+    """从JSON文件读取设备列表"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [DeviceConfig(**item) for item in json.load(f)]
+
+
+class AsyncDevicePoller(WakeState):
+    """单台设备的异步轮询器，与 DeviceSession 共用唤醒状态机：空闲超时或读取失败后才重新唤醒"""
+
+    def __init__(self, config, buffer_capacity=64):
+        super().__init__(config.idle_timeout)
+        self.config = config
+        self.decoder = RegisterDecoder(get_decode_plan(config.model))
+        self.buffer = FrameRingBuffer(buffer_capacity, self.decoder.group_count)
+        self.scheduler = PollScheduler(config.interval, config.adaptive, config.min_interval, config.max_interval)
+        self.reader = None
+        self.writer = None
+        self._transaction_id = 0
+        # 统计指标
+        self.frame_count = 0
+        self.error_count = 0
+        self.wake_count = 0
+        self.mismatched_frames = 0
+        self.last_latency = 0.0
+        self.connected = False
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.config.host, self.config.port), self.config.timeout)
+        self.connected = True
+        self.mark_asleep()
+
+    async def close(self):
+        self.connected = False
+        self.mark_asleep()
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def wake_up(self):
+        self.writer.write(WAKE_UP_SEQUENCE)
+        await self.writer.drain()
+        try:
+            response = await asyncio.wait_for(self.reader.read(1024), self.config.wake_timeout)
+            if not response:
+                raise ConnectionError("设备在唤醒过程中关闭了连接")
+        except asyncio.TimeoutError:
+            pass
+        self.wake_count += 1
+
+    async def read_response(self):
+        """读取与当前事务号匹配的回复，之前超时请求的迟到回复直接丢弃，返回回复的报文体"""
+        while True:
+            header = await self.reader.readexactly(MBAP_HEADER.size)
+            transaction_id, remaining, _ = parse_mbap_header(header)
+            body = await self.reader.readexactly(remaining)
+            if transaction_id == self._transaction_id:
+                return body
+            self.mismatched_frames += 1
+
+    async def read_frame(self):
+        """读取并解码一帧，返回有效组数"""
+        if self.writer is None:
+            await self.connect()
+        if self.state != self.AWAKE:
+            await self.wake_up()
+
+        self._transaction_id = self._transaction_id % 0xFFFF + 1
+        plan = self.decoder.plan
+        self.writer.write(build_read_request(self._transaction_id, self.config.unit,
+                                             plan.base_address, plan.read_count))
+        await self.writer.drain()
+        # 超时覆盖整个匹配过程，设备持续发送不匹配的回复时也不会无限等待
+        body = await asyncio.wait_for(self.read_response(), self.config.timeout)
+        if body[0] & 0x80:
+            raise ModbusProtocolError(f"设备返回异常响应: 功能码 {body[0]:#04x}")
+
+        groups = self.decoder.decode(memoryview(body)[RESPONSE_HEADER_BYTES - MBAP_HEADER.size:])
+        if groups:
+            self.mark_awake()
+            self.buffer.push(self.decoder)
+            self.frame_count += 1
+            self.scheduler.observe(self.decoder.discharge_counts, self.decoder.uhf_db_values)
+        else:
+            self.mark_asleep()
+        return groups
+
+    async def run(self, stop_event):
+        """按设备自己的周期轮询，任何读取或解码失败都断开连接并指数退避重连，直到 stop_event 被设置"""
+        consecutive_errors = 0
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                await self.read_frame()
+                consecutive_errors = 0
+                self.last_latency = time.monotonic() - started
+                delay = self.scheduler.next_delay(started + self.last_latency)
+            except Exception as e:
+                consecutive_errors += 1
+                self.error_count += 1
+                print(f"[{self.config.name}] 读取失败: {e!r}")
+                await self.close()
+                self.scheduler.reset()
+                self.last_latency = time.monotonic() - started
+                delay = min(self.config.retry_delay * 2 ** (consecutive_errors - 1), self.config.max_retry_delay)
+                delay = max(0.0, delay - self.last_latency)
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        await self.close()
+
+    def metrics(self):
+        return {
+            'name': self.config.name,
+            'connected': self.connected,
+            'state': self.state,
+            'frames': self.frame_count,
+            'errors': self.error_count,
+            'wake_count': self.wake_count,
+            'mismatched_frames': self.mismatched_frames,
+            'last_latency': self.last_latency,
+            **self.scheduler.metrics(),
+        }
+
+
+class FleetPoller:
+    """多设备并发轮询服务，每台设备一个独立任务"""
+
+    def __init__(self, configs, buffer_capacity=64):
+        self.pollers = {config.name: AsyncDevicePoller(config, buffer_capacity) for config in configs}
+        self._stop_event = None
+
+    def buffer(self, name):
+        return self.pollers[name].buffer
+
+    async def run(self, duration=None):
+        """并发轮询所有设备，duration 为空时一直运行到 stop() 被调用"""
+        self._stop_event = asyncio.Event()
+        tasks = [asyncio.create_task(poller.run(self._stop_event)) for poller in self.pollers.values()]
+        if duration is not None:
+            asyncio.get_running_loop().call_later(duration, self._stop_event.set)
+        # 单个任务意外退出时不取消其他设备的轮询，结束后再报告
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for name, result in zip(self.pollers, results):
+            if isinstance(result, BaseException):
+                print(f"[{name}] 轮询任务异常退出: {result!r}")
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def metrics(self):
+        return [poller.metrics() for poller in self.pollers.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GIS局放传感器多设备并发轮询")
+    parser.add_argument('devices', help="设备列表JSON文件")
+    parser.add_argument('--duration', type=float, default=None, help="运行时长（秒），默认一直运行")
+    args = parser.parse_args()
+
+    fleet = FleetPoller(load_device_list(args.devices))
+    started = time.monotonic()
+    try:
+        asyncio.run(fleet.run(args.duration))
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.monotonic() - started
+    for item in fleet.metrics():
+        print(f"{item['name']}: 帧数 {item['frames']} ({item['frames'] / elapsed:.1f} 帧/秒), "
+              f"错误 {item['errors']}, 唤醒 {item['wake_count']}, 最近耗时 {item['last_latency'] * 1000:.1f} ms, "
+              f"当前周期 {item['interval']:.2f} s, 丢弃节拍 {item['overdue_ticks']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,475 @@
+"""
+GIS局放传感器 Modbus TCP 协议相关的公共逻辑。
+
+寄存器布局由 register_maps 目录下的寄存器表（JSON或TOML）描述，默认型号 gis_uhf_v1：
+从地址100开始共50组，每组6个寄存器：
+    +0 放电次数 (uint16)
+    +1 reserve  (uint16)
+    +2 uhf_db   (float32，低字在前)
+    +4 相位     (float32，低字在前)
+
+寄存器表在第一次使用时编译为解码计划（numpy结构化dtype + 字段偏移），并按型号缓存。
+"""
+import functools
+import json
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+try:
+    import tomllib
+except ImportError:  # Python 3.11 以下只支持JSON格式的寄存器表
+    tomllib = None
+
+# 默认寄存器布局常量（与 register_maps/gis_uhf_v1.json 一致）
+BASE_ADDRESS = 100
+GROUP_COUNT = 50
+GROUP_REGISTERS = 6
+GROUP_BYTES = GROUP_REGISTERS * 2
+
+REGISTER_MAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'register_maps')
+DEFAULT_MODEL = 'gis_uhf_v1'
+
+# 寄存器表中支持的字段类型（大端字节序）
+FIELD_TYPES = {
+    'int16': '>i2',
+    'uint16': '>u2',
+    'int32': '>i4',
+    'uint32': '>u4',
+    'float32': '>f4',
+}
+
+# 解码器输出的三类数据
+ROLES = ('discharge_count', 'uhf_db', 'phase')
+
+
+def load_register_map(path):
+    """读取寄存器表文件（.json 或 .toml）"""
+    if path.endswith('.toml'):
+        if tomllib is None:
+            raise RuntimeError("读取TOML格式的寄存器表需要 Python 3.11 及以上版本")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class DecodePlan:
+    """
+    寄存器表编译后的解码计划。
+
+    每组寄存器对应结构化dtype中的一条记录，字段按寄存器偏移定位；低字在前的32位字段
+    按两个uint16读取，解码时交换后再按目标类型重新解释。
+    """
+
+    def __init__(self, register_map):
+        self.model = register_map['model']
+        self.base_address = register_map.get('base_address', BASE_ADDRESS)
+        self.group_count = register_map.get('group_count', GROUP_COUNT)
+        self.group_registers = register_map.get('group_registers', GROUP_REGISTERS)
+        self.read_count = register_map.get('read_count', self.group_count * self.group_registers)
+        self.group_bytes = self.group_registers * 2
+        self.fields = register_map['fields']
+        if self.group_count * self.group_registers > self.read_count:
+            raise ValueError(f"寄存器表 {self.model}: {self.group_count} 组超出读取数量 {self.read_count}")
+
+        names, formats, offsets = [], [], []
+        # 每个需要输出的字段: (输出类型, 字段名, 交换字序后的类型或None, 保留小数位数或None)
+        self.steps = []
+        for field in self.fields:
+            field_type = FIELD_TYPES.get(field['type'])
+            if field_type is None:
+                raise ValueError(f"寄存器表 {self.model}: 不支持的字段类型 {field['type']}")
+            swapped = field_type[-1] == '4' and field.get('word_order', 'big') == 'little'
+            names.append(field['name'])
+            formats.append(('>u2', (2,)) if swapped else field_type)
+            offsets.append(field['offset'] * 2)
+            if field['offset'] * 2 + np.dtype(field_type).itemsize > self.group_bytes:
+                raise ValueError(f"寄存器表 {self.model}: 字段 {field['name']} 超出分组范围")
+            if 'role' in field:
+                self.steps.append((field['role'], field['name'], field_type if swapped else None, field.get('round')))
+
+        missing = set(ROLES) - {step[0] for step in self.steps}
+        if missing:
+            raise ValueError(f"寄存器表 {self.model}: 缺少字段 {', '.join(sorted(missing))}")
+        self.dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                               'itemsize': self.group_bytes})
+
+    def field_address(self, group, field):
+        return self.base_address + group * self.group_registers + field['offset']
+
+
+@functools.lru_cache(maxsize=None)
+def get_decode_plan(model=DEFAULT_MODEL):
+    """按型号加载并编译寄存器表，结果缓存，每个型号只编译一次"""
+    for suffix in ('.json', '.toml'):
+        path = os.path.join(REGISTER_MAP_DIR, model + suffix)
+        if os.path.exists(path):
+            return DecodePlan(load_register_map(path))
+    raise FileNotFoundError(f"找不到型号 {model} 的寄存器表: {REGISTER_MAP_DIR}")
+
+
+class RegisterDecoder:
+    """
+    整帧寄存器解码器。
+
+    按解码计划一次性把回复报文解析为放电次数、uhf_db和相位三个数组，结果写入预分配的数组并在每次轮询之间复用。
+    解码结果通过 discharge_counts / uhf_db_values / phase_values 属性读取（长度为本帧有效组数的视图）。
+    """
+
+    def __init__(self, plan=None, verbose=False):
+        self.plan = plan or get_decode_plan()
+        self.group_count = self.plan.group_count
+        self.verbose = verbose
+        self.size = 0
+        self._counts = np.zeros(self.group_count, dtype=np.int32)
+        self._uhf_db = np.zeros(self.group_count, dtype=np.float64)
+        self._phase = np.zeros(self.group_count, dtype=np.float64)
+        self._outputs = {'discharge_count': self._counts, 'uhf_db': self._uhf_db, 'phase': self._phase}
+        # 字交换用的暂存区，每个低字在前的字段一个
+        self._swap = {name: np.empty((self.group_count, 2), dtype='>u2')
+                      for _, name, swapped_type, _ in self.plan.steps if swapped_type}
+
+    @property
+    def discharge_counts(self):
+        return self._counts[:self.size]
+
+    @property
+    def uhf_db_values(self):
+        return self._uhf_db[:self.size]
+
+    @property
+    def phase_values(self):
+        return self._phase[:self.size]
+
+    def decode(self, data):
+        """解析一帧寄存器数据（不含9字节报文头），返回有效组数"""
+        plan = self.plan
+        groups = min(len(data) // plan.group_bytes, self.group_count)
+        if groups < self.group_count:
+            print(f"数据不足：仅收到 {len(data)} 字节，解析 {groups}/{self.group_count} 组")
+
+        records = np.frombuffer(data, dtype=plan.dtype, count=groups)
+        for role, name, swapped_type, decimals in plan.steps:
+            column = records[name]
+            if swapped_type:
+                # 交换高低字后按目标类型重新解释
+                swap = self._swap[name][:groups]
+                swap[:, 0] = column[:, 1]
+                swap[:, 1] = column[:, 0]
+                column = swap.view(swapped_type)[:, 0]
+            out = self._outputs[role][:groups]
+            out[...] = column
+            if decimals is not None:
+                # 先扩展到 float64 再舍入，与逐个 round(float(x), decimals) 相同，也不会在 float32 中溢出
+                np.round(out, decimals, out=out)
+
+        self.size = groups
+        if self.verbose:
+            self.dump(data)
+        return groups
+
+    def dump(self, data):
+        """逐寄存器输出解析结果和原始报文（仅在调试模式下使用）"""
+        plan = self.plan
+        records = np.frombuffer(data, dtype=plan.dtype, count=self.size)
+        for i in range(self.size):
+            for field in plan.fields:
+                value = records[field['name']][i]
+                if value.shape:
+                    value = value[::-1].astype('>u2').view(FIELD_TYPES[field['type']])[0]
+                offset = i * plan.group_bytes + field['offset'] * 2
+                raw_data = data[offset:offset + np.dtype(FIELD_TYPES[field['type']]).itemsize]
+                print(f"寄存器地址 {plan.field_address(i, field)}: {value} ({field['name']}), "
+                      f"原始报文: {bytes(raw_data).hex()}")
+
+
+# 唤醒指令
+WAKE_UP_SEQUENCE = bytes([0xFF, 0xFE, 0xFF, 0xFE])
+
+# 读取遥测寄存器的默认参数：单元号2，功能码4，起始地址100，数量399（具体型号以寄存器表为准）
+DEFAULT_UNIT = 0x02
+READ_FUNCTION_CODE = 0x04
+READ_COUNT = 0x18F
+RESPONSE_HEADER_BYTES = 9  # MBAP报文头7字节 + 功能码 + 字节数
+
+MBAP_HEADER = struct.Struct('>HHHB')  # 事务号, 协议号, 长度, 单元号
+READ_REQUEST_FORMAT = struct.Struct('>HHHBBHH')
+
+
+class ModbusProtocolError(Exception):
+    """设备回复不符合 Modbus TCP 协议"""
+
+
+def build_read_request(transaction_id, unit=DEFAULT_UNIT, address=BASE_ADDRESS, count=READ_COUNT):
+    """构造功能码4的读取请求报文"""
+    return READ_REQUEST_FORMAT.pack(transaction_id, 0, 6, unit, READ_FUNCTION_CODE, address, count)
+
+
+def parse_mbap_header(header):
+    """解析7字节MBAP报文头，返回 (事务号, 后续字节数, 单元号)"""
+    transaction_id, protocol_id, length, unit = MBAP_HEADER.unpack(header)
+    if protocol_id != 0 or length < 2:
+        raise ModbusProtocolError(f"无效的MBAP报文头: {bytes(header).hex()}")
+    # 长度字段包含单元号本身
+    return transaction_id, length - 1, unit
+
+
+def encode_registers(discharge_counts, uhf_db_values, phase_values, plan=None):
+    """按寄存器表把一帧数据编码为 read_count 个寄存器（RegisterDecoder 的逆过程，用于模拟器和测试）"""
+    plan = plan or get_decode_plan()
+    groups = len(discharge_counts)
+    data = bytearray(plan.read_count * 2)
+    records = np.frombuffer(data, dtype=plan.dtype, count=groups)
+    values = {'discharge_count': discharge_counts, 'uhf_db': uhf_db_values, 'phase': phase_values}
+    for role, name, swapped_type, _ in plan.steps:
+        if swapped_type:
+            words = np.asarray(values[role]).astype(swapped_type).view('>u2').reshape(groups, 2)
+            records[name] = words[:, ::-1]
+        else:
+            records[name] = values[role]
+    return bytes(data)
+
+
+def build_read_response(transaction_id, unit, data, function_code=READ_FUNCTION_CODE):
+    """构造读取请求的回复报文，字节数字段与设备一致只保留低8位"""
+    return MBAP_HEADER.pack(transaction_id, 0, len(data) + 3, unit) + bytes([function_code, len(data) & 0xFF]) + data
+
+
+def build_exception_response(transaction_id, unit, function_code, exception_code):
+    """构造异常响应报文"""
+    return MBAP_HEADER.pack(transaction_id, 0, 3, unit) + bytes([function_code | 0x80, exception_code])
+
+
+class ModbusFrameReader:
+    """
+    按MBAP报文头精确读取完整回复帧。
+
+    先读7字节报文头，再按声明的长度读取剩余部分，全部通过 recv_into 写入预分配的 bytearray，
+    不会因为TCP分段而把半帧数据交给解码器。返回的数据是内部缓冲区的 memoryview，
+    在读取下一帧之前有效。
+    """
+
+    def __init__(self, read_count=READ_COUNT):
+        max_frame_bytes = RESPONSE_HEADER_BYTES + read_count * 2 + 64
+        self._buffer = bytearray(max_frame_bytes)
+        self._view = memoryview(self._buffer)
+
+    def recv_exact(self, sock, start, size):
+        """从 sock 读取恰好 size 字节到缓冲区的 start 位置"""
+        end = start + size
+        while start < end:
+            received = sock.recv_into(self._view[start:end])
+            if received == 0:
+                raise ConnectionError("设备关闭了连接")
+            start += received
+
+    def read_frame(self, sock):
+        """读取一帧回复，返回 (事务号, 功能码, 寄存器数据)"""
+        header_size = MBAP_HEADER.size
+        self.recv_exact(sock, 0, header_size)
+        transaction_id, remaining, unit = parse_mbap_header(self._view[:header_size])
+        if header_size + remaining > len(self._buffer):
+            raise ModbusProtocolError(f"回复长度 {remaining} 超出缓冲区大小")
+        self.recv_exact(sock, header_size, remaining)
+
+        function_code = self._buffer[header_size]
+        if function_code & 0x80:
+            code = self._buffer[header_size + 1] if remaining > 1 else None
+            raise ModbusProtocolError(f"设备返回异常响应: 功能码 {function_code:#04x}, 异常码 {code}")
+        # 字节数字段只有1字节，读取399个寄存器时会溢出，因此以MBAP长度为准
+        return transaction_id, function_code, self._view[RESPONSE_HEADER_BYTES:header_size + remaining]
+
+
+class WakeState:
+    """
+    设备唤醒状态机，DeviceSession 和 gis_poller 的异步轮询器共用。
+
+    设备状态分为三种：
+        awake         最近一次读取成功，且未超过空闲超时
+        idle-timeout  距最近一次成功读取已超过 idle_timeout，下一次读取前需要重新唤醒
+        asleep        尚未唤醒，或最近一次读取失败/回复为空
+    """
+
+    AWAKE = 'awake'
+    IDLE_TIMEOUT = 'idle-timeout'
+    ASLEEP = 'asleep'
+
+    def __init__(self, idle_timeout=30.0):
+        self.idle_timeout = idle_timeout
+        self._state = self.ASLEEP
+        self._last_activity = 0.0
+
+    @property
+    def state(self):
+        if self._state == self.AWAKE and time.monotonic() - self._last_activity > self.idle_timeout:
+            return self.IDLE_TIMEOUT
+        return self._state
+
+    def mark_awake(self):
+        """记录一次成功读取"""
+        self._state = self.AWAKE
+        self._last_activity = time.monotonic()
+
+    def mark_asleep(self):
+        self._state = self.ASLEEP
+
+
+class DeviceSession(WakeState):
+    """
+    设备会话：跟踪设备的唤醒状态（见 WakeState），只在需要时发送唤醒指令。
+
+    唤醒后不再固定等待5秒，而是最多等待 wake_timeout 秒，收到设备回复后立即继续。
+    每次读取可以连续发送 pipeline_depth 个请求，再按事务号依次匹配回复。
+    client 为空时在第一次使用时调用 client_factory 创建客户端，连接也推迟到第一次读取。
+    capture 设置为 gis_capture.CaptureWriter 时，每帧回复的寄存器数据在解码前写入抓包文件。
+    """
+
+    def __init__(self, client, decoder, idle_timeout=30.0, wake_timeout=5.0, read_timeout=3.0,
+                 unit=DEFAULT_UNIT, pipeline_depth=1, client_factory=None):
+        super().__init__(idle_timeout)
+        self._client = client
+        self.client_factory = client_factory
+        self.decoder = decoder
+        self.wake_timeout = wake_timeout
+        self.read_timeout = read_timeout
+        self.unit = unit
+        self.pipeline_depth = pipeline_depth
+        self.reader = ModbusFrameReader(decoder.plan.read_count)
+        self.capture = None
+        self._transaction_id = 0
+        # 统计指标
+        self.wake_count = 0
+        self.wake_timeouts = 0
+        self.last_wake_latency = 0.0
+        self.total_wake_latency = 0.0
+        self.read_count = 0
+        self.failed_reads = 0
+        self.mismatched_frames = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client
+
+    def metrics(self):
+        """返回唤醒和读取相关的统计指标"""
+        return {
+            'state': self.state,
+            'wake_count': self.wake_count,
+            'wake_timeouts': self.wake_timeouts,
+            'last_wake_latency': self.last_wake_latency,
+            'avg_wake_latency': self.total_wake_latency / self.wake_count if self.wake_count else 0.0,
+            'read_count': self.read_count,
+            'failed_reads': self.failed_reads,
+            'mismatched_frames': self.mismatched_frames,
+        }
+
+    def close(self):
+        self.mark_asleep()
+        if self._client is not None:
+            self._client.close()
+
+    def connect(self):
+        """建立连接（已连接时直接返回），返回是否连接成功"""
+        return self.client.socket is not None or self.client.connect()
+
+    def _socket(self):
+        if self.client.socket is None and not self.client.connect():
+            raise ConnectionError("无法连接到设备")
+        return self.client.socket
+
+    def _next_transaction_id(self):
+        self._transaction_id = self._transaction_id % 0xFFFF + 1
+        return self._transaction_id
+
+    def wake_up(self):
+        """发送唤醒指令，并在 wake_timeout 内等待设备回复"""
+        sock = self._socket()
+        started = time.monotonic()
+        try:
+            sock.sendall(WAKE_UP_SEQUENCE)
+            sock.settimeout(self.wake_timeout)
+            response = sock.recv(1024)
+            if not response:
+                raise ConnectionError("设备在唤醒过程中关闭了连接")
+            print(f"收到唤醒回复: {response.hex()}")
+        except socket.timeout:
+            self.wake_timeouts += 1
+            print(f"等待唤醒回复超时 ({self.wake_timeout}秒)")
+        except OSError as e:
+            print(f"发送唤醒指令失败: {e}")
+            self.close()
+            raise
+        finally:
+            if self.client.socket is not None:
+                self.client.socket.settimeout(self.read_timeout)
+
+        self.last_wake_latency = time.monotonic() - started
+        self.total_wake_latency += self.last_wake_latency
+        self.wake_count += 1
+
+    def _request_frames(self, depth, on_frame):
+        """连续发送 depth 个读取请求，按事务号匹配回复并逐帧解码，返回成功解码的帧数"""
+        sock = self._socket()
+        pending = [self._next_transaction_id() for _ in range(depth)]
+        self.read_count += depth
+        frames = 0
+        try:
+            plan = self.decoder.plan
+            sock.sendall(b''.join(build_read_request(tid, self.unit, plan.base_address, plan.read_count)
+                                  for tid in pending))
+            while pending:
+                transaction_id, _, data = self.reader.read_frame(sock)
+                if transaction_id not in pending:
+                    # 之前超时请求的迟到回复，直接丢弃
+                    self.mismatched_frames += 1
+                    continue
+                pending.remove(transaction_id)
+                capture = self.capture
+                if capture is not None:
+                    capture.write(data)
+                groups = self.decoder.decode(data)
+                if groups:
+                    frames += 1
+                    if on_frame is not None:
+                        on_frame(groups)
+        except socket.timeout:
+            # 连接上可能还有未读完的回复，关闭连接以免后续帧错位
+            print("等待设备回复超时")
+            self.close()
+        except (OSError, ModbusProtocolError) as e:
+            print(f"读取设备数据失败: {e}")
+            self.close()
+            raise
+        return frames
+
+    def read_frames(self, depth=None, on_frame=None):
+        """
+        读取并解码 depth 帧数据（默认 pipeline_depth），每解码一帧调用一次 on_frame(groups)，
+        返回成功解码的帧数
+        """
+        depth = depth or self.pipeline_depth
+        if self.state != self.AWAKE:
+            self.wake_up()
+        frames = self._request_frames(depth, on_frame)
+        if not frames:
+            # 回复为空或读取失败，设备可能已进入休眠：重新唤醒后再试一次
+            self.mark_asleep()
+            self.wake_up()
+            frames = self._request_frames(depth, on_frame)
+
+        if frames:
+            self.mark_awake()
+        else:
+            self.failed_reads += 1
+            self.mark_asleep()
+        return frames
+
+    def read_frame(self):
+        """读取并解码一帧数据，返回有效组数"""
+        return self.decoder.size if self.read_frames(1) else 0
@@ -0,0 +1,274 @@
+"""
+PRPD/PRPS 图谱数据的累积与滚动缓冲。
+
+与绘图无关，只依赖 numpy；图表每帧直接读取这里的数组，渲染耗时与累积的点数无关。
+PrpdRasterizer 把相位/幅值数据直接栅格化为识别服务需要的 64×64 灰度数组，不经过 Matplotlib 和临时文件。
+"""
+import os
+from collections import deque
+
+import numpy as np
+
+# 相位分辨率：360° 分为72个区间，每个区间5°
+PHASE_BINS = 72
+# 幅值分辨率：0~80 dB 分为80个区间，每个区间1 dB
+AMPLITUDE_BINS = 80
+AMPLITUDE_RANGE = (0.0, 80.0)
+
+# 训练图像中除放电点以外的静态部分（参考正弦、图例、坐标轴文字）按 cv2 灰度读取的 1250×625 像素，
+# 由 pd_recognition_system/svm_raster_test.py --save-background 从训练图像生成
+PRPD_BACKGROUND_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gis_prpd_background.npz')
+
+
+class PrpdHistogram:
+    """
+    累加PRPD图：相位区间 × 幅值区间的二维放电计数。
+
+    每帧的点先换算成一维区间编号，再用 np.bincount 一次性累加，内存和绘制耗时只与区间数有关，
+    与累加的帧数无关。累加方式：
+        window  滑动窗口，只保留最近 window 帧；每帧的区间编号单独保存，移出窗口时减去
+        decay   指数衰减，每帧先把已有计数乘以 decay，半衰期为 log(0.5) / log(decay) 帧
+        all     不衰减，累加全部帧
+    """
+
+    MODES = ('window', 'decay', 'all')
+
+    def __init__(self, phase_bins=PHASE_BINS, amplitude_bins=AMPLITUDE_BINS, amplitude_range=AMPLITUDE_RANGE,
+                 mode='window', window=500, decay=0.99):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的累加方式: {mode}")
+        self.phase_bins = phase_bins
+        self.amplitude_bins = amplitude_bins
+        self.amplitude_range = amplitude_range
+        self.mode = mode
+        self.window = window
+        self.decay = decay
+        self.counts = np.zeros((phase_bins, amplitude_bins), dtype=np.float64)
+        self._flat = self.counts.reshape(-1)
+        self._frames = deque()
+        self.frames = 0  # 当前计入的帧数
+
+    def clear(self):
+        self.counts.fill(0)
+        self._frames.clear()
+        self.frames = 0
+
+    def bin_index(self, phase_values, uhf_db_values):
+        """把 (相位, 幅值) 换算为一维区间编号，超出幅值范围的点归入两端的区间"""
+        low, high = self.amplitude_range
+        phase_index = (np.asarray(phase_values) * (self.phase_bins / 360.0)).astype(np.intp) % self.phase_bins
+        amplitude_index = ((np.asarray(uhf_db_values) - low) * (self.amplitude_bins / (high - low))).astype(np.intp)
+        np.clip(amplitude_index, 0, self.amplitude_bins - 1, out=amplitude_index)
+        return phase_index * self.amplitude_bins + amplitude_index
+
+    def add(self, phase_values, uhf_db_values):
+        """累加一帧数据"""
+        index = self.bin_index(phase_values, uhf_db_values)
+        size = self._flat.size
+        if self.mode == 'decay':
+            self._flat *= self.decay
+        self._flat += np.bincount(index, minlength=size)
+        self.frames += 1
+        if self.mode == 'window':
+            self._frames.append(index)
+            while len(self._frames) > self.window:
+                self._flat -= np.bincount(self._frames.popleft(), minlength=size)
+                self.frames -= 1
+
+    def density(self, out=None):
+        """返回按最大值归一化的密度（0~1），计数为0的区间为 NaN，形状为 (幅值区间, 相位区间)"""
+        if out is None:
+            out = np.empty((self.amplitude_bins, self.phase_bins), dtype=np.float32)
+        peak = self._flat.max()
+        np.copyto(out, self.counts.T)
+        # 滑动窗口相减可能留下极小的浮点残差，按0处理
+        out[out < 1e-6] = np.nan
+        if peak > 0:
+            out /= peak
+        return out
+
+    def points(self):
+        """返回计数不为0的区间中心 (相位, 幅值)，用于把累加结果交给识别服务"""
+        low, high = self.amplitude_range
+        phase_index, amplitude_index = np.nonzero(self.counts > 1e-6)
+        phase_values = (phase_index + 0.5) * (360.0 / self.phase_bins)
+        uhf_db_values = low + (amplitude_index + 0.5) * ((high - low) / self.amplitude_bins)
+        return phase_values, uhf_db_values
+
+
+class PrpsBuffer:
+    """
+    最近 cycles 个工频周期的PRPS滚动缓冲（周期 × 相位区间 → 最大幅值）。
+
+    每帧数据按相位分箱后取各区间的最大幅值，作为一个周期写入缓冲区。
+    存储高度为 2 × cycles，每行同时写入 i 和 i + cycles 两个位置，
+    因此按时间顺序排列的最近 cycles 行始终是一段连续切片，view() 不需要拷贝或 np.roll。
+    """
+
+    def __init__(self, cycles=50, phase_bins=PHASE_BINS, dtype=np.float32):
+        self.cycles = cycles
+        self.phase_bins = phase_bins
+        self._data = np.zeros((2 * cycles, phase_bins), dtype=dtype)
+        self._row = np.zeros(phase_bins, dtype=dtype)
+        self._next = 0      # 下一行的写入位置
+        self.count = 0      # 已写入的周期数
+
+    def clear(self):
+        self._data.fill(0)
+        self._next = 0
+        self.count = 0
+
+    def push(self, phase_values, uhf_db_values):
+        """写入一个周期的数据"""
+        row = self._row
+        row.fill(0)
+        if len(phase_values):
+            index = (np.asarray(phase_values) * (self.phase_bins / 360.0)).astype(np.intp) % self.phase_bins
+            np.maximum.at(row, index, uhf_db_values)
+        self._data[self._next] = row
+        self._data[self._next + self.cycles] = row
+        self._next = (self._next + 1) % self.cycles
+        self.count += 1
+
+    def view(self):
+        """返回最近 cycles 个周期，第0行最旧、最后一行最新（只读视图，下一次 push 后内容会变化）"""
+        return self._data[self._next:self._next + self.cycles]
+
+
+class PrpdRasterizer:
+    """
+    把PRPD数据栅格化为识别服务使用的灰度数组（默认 64×64，uint8）。
+
+    按训练图像中 1250×625、蓝色放电点、红色参考正弦 50+50·sin、纵轴 0~100 的一种样式生成。
+    训练集中还有红色放电点/灰色正弦的 1250×625 图像以及 700×350、1300×650 的图像，这些样式不模拟，
+    因此识别结果只对这一种样式与上传原图一致。服务端用 cv2.imread 按灰度读取PNG（忽略透明度：
+    透明背景和透明黑色的网格线读作黑色，坐标轴文字和抗锯齿边缘读作原色），再用 cv2.resize 双线性缩放到 64×64。
+
+    静态部分（参考正弦、图例、坐标轴文字）直接使用从训练图像中取出的像素（background，默认读取
+    PRPD_BACKGROUND_FILE），文件不存在时按版面参数近似绘制参考正弦和图例色块，不含文字。
+    放电点按像素方格与圆是否相交判断（抗锯齿边缘读作原色），只画在绘图区内。
+    双线性缩放每个输出像素只用到原图的2×2个像素，因此只计算这些采样点，结果是确定的。
+    与原图的一致程度用 pd_recognition_system/svm_raster_test.py 检查：从训练图像中提取放电点重新栅格化，
+    比较与原图的灰度差和识别结果。
+    """
+
+    # 训练图像的版面参数（原图像素坐标）
+    WIDTH = 1250
+    HEIGHT = 625
+    PLOT_LEFT = 42.5        # 相位 0°
+    PLOT_RIGHT = 1233.5     # 相位 360°
+    PLOT_TOP = 39.5         # 幅值 100
+    PLOT_BOTTOM = 589.5     # 幅值 0
+    AMPLITUDE_MAX = 100.0
+    SINE_HALF_WIDTH = 5.0   # 参考正弦线宽的一半
+    DOT_RADIUS = 5.45       # 与圆相交的像素都读作圆点灰度，按实测的圆点面积（约117个像素）确定
+    # 训练图像带 sRGB 标记，cv2 按灰度读取时由 libpng 在线性光空间换算，与 0.299R + 0.587G + 0.114B 不同，
+    # 以下为从训练图像中实测的灰度
+    SINE_GRAY = 147         # 红色 (255, 0, 0)
+    DOT_GRAY = 144          # 浅蓝色 (34, 149, 243)
+    # 图例色块: (左, 上, 右, 下, 灰度, 边框宽度)，边框宽度为0表示实心
+    LEGEND_BOXES = [(475, 11, 526, 28, DOT_GRAY, 0), (670, 11, 722, 28, SINE_GRAY, 2)]
+
+    def __init__(self, size=64, background=PRPD_BACKGROUND_FILE):
+        """background 为 (HEIGHT, WIDTH) 的 uint8 静态部分或其 .npz 文件路径，None 或文件不存在时近似绘制"""
+        self.size = size
+        self._x_taps, self._x_weights, self._xs = self._linear_taps(self.WIDTH, size)
+        self._y_taps, self._y_weights, self._ys = self._linear_taps(self.HEIGHT, size)
+        if isinstance(background, str):
+            background = self.load_background(background) if os.path.exists(background) else None
+        # 是否使用了从训练图像中取出的静态部分
+        self.exact_background = background is not None
+        if background is not None:
+            self._background = np.asarray(background, dtype=np.float64)[np.ix_(self._ys.astype(np.intp),
+                                                                               self._xs.astype(np.intp))]
+        else:
+            self._background = self._render_background()
+
+    @classmethod
+    def load_background(cls, path):
+        with np.load(path) as data:
+            background = data['background']
+        if background.shape != (cls.HEIGHT, cls.WIDTH):
+            raise ValueError(f"{path} 的尺寸为 {background.shape}，应为 {(cls.HEIGHT, cls.WIDTH)}")
+        return background
+
+    @staticmethod
+    def _linear_taps(src, dst):
+        """cv2.resize 双线性插值的采样位置和权重，返回 (采样点编号, 权重, 用到的原图坐标)"""
+        fx = (np.arange(dst) + 0.5) * (src / dst) - 0.5
+        x0 = np.floor(fx).astype(np.intp)
+        weight = fx - x0
+        weight[x0 < 0] = 0.0
+        x0 = np.clip(x0, 0, src - 1)
+        x1 = np.minimum(x0 + 1, src - 1)
+        coords, index = np.unique(np.concatenate((x0, x1)), return_inverse=True)
+        return index.reshape(2, dst), weight, coords.astype(np.float64)
+
+    def _render_background(self):
+        """近似计算采样点上的静态部分：参考正弦和图例色块"""
+        xs, ys = self._xs, self._ys
+        background = np.zeros((len(ys), len(xs)), dtype=np.float64)
+
+        # 参考正弦：按竖直距离和斜率近似到曲线的垂直距离，只画在绘图区内
+        x_scale = (self.PLOT_RIGHT - self.PLOT_LEFT) / 360.0
+        y_scale = (self.PLOT_BOTTOM - self.PLOT_TOP) / self.AMPLITUDE_MAX
+        phase = np.radians((xs - self.PLOT_LEFT) / x_scale)
+        curve = self.PLOT_BOTTOM - (50.0 + 50.0 * np.sin(phase)) * y_scale
+        slope = -50.0 * np.cos(phase) * y_scale * np.pi / 180.0 / x_scale
+        half_height = self.SINE_HALF_WIDTH * np.sqrt(1.0 + slope ** 2)
+        sine = np.abs(ys[:, None] - curve[None, :]) <= half_height[None, :]
+        sine &= ((ys >= self.PLOT_TOP) & (ys <= self.PLOT_BOTTOM))[:, None]
+        sine &= ((xs >= self.PLOT_LEFT) & (xs <= self.PLOT_RIGHT))[None, :]
+        background[sine] = self.SINE_GRAY
+
+        for left, top, right, bottom, gray, border in self.LEGEND_BOXES:
+            inside_x = (xs >= left) & (xs <= right)
+            inside_y = (ys >= top) & (ys <= bottom)
+            box = inside_y[:, None] & inside_x[None, :]
+            if border:
+                inner = (((ys >= top + border) & (ys <= bottom - border))[:, None] &
+                         ((xs >= left + border) & (xs <= right - border))[None, :])
+                box &= ~inner
+            background[box] = gray
+        return background
+
+    @staticmethod
+    def _nearby(coords, values, radius):
+        """每个值附近（距离不超过 radius）的采样点编号，返回 (编号, 是否有效)，第一维为宽 2·radius 的范围内最多的采样点数"""
+        count = int((np.searchsorted(coords, coords + 2 * radius, side='right') - np.arange(len(coords))).max())
+        first = np.searchsorted(coords, values - radius)
+        index = first + np.arange(count)[:, None]
+        valid = index < len(coords)
+        index = np.minimum(index, len(coords) - 1)
+        valid &= np.abs(coords[index] - values) <= radius
+        return index, valid
+
+    def render(self, phase_values, uhf_db_values):
+        """返回 (size, size) 的 uint8 灰度数组，对应同样数据的训练样式图像经 cv2 灰度读取并缩放后的结果"""
+        layer = self._background.copy()
+        phase_values = np.mod(np.asarray(phase_values, dtype=np.float64), 360.0)
+        uhf_db_values = np.asarray(uhf_db_values, dtype=np.float64)
+        if len(phase_values):
+            x = self.PLOT_LEFT + phase_values * ((self.PLOT_RIGHT - self.PLOT_LEFT) / 360.0)
+            y = self.PLOT_BOTTOM - uhf_db_values * ((self.PLOT_BOTTOM - self.PLOT_TOP) / self.AMPLITUDE_MAX)
+            r = self.DOT_RADIUS
+            cols, col_valid = self._nearby(self._xs, x, r + 0.5)
+            rows, row_valid = self._nearby(self._ys, y, r + 0.5)
+            # 圆点被裁剪在绘图区内
+            col_valid &= ((self._xs >= np.floor(self.PLOT_LEFT)) & (self._xs <= np.floor(self.PLOT_RIGHT)))[cols]
+            row_valid &= ((self._ys >= np.floor(self.PLOT_TOP)) & (self._ys <= np.floor(self.PLOT_BOTTOM)))[rows]
+            for i in range(len(cols)):
+                dx = np.maximum(np.abs(self._xs[cols[i]] - x) - 0.5, 0.0)
+                for j in range(len(rows)):
+                    dy = np.maximum(np.abs(self._ys[rows[j]] - y) - 0.5, 0.0)
+                    hit = col_valid[i] & row_valid[j] & (dx * dx + dy * dy < r * r)
+                    layer[rows[j][hit], cols[i][hit]] = self.DOT_GRAY
+
+        # 双线性插值到输出尺寸
+        x0, x1 = self._x_taps
+        y0, y1 = self._y_taps
+        wx = self._x_weights[None, :]
+        wy = self._y_weights[:, None]
+        top = layer[y0][:, x0] * (1 - wx) + layer[y0][:, x1] * wx
+        bottom = layer[y1][:, x0] * (1 - wx) + layer[y1][:, x1] * wx
+        return np.rint(top * (1 - wy) + bottom * wy).astype(np.uint8)
@@ -0,0 +1,34 @@
+"""
+PRPD图的绘图样式，界面画布（gis_canvas）和离线批量导出（gis_dataset_export）共用，
+保证导出的训练图像与界面上看到的PRPD图一致。
+
+只使用 Matplotlib 的面向对象接口，不导入 Qt，可以在无界面的 Agg 后端下使用。
+"""
+import matplotlib
+import numpy as np
+
+# PRPD散点的样式，颜色表示幅值
+PRPD_SCATTER_STYLE = dict(cmap='viridis', vmin=0, vmax=80, alpha=0.7, s=50, edgecolors='w')
+
+
+def apply_font_settings():
+    # 设置默认字体为SimHei（或其他支持中文的字体）
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']
+    # 解决负号"-"显示为方块的问题
+    matplotlib.rcParams['axes.unicode_minus'] = False
+
+
+def setup_prpd_axes(ax):
+    """设置PRPD图的基本显示信息"""
+    ax.set_xlabel('相位 (°)', fontsize=12)
+    ax.set_ylabel('幅值 (dB)', fontsize=12)
+    ax.set_xlim(0, 360)
+    ax.set_ylim(0, 80)
+    ax.set_title('PRPD图 (相位分辨局部放电)', fontsize=14, fontweight='bold')
+    ax.grid(True, linestyle='--', alpha=0.7)
+
+    # 添加参考波形
+    x = np.linspace(0, 360, 1000)
+    y = 40 + 40 * np.sin(np.radians(x))
+    ax.plot(x, y, 'r-', label='参考波形', linewidth=2, alpha=0.5)
+    ax.legend(loc='upper right')
@@ -0,0 +1,294 @@
+"""
+基于 QImage 的轻量PRPD/PRPS热图控件，只依赖 PyQt5 和 numpy，不导入 Matplotlib。
+
+二维数组先按颜色查找表（LUT）一次性映射为 ARGB32 像素，直接构造 QImage，再由 QPainter 缩放到绘图区域，
+每帧耗时只与区间数（72×80）有关，多个传感器面板同时刷新也能保持 30 FPS 以上。
+坐标轴、参考正弦和颜色条由 QPainter 绘制；滚轮以鼠标位置为中心缩放，双击恢复完整范围。
+需要出版质量的图像时仍使用 gis_canvas 中的 Matplotlib 画布导出。
+"""
+import numpy as np
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPainterPath, QPen, QTransform
+from PyQt5.QtWidgets import QHBoxLayout, QWidget
+
+from gis_prpd import AMPLITUDE_BINS, AMPLITUDE_RANGE, PHASE_BINS, PrpdHistogram
+
+# viridis 色表的17个等间距锚点，中间线性插值，与 Matplotlib 的 viridis 相差不超过5个色阶
+VIRIDIS_ANCHORS = [
+    (68, 1, 84), (72, 24, 106), (71, 45, 123), (66, 64, 134), (59, 82, 139), (51, 99, 141),
+    (44, 114, 142), (38, 130, 142), (33, 145, 140), (31, 160, 136), (40, 174, 128), (63, 188, 115),
+    (94, 201, 98), (132, 212, 75), (173, 220, 48), (216, 226, 25), (253, 231, 37),
+]
+
+
+def colormap_lut(anchors=VIRIDIS_ANCHORS, levels=256):
+    """
+    把锚点颜色插值为 levels 级 ARGB32 颜色（uint32），末尾再附加一个全透明颜色，
+    数组中的 NaN 映射到这一项，显示为背景色。
+    """
+    anchors = np.asarray(anchors, dtype=np.float64)
+    positions = np.linspace(0, 1, len(anchors))
+    x = np.linspace(0, 1, levels)
+    rgb = [np.round(np.interp(x, positions, anchors[:, i])).astype(np.uint32) for i in range(3)]
+    lut = np.zeros(levels + 1, dtype=np.uint32)
+    lut[:levels] = 0xFF000000 | (rgb[0] << 16) | (rgb[1] << 8) | rgb[2]
+    return lut
+
+
+def nice_ticks(low, high, steps, max_ticks=8):
+    """在 steps（从小到大）中选出刻度数不超过 max_ticks 的最小步长，返回 [low, high] 内的刻度"""
+    for step in steps:
+        if (high - low) / step <= max_ticks:
+            break
+    first = np.ceil(low / step - 1e-9) * step
+    # 加0把 -0.0 变为 0.0，避免刻度显示为 "-0"
+    return np.arange(first, high + step * 1e-6, step) + 0.0
+
+
+PHASE_TICK_STEPS = (5, 10, 15, 30, 45, 90)
+VALUE_TICK_STEPS = (0.1, 0.2, 0.25, 0.5, 1, 2, 5, 10, 20, 25, 50, 100, 200, 500)
+
+
+class PrpdHeatmapWidget(QWidget):
+    """
+    单个热图面板：横轴为相位 0~360°，纵轴范围为 y_range。
+
+    set_data 传入 (行, 相位区间) 的数组，第0行对应 y_range 的下限，颜色在 vmin~vmax 之间，
+    NaN 为透明。reference=True 时叠加 40+40·sin 参考正弦（与 Matplotlib 画布一致）。
+    """
+
+    MARGIN_LEFT = 52
+    MARGIN_RIGHT = 78
+    MARGIN_TOP = 30
+    COLORBAR_WIDTH = 14
+    MIN_PHASE_SPAN = 10.0  # 缩放时相位范围的下限（°）
+
+    def __init__(self, title, y_label, y_range, vmin=0.0, vmax=80.0, color_label='幅值 (dB)',
+                 reference=False, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.y_label = y_label
+        self.y_range = (float(y_range[0]), float(y_range[1]))
+        self.vmin = vmin
+        self.vmax = vmax
+        self.color_label = color_label
+        self.info = ''
+        self.lut = colormap_lut()
+        self.levels = len(self.lut) - 1
+        self.view = (0.0, 360.0) + self.y_range  # 当前显示范围 (x0, x1, y0, y1)
+        self._image = None
+        self._pixels = None  # QImage 不复制像素，需要保留数组的引用
+        # 颜色条图像，顶部为最大值
+        self._colorbar_pixels = np.ascontiguousarray(self.lut[self.levels - 1::-1].reshape(-1, 1))
+        self._colorbar = QImage(self._colorbar_pixels.data, 1, self.levels, 4, QImage.Format_ARGB32)
+        self._reference = None
+        if reference:
+            # 参考正弦按数据坐标生成一次，绘制时用坐标变换映射到控件
+            x = np.linspace(0, 360, 361)
+            y = 40 + 40 * np.sin(np.radians(x))
+            self._reference = QPainterPath(QPointF(x[0], y[0]))
+            for px, py in zip(x[1:], y[1:]):
+                self._reference.lineTo(px, py)
+        self.setMinimumSize(240, 180)
+        self.setToolTip("滚轮缩放，双击恢复完整范围")
+
+    def set_color_range(self, vmin, vmax, label):
+        self.vmin = vmin
+        self.vmax = vmax
+        self.color_label = label
+        self.update()
+
+    def set_data(self, values, info=''):
+        """更新图像数据，values 为 (行, 列) 数组"""
+        values = np.asarray(values, dtype=np.float32)
+        scaled = (values - self.vmin) * (self.levels / (self.vmax - self.vmin))
+        np.clip(scaled, 0, self.levels - 1, out=scaled)
+        # NaN 经过 clip 仍为 NaN，映射到 LUT 末尾的透明色
+        scaled[np.isnan(scaled)] = self.levels
+        # 第0行在底部，图像第0行在顶部，因此上下翻转；输入可能是转置视图，QImage 需要按行连续的像素
+        self._pixels = np.ascontiguousarray(self.lut[scaled.astype(np.intp)[::-1]])
+        height, width = self._pixels.shape
+        self._image = QImage(self._pixels.data, width, height, width * 4, QImage.Format_ARGB32)
+        self.info = info
+        self.update()
+
+    def clear(self):
+        self._image = None
+        self._pixels = None
+        self.info = ''
+        self.update()
+
+    def reset_view(self):
+        self.view = (0.0, 360.0) + self.y_range
+        self.update()
+
+    def _plot_rect(self):
+        # 底部留出刻度和轴标签两行文字的高度
+        bottom = 2 * self.fontMetrics().height() + 8
+        return QRectF(self.MARGIN_LEFT, self.MARGIN_TOP,
+                      max(self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT, 1),
+                      max(self.height() - self.MARGIN_TOP - bottom, 1))
+
+    def _data_transform(self, plot):
+        """数据坐标到控件坐标的变换"""
+        x0, x1, y0, y1 = self.view
+        sx = plot.width() / (x1 - x0)
+        sy = -plot.height() / (y1 - y0)
+        return QTransform(sx, 0, 0, sy, plot.left() - x0 * sx, plot.bottom() - y0 * sy)
+
+    def _to_data(self, pos):
+        plot = self._plot_rect()
+        x0, x1, y0, y1 = self.view
+        x = x0 + (pos.x() - plot.left()) / plot.width() * (x1 - x0)
+        y = y0 + (plot.bottom() - pos.y()) / plot.height() * (y1 - y0)
+        return min(max(x, x0), x1), min(max(y, y0), y1)
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if not steps:
+            return
+        factor = 0.8 ** steps
+        cx, cy = self._to_data(event.pos())
+        x0, x1, y0, y1 = self.view
+        full_y0, full_y1 = self.y_range
+        min_y_span = (full_y1 - full_y0) / 40
+        x_span = min(max((x1 - x0) * factor, self.MIN_PHASE_SPAN), 360.0)
+        y_span = min(max((y1 - y0) * factor, min_y_span), full_y1 - full_y0)
+        # 以鼠标位置为中心缩放，鼠标下的数据点保持不动，超出完整范围时平移回来
+        x0 = min(max(cx - (cx - x0) / (x1 - x0) * x_span, 0.0), 360.0 - x_span)
+        y0 = min(max(cy - (cy - y0) / (y1 - y0) * y_span, full_y0), full_y1 - y_span)
+        self.view = (x0, x0 + x_span, y0, y0 + y_span)
+        self.update()
+        event.accept()
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().window())
+        plot = self._plot_rect()
+        painter.fillRect(plot, Qt.white)
+        x0, x1, y0, y1 = self.view
+
+        if self._image is not None:
+            # 只取当前显示范围对应的像素区域，缩放时不做平滑，保持区间边界清晰
+            width, height = self._image.width(), self._image.height()
+            full_y0, full_y1 = self.y_range
+            source = QRectF(x0 / 360.0 * width, (full_y1 - y1) / (full_y1 - full_y0) * height,
+                            (x1 - x0) / 360.0 * width, (y1 - y0) / (full_y1 - full_y0) * height)
+            painter.drawImage(plot, self._image, source)
+
+        # 网格和刻度
+        grid_pen = QPen(QColor(0, 0, 0, 50), 1, Qt.DashLine)
+        metrics = painter.fontMetrics()
+        transform = self._data_transform(plot)
+        for x in nice_ticks(x0, x1, PHASE_TICK_STEPS):
+            px = transform.map(QPointF(x, y0)).x()
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(px, plot.top()), QPointF(px, plot.bottom()))
+            painter.setPen(Qt.black)
+            text = f"{x:g}"
+            painter.drawText(QPointF(px - metrics.width(text) / 2, plot.bottom() + metrics.ascent() + 4), text)
+        for y in nice_ticks(y0, y1, VALUE_TICK_STEPS):
+            py = transform.map(QPointF(x0, y)).y()
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(plot.left(), py), QPointF(plot.right(), py))
+            painter.setPen(Qt.black)
+            text = f"{y:g}"
+            painter.drawText(QPointF(plot.left() - metrics.width(text) - 4, py + metrics.ascent() / 2 - 1), text)
+
+        # 参考正弦，按数据坐标绘制并裁剪到绘图区域
+        if self._reference is not None:
+            painter.save()
+            painter.setClipRect(plot)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setTransform(transform)
+            pen = QPen(QColor(255, 0, 0, 128), 2)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawPath(self._reference)
+            painter.restore()
+
+        painter.setPen(Qt.black)
+        painter.drawRect(plot)
+
+        # 标题、轴标签和标注
+        font = painter.font()
+        title_font = painter.font()
+        title_font.setBold(True)
+        painter.setFont(title_font)
+        painter.drawText(QRectF(plot.left(), 0, plot.width(), self.MARGIN_TOP), Qt.AlignCenter, self.title)
+        painter.setFont(font)
+        painter.drawText(QRectF(plot.left(), plot.bottom() + metrics.height() + 4, plot.width(), metrics.height()),
+                         Qt.AlignCenter, '相位 (°)')
+        painter.save()
+        painter.translate(metrics.height() / 2 + 2, plot.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-plot.height() / 2, -metrics.height() / 2, plot.height(), metrics.height()),
+                         Qt.AlignCenter, self.y_label)
+        painter.restore()
+        if self.info:
+            painter.drawText(plot.adjusted(6, 4, -6, -4), Qt.AlignLeft | Qt.AlignTop, self.info)
+
+        # 颜色条
+        bar = QRectF(plot.right() + 10, plot.top(), self.COLORBAR_WIDTH, plot.height())
+        painter.drawImage(bar, self._colorbar)
+        painter.drawRect(bar)
+        for value in nice_ticks(self.vmin, self.vmax, VALUE_TICK_STEPS, max_ticks=6):
+            py = bar.bottom() - (value - self.vmin) / (self.vmax - self.vmin) * bar.height()
+            painter.drawLine(QPointF(bar.right(), py), QPointF(bar.right() + 3, py))
+            painter.drawText(QPointF(bar.right() + 5, py + metrics.ascent() / 2 - 1), f"{value:g}")
+        painter.translate(self.width() - metrics.height() / 2 - 2, bar.center().y())
+        painter.rotate(90)
+        painter.drawText(QRectF(-bar.height() / 2, -metrics.height() / 2, bar.height(), metrics.height()),
+                         Qt.AlignCenter, self.color_label)
+        painter.end()
+
+
+class HeatmapPanel(QWidget):
+    """
+    PRPD和PRPS两个热图面板并排显示。
+
+    提供与 gis_canvas.MplCanvas 相同的更新接口（update_prpd / update_prpd_density / update_prps /
+    set_prpd_accumulated），主窗口可以在两种显示后端之间直接切换。
+    """
+
+    def __init__(self, parent=None, prps_cycles=50):
+        super().__init__(parent)
+        self.prpd = PrpdHeatmapWidget('PRPD图 (相位分辨局部放电)', '幅值 (dB)', AMPLITUDE_RANGE, reference=True)
+        self.prps = PrpdHeatmapWidget('PRPS图 (相位分辨局部放电谱)', '周期', (0, prps_cycles))
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.prpd)
+        layout.addWidget(self.prps)
+        self.prpd_accumulated = False
+        # 单帧模式按区间显示该区间内的最大幅值，区间划分与累加直方图相同
+        self._binning = PrpdHistogram()
+        self._frame = np.full((PHASE_BINS, AMPLITUDE_BINS), np.nan, dtype=np.float32)
+
+    def update_prpd(self, phase_values, uhf_db_values, info=''):
+        """更新单帧PRPD图"""
+        self._frame.fill(np.nan)
+        if len(phase_values):
+            index = self._binning.bin_index(phase_values, uhf_db_values)
+            np.fmax.at(self._frame.reshape(-1), index, np.asarray(uhf_db_values, dtype=np.float32))
+        self.prpd.set_data(self._frame.T, info)
+
+    def update_prpd_density(self, density, info=''):
+        """更新累加模式的放电密度图像，density 为 (幅值区间, 相位区间) 的归一化数组"""
+        self.prpd.set_data(density, info)
+
+    def update_prps(self, cycles):
+        """更新PRPS瀑布图，cycles 为 (周期数, 相位区间数) 的幅值数组，最后一行为最新周期"""
+        self.prps.set_data(cycles)
+
+    def set_prpd_accumulated(self, accumulated):
+        if accumulated == self.prpd_accumulated:
+            return
+        self.prpd_accumulated = accumulated
+        if accumulated:
+            self.prpd.set_color_range(0.0, 1.0, '相对放电密度')
+        else:
+            self.prpd.set_color_range(0.0, 80.0, '幅值 (dB)')
+        self.prpd.clear()
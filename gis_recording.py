@@ -0,0 +1,118 @@
+"""
+按列存储的放电数据记录缓冲区。
+
+每个放电点记录为一行：采集时间（int64 纳秒）、相位（float32）、幅值（float32）、该帧的放电次数总和（int32）
+和设备编号（int16）。数据按列写入固定大小的 numpy 块，块写满后再分配新块，已有数据不会复制，
+追加一帧是均摊 O(1) 的数组拷贝。总内存超过预算时丢弃最早的块并计数。
+时间等字符串只在导出时由 gis_export 格式化。
+"""
+from collections import deque
+
+import numpy as np
+
+# 每列的类型，一行共 8 + 4 + 4 + 4 + 2 = 22 字节
+COLUMNS = (
+    ('timestamp_ns', np.int64),
+    ('phase', np.float32),
+    ('uhf_db', np.float32),
+    ('discharge_count', np.int32),
+    ('device', np.int16),
+)
+ROW_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS)
+
+
+class RecordChunk:
+    """一个固定容量的列块"""
+
+    def __init__(self, capacity):
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS}
+        self.capacity = capacity
+        self.size = 0
+
+    def view(self, name):
+        return self.columns[name][:self.size]
+
+
+class RecordBuffer:
+    """
+    分块列式记录缓冲区。
+
+    memory_budget 为允许占用的字节数（按块的容量计算），超出后丢弃最早的块，dropped 为累计丢弃的点数。
+    设备名称通过 device_id 登记为从0开始的编号，导出时再换回名称。
+    """
+
+    def __init__(self, memory_budget=512 * 1024 * 1024, chunk_rows=65536):
+        self.chunk_rows = chunk_rows
+        self.max_chunks = max(int(memory_budget // (chunk_rows * ROW_BYTES)), 1)
+        self.chunks = deque()
+        self.devices = []
+        self._device_ids = {}
+        self.rows = 0       # 当前保存的点数
+        self.frames = 0     # 累计写入的帧数
+        self.dropped = 0    # 超出内存预算被丢弃的点数
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def memory_budget(self):
+        return self.max_chunks * self.chunk_rows * ROW_BYTES
+
+    @property
+    def nbytes(self):
+        return len(self.chunks) * self.chunk_rows * ROW_BYTES
+
+    def clear(self):
+        self.chunks.clear()
+        self.rows = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def device_id(self, name):
+        """设备名称对应的编号，第一次出现时登记"""
+        if name not in self._device_ids:
+            self._device_ids[name] = len(self.devices)
+            self.devices.append(name)
+        return self._device_ids[name]
+
+    def _new_chunk(self):
+        if len(self.chunks) >= self.max_chunks:
+            oldest = self.chunks.popleft()
+            self.rows -= oldest.size
+            self.dropped += oldest.size
+        chunk = RecordChunk(self.chunk_rows)
+        self.chunks.append(chunk)
+        return chunk
+
+    def append(self, timestamp_ns, phase_values, uhf_db_values, discharge_count, device=''):
+        """追加一帧：同一帧的所有点共用时间、放电次数和设备"""
+        count = len(phase_values)
+        if not count:
+            return
+        device = self.device_id(device)
+        start = 0
+        while start < count:
+            chunk = self.chunks[-1] if self.chunks and self.chunks[-1].size < self.chunk_rows else self._new_chunk()
+            n = min(count - start, chunk.capacity - chunk.size)
+            rows = slice(chunk.size, chunk.size + n)
+            chunk.columns['timestamp_ns'][rows] = timestamp_ns
+            chunk.columns['phase'][rows] = phase_values[start:start + n]
+            chunk.columns['uhf_db'][rows] = uhf_db_values[start:start + n]
+            chunk.columns['discharge_count'][rows] = discharge_count
+            chunk.columns['device'][rows] = device
+            chunk.size += n
+            self.rows += n
+            start += n
+        self.frames += 1
+
+    def column(self, name):
+        """把一列拼接为一个数组（会复制数据）"""
+        return np.concatenate([chunk.view(name) for chunk in self.chunks]) if self.chunks \
+            else np.empty(0, dtype=dict(COLUMNS)[name])
+
+    def blocks(self):
+        """
+        当前数据的快照：按时间顺序返回每块的 {列名: 数组视图}，不复制数据。
+        快照中每块的行数在调用时确定，之后继续追加的数据不会出现在快照中，可以交给导出线程使用。
+        """
+        return [{name: chunk.view(name) for name, _ in COLUMNS} for chunk in list(self.chunks)]
@@ -0,0 +1,327 @@
+"""
+崩溃安全的分段记录文件。
+
+记录时每帧写成一条定长二进制记录，由后台线程批量追加到段文件并定期 fsync，界面线程只把帧放入队列。
+段文件按大小或时长轮换，每个段文件旁有一个稀疏时间索引。每条记录带 CRC32，
+断电或崩溃后重新打开目录时，只需截掉最后一个段文件末尾不完整或校验失败的记录，之前的段文件不受影响，
+之后的数据写入新的段文件。最后一个段文件的文件头损坏时改名为 .bad 保留，不参与读取。
+
+文件格式（小端）：
+    段文件 seg_<编号>.seg：64字节文件头 + 定长记录
+        文件头  magic b'GISSEG1\\0'，版本 u2，组数 u2，记录长度 u4，创建时间 i8 (ns)，设备名 40字节 UTF-8（补0）
+        记录    时间 i8 (ns)，CRC32 u4，有效组数 u2，保留 u2，放电次数 i4×组数，幅值 f4×组数，相位 f4×组数
+                CRC32 覆盖除 CRC 字段外的整条记录
+    索引文件 seg_<编号>.idx：每 INDEX_STRIDE 条记录一项 (记录序号 i8, 时间 i8)，可由段文件重建
+"""
+import glob
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from gis_protocol import GROUP_COUNT
+
+MAGIC = b'GISSEG1\0'
+VERSION = 1
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u2'), ('group_count', '<u2'), ('record_size', '<u4'),
+                         ('created_ns', '<i8'), ('device', 'S40')])
+HEADER_SIZE = HEADER_DTYPE.itemsize  # 64
+INDEX_DTYPE = np.dtype([('record', '<i8'), ('timestamp_ns', '<i8')])
+INDEX_STRIDE = 64
+
+SEGMENT_PATTERN = re.compile(r'^seg_(\d+)\.seg$')
+
+
+def record_dtype(group_count=GROUP_COUNT):
+    """一条帧记录的结构化类型"""
+    return np.dtype([('timestamp_ns', '<i8'), ('crc', '<u4'), ('size', '<u2'), ('reserved', '<u2'),
+                     ('discharge_counts', '<i4', (group_count,)), ('uhf_db', '<f4', (group_count,)),
+                     ('phase', '<f4', (group_count,))])
+
+
+def record_crc(raw):
+    """一条记录（bytes 或 memoryview）的校验值，跳过第8~11字节的 CRC 字段"""
+    return zlib.crc32(raw[12:], zlib.crc32(raw[:8]))
+
+
+def segment_paths(directory):
+    """目录中按编号排序的段文件 [(编号, 路径), ...]"""
+    segments = []
+    for path in glob.glob(os.path.join(directory, 'seg_*.seg')):
+        match = SEGMENT_PATTERN.match(os.path.basename(path))
+        if match:
+            segments.append((int(match.group(1)), path))
+    return sorted(segments)
+
+
+def index_path(segment_path):
+    return segment_path[:-len('.seg')] + '.idx'
+
+
+def read_header(f):
+    """读取并检查段文件头，返回 numpy 结构化标量"""
+    raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError("段文件头不完整")
+    header = np.frombuffer(raw, dtype=HEADER_DTYPE)[0]
+    if header['magic'] != MAGIC.rstrip(b'\0') or header['version'] != VERSION:
+        raise ValueError("不是有效的段文件")
+    if header['record_size'] != record_dtype(int(header['group_count'])).itemsize:
+        raise ValueError("段文件记录长度与组数不符")
+    return header
+
+
+def build_index(timestamps, start_record=0):
+    """由记录时间生成稀疏索引：每 INDEX_STRIDE 条记录取一项"""
+    records = np.arange(0, len(timestamps), INDEX_STRIDE)
+    index = np.empty(len(records), dtype=INDEX_DTYPE)
+    index['record'] = records + start_record
+    index['timestamp_ns'] = timestamps[records]
+    return index
+
+
+def recover_segment(path):
+    """
+    修复崩溃时可能写了一半的段文件：截掉末尾不完整的记录和末尾连续校验失败的记录，并重建索引。
+    返回有效记录数；文件头都不完整的空段文件直接删除，返回0。
+    """
+    if os.path.getsize(path) < HEADER_SIZE:
+        os.remove(path)
+        if os.path.exists(index_path(path)):
+            os.remove(index_path(path))
+        return 0
+    with open(path, 'r+b') as f:
+        header = read_header(f)
+        record_size = int(header['record_size'])
+        count = (os.path.getsize(path) - HEADER_SIZE) // record_size
+        # 从末尾向前检查，遇到第一条校验通过的记录为止；中间的坏记录留给读取方按 CRC 过滤
+        while count > 0:
+            f.seek(HEADER_SIZE + (count - 1) * record_size)
+            raw = f.read(record_size)
+            if record_crc(raw) == np.frombuffer(raw, dtype='<u4', count=1, offset=8)[0]:
+                break
+            count -= 1
+        f.truncate(HEADER_SIZE + count * record_size)
+    index = build_index(read_segment(path)[1]['timestamp_ns'])
+    with open(index_path(path), 'wb') as f:
+        f.write(index.tobytes())
+    return count
+
+
+class SegmentWriter(threading.Thread):
+    """
+    后台分段写入线程。
+
+    write 只把帧放入有界队列，队列满时丢弃并计数，调用方不会因磁盘 I/O 阻塞。
+    后台线程每次取出队列中的全部帧，打包为定长记录一次写入；每 flush_interval 秒 flush 并 fsync 一次，
+    断电时最多丢失这段时间内的数据。当前段超过 max_segment_bytes 或 max_segment_seconds 时换新段。
+
+    stop 不等待写完，previous 为同一目录上一次的写入线程时，本线程先等待它写完再修复和编号段文件，
+    两个线程不会同时写同一目录。修复完成后 ready 置位，quarantined 和 error 可供调用方提示。
+    """
+
+    def __init__(self, directory, device='', group_count=GROUP_COUNT, max_segment_bytes=64 * 1024 * 1024,
+                 max_segment_seconds=3600, flush_interval=1.0, queue_size=10000, previous=None):
+        super().__init__(daemon=True, name='SegmentWriter')
+        self.directory = directory
+        self.device = device
+        self.group_count = group_count
+        self.dtype = record_dtype(group_count)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._file = None
+        self._index_file = None
+        self._segment_records = 0
+        self._segment_started = 0.0
+        self.segment_path = None
+        self.segments = 0        # 本次写入新建的段文件数
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.dropped = 0         # 队列满时丢弃的帧数
+        self.error = None        # 写入线程遇到的错误，出错后停止写入
+        self.recovered_records = 0
+        self.quarantined = []    # 文件头损坏、已改名为 .bad 的段文件 [(路径, 原因)]
+        self.ready = threading.Event()
+        self.previous = previous
+        self._next_segment = 1
+
+    def write(self, frame):
+        """把一帧（gis_acquisition.Frame）放入写入队列，stop 之后的帧不再写入"""
+        if self._stopping.is_set():
+            return
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """通知写入线程写完队列中剩余的帧后关闭文件，不等待，队列满时也不会阻塞调用方"""
+        self._stopping.set()
+        try:
+            # 只用于唤醒等待中的写入线程，队列满时写入线程不会等待，不需要唤醒
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def close(self, timeout=None):
+        """停止并等待写入线程结束"""
+        self.stop()
+        self.join(timeout)
+
+    def _resume(self):
+        """修复上次写入的最后一个段文件，新数据总是写入新的段文件"""
+        os.makedirs(self.directory, exist_ok=True)
+        existing = segment_paths(self.directory)
+        if existing:
+            number, path = existing[-1]
+            try:
+                self.recovered_records = recover_segment(path)
+            except ValueError as e:
+                # 文件头损坏，无法确定记录长度：连同索引改名为 .bad 保留，之后的数据照常写入新的段文件
+                for damaged in (path, index_path(path)):
+                    if os.path.exists(damaged):
+                        os.replace(damaged, damaged + '.bad')
+                self.quarantined.append((path + '.bad', str(e)))
+                print(f"段文件 {path} 无法读取（{e}），已改名为 .bad")
+            self._next_segment = number + 1
+
+    def _open_segment(self, timestamp_ns):
+        self._close_segment()
+        self.segment_path = os.path.join(self.directory, f'seg_{self._next_segment:06d}.seg')
+        self._next_segment += 1
+        header = np.zeros((), dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['group_count'] = self.group_count
+        header['record_size'] = self.dtype.itemsize
+        header['created_ns'] = timestamp_ns
+        header['device'] = self.device.encode('utf-8')[:40]
+        self._file = open(self.segment_path, 'wb')
+        self._file.write(header.tobytes())
+        self._index_file = open(index_path(self.segment_path), 'wb')
+        self._segment_records = 0
+        self._segment_started = time.monotonic()
+        self.segments += 1
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+
+    def _sync(self):
+        self._file.flush()
+        self._index_file.flush()
+        os.fsync(self._file.fileno())
+        os.fsync(self._index_file.fileno())
+
+    def _pack(self, frames):
+        records = np.zeros(len(frames), dtype=self.dtype)
+        for i, frame in enumerate(frames):
+            size = min(len(frame.phase_values), self.group_count)
+            records['timestamp_ns'][i] = frame.timestamp_ns
+            records['size'][i] = size
+            records['discharge_counts'][i, :size] = frame.discharge_counts[:size]
+            records['uhf_db'][i, :size] = frame.uhf_db_values[:size]
+            records['phase'][i, :size] = frame.phase_values[:size]
+        raw = memoryview(records.view(np.uint8))
+        crc = records['crc']
+        for i in range(len(records)):
+            crc[i] = record_crc(raw[i * self.dtype.itemsize:(i + 1) * self.dtype.itemsize])
+        return records
+
+    def _write(self, frames):
+        # 需要换段时按帧切分，保证每个段的记录时间连续
+        while frames:
+            if (self._file is None
+                    or HEADER_SIZE + (self._segment_records + 1) * self.dtype.itemsize > self.max_segment_bytes
+                    or time.monotonic() - self._segment_started >= self.max_segment_seconds):
+                self._open_segment(frames[0].timestamp_ns)
+            room = max((self.max_segment_bytes - HEADER_SIZE) // self.dtype.itemsize - self._segment_records, 1)
+            batch, frames = frames[:room], frames[room:]
+            records = self._pack(batch)
+            self._file.write(records.tobytes())
+            # 只为落在 INDEX_STRIDE 整数倍上的记录写索引项
+            first = self._segment_records
+            offsets = np.arange((-first) % INDEX_STRIDE, len(records), INDEX_STRIDE)
+            if len(offsets):
+                index = np.empty(len(offsets), dtype=INDEX_DTYPE)
+                index['record'] = first + offsets
+                index['timestamp_ns'] = records['timestamp_ns'][offsets]
+                self._index_file.write(index.tobytes())
+            self._segment_records += len(records)
+            self.frames_written += len(records)
+            self.bytes_written += records.nbytes
+
+    def run(self):
+        if self.previous is not None:
+            self.previous.join()
+            self.previous = None
+        try:
+            self._resume()
+        except OSError as e:
+            self.error = e
+            print(f"恢复记录文件失败: {e}")
+        self.ready.set()
+        last_sync = time.monotonic()
+        closing = False
+        while not closing:
+            # 等待第一帧，然后一次取出队列中已有的全部帧。先读取停止标志，保证 stop 之前放入的帧都在本次取出
+            closing = self._stopping.is_set()
+            frames = []
+            try:
+                frames.append(self._queue.get(block=not closing, timeout=self.flush_interval))
+                while True:
+                    frames.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if None in frames:
+                frames = [frame for frame in frames if frame is not None]
+            if self.error is not None:
+                continue
+            try:
+                if frames:
+                    self._write(frames)
+                if self._file is not None and (closing or time.monotonic() - last_sync >= self.flush_interval):
+                    self._sync()
+                    last_sync = time.monotonic()
+            except OSError as e:
+                self.error = e
+                print(f"写入记录文件失败: {e}")
+        try:
+            self._close_segment()
+        except OSError as e:
+            print(f"关闭记录文件失败: {e}")
+
+
+def read_segment(path):
+    """
+    只读内存映射一个段文件，返回 (文件头, 记录数组)。
+    记录数组直接映射文件内容，不读入内存；CRC 校验失败的记录可用 verify_records 过滤。
+    """
+    with open(path, 'rb') as f:
+        header = read_header(f)
+    record_size = int(header['record_size'])
+    count = (os.path.getsize(path) - HEADER_SIZE) // record_size
+    if count == 0:
+        return header, np.empty(0, dtype=record_dtype(int(header['group_count'])))
+    records = np.memmap(path, dtype=record_dtype(int(header['group_count'])), mode='r',
+                        offset=HEADER_SIZE, shape=(count,))
+    return header, records
+
+
+def verify_records(records):
+    """返回每条记录 CRC 是否正确的布尔数组"""
+    raw = memoryview(np.ascontiguousarray(records).view(np.uint8))
+    size = records.dtype.itemsize
+    return np.array([record_crc(raw[i * size:(i + 1) * size]) == crc
+                     for i, crc in enumerate(records['crc'].tolist())], dtype=bool)
@@ -0,0 +1,186 @@
+"""
+本地 Modbus TCP 设备模拟器，用于采集链路的压力测试和长时间运行测试。
+
+模拟器与现场设备使用相同的协议：
+    1. 收到唤醒指令 0xFF 0xFE 0xFF 0xFE 后进入唤醒状态并回复同样的4字节
+    2. 唤醒状态下响应功能码4的读取请求，按默认寄存器表（register_maps/gis_uhf_v1.json）的分组布局返回399个寄存器
+    3. 超过 sleep_after 秒没有请求后重新进入休眠，休眠时不响应读取请求
+
+每台模拟设备按配置的帧率生成电晕、颗粒、悬浮、沿面、气隙五种典型的PRPD图谱数据。
+一台机器上可以同时运行数百台模拟设备，每台设备占用一个端口。
+
+用法:
+    python gis_simulator.py --devices 200 --port 16789 --fps 10
+    python gis_simulator.py --pattern void --port 6789
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from gis_protocol import (GROUP_COUNT, READ_COUNT, READ_FUNCTION_CODE, READ_REQUEST_FORMAT, WAKE_UP_SEQUENCE,
+                          build_exception_response, build_read_response, encode_registers)
+
+PATTERNS = ['corona', 'particle', 'floating', 'surface', 'void']
+
+
+class PrpdPatternGenerator:
+    """按局放类型生成一帧(相位, 幅值, 放电次数)数据"""
+
+    def __init__(self, pattern, group_count=GROUP_COUNT, seed=None):
+        if pattern not in PATTERNS:
+            raise ValueError(f"未知的局放类型: {pattern}")
+        self.pattern = pattern
+        self.group_count = group_count
+        self.rng = np.random.default_rng(seed)
+
+    def _clusters(self, centers, phase_spread, amp_mean, amp_spread, weights=None):
+        rng = self.rng
+        n = self.group_count
+        index = rng.choice(len(centers), size=n, p=weights)
+        phase = np.asarray(centers, dtype=np.float64)[index] + rng.normal(0, phase_spread, n)
+        amp = np.asarray(amp_mean, dtype=np.float64)[index] + rng.normal(0, amp_spread, n)
+        return phase, amp
+
+    def generate(self):
+        rng = self.rng
+        n = self.group_count
+        if self.pattern == 'corona':
+            # 电晕：集中在负半周峰值附近，幅值较稳定
+            phase, amp = self._clusters([270.0, 90.0], 12.0, [55.0, 45.0], 6.0, weights=[0.85, 0.15])
+        elif self.pattern == 'particle':
+            # 颗粒：全相位随机分布，幅值低且起伏小
+            phase = rng.uniform(0, 360, n)
+            amp = rng.normal(42.0, 3.0, n)
+        elif self.pattern == 'floating':
+            # 悬浮：两个半周各一簇，幅值高且基本恒定
+            phase, amp = self._clusters([45.0, 225.0], 8.0, [68.0, 68.0], 1.5)
+        elif self.pattern == 'surface':
+            # 沿面：正负半周不对称，一侧幅值明显偏大
+            phase, amp = self._clusters([60.0, 250.0], 20.0, [62.0, 45.0], 7.0, weights=[0.6, 0.4])
+        else:
+            # 气隙：两个半周上升沿对称分布，幅值分散
+            phase, amp = self._clusters([45.0, 225.0], 18.0, [50.0, 50.0], 10.0)
+        phase = np.mod(phase, 360.0)
+        amp = np.clip(amp, 0.0, 80.0)
+        counts = rng.poisson(3.0, n)
+        return counts, amp, phase
+
+
+class SimulatedDevice:
+    """单台模拟设备：按帧率更新当前帧，读取请求返回最新帧"""
+
+    def __init__(self, name, pattern, fps=10.0, sleep_after=30.0, wake_delay=0.05, seed=None):
+        self.name = name
+        self.generator = PrpdPatternGenerator(pattern, seed=seed)
+        self.fps = fps
+        self.sleep_after = sleep_after
+        self.wake_delay = wake_delay
+        self._started = time.monotonic()
+        self._frame_index = -1
+        self._payload = b''
+        # 统计指标
+        self.connections = 0
+        self.requests = 0
+        self.wake_ups = 0
+        self.ignored_requests = 0
+
+    def payload(self):
+        index = int((time.monotonic() - self._started) * self.fps) if self.fps > 0 else self._frame_index + 1
+        if index != self._frame_index:
+            self._frame_index = index
+            self._payload = encode_registers(*self.generator.generate())
+        return self._payload
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        awake = False
+        last_request = 0.0
+        buf = b''
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                buf += data
+                while buf:
+                    if buf.startswith(WAKE_UP_SEQUENCE):
+                        buf = buf[len(WAKE_UP_SEQUENCE):]
+                        await asyncio.sleep(self.wake_delay)
+                        writer.write(WAKE_UP_SEQUENCE)
+                        awake = True
+                        last_request = time.monotonic()
+                        self.wake_ups += 1
+                        continue
+                    if len(buf) < READ_REQUEST_FORMAT.size:
+                        break
+                    transaction_id, _, _, unit, function_code, address, count = READ_REQUEST_FORMAT.unpack(
+                        buf[:READ_REQUEST_FORMAT.size])
+                    buf = buf[READ_REQUEST_FORMAT.size:]
+                    self.requests += 1
+                    if awake and time.monotonic() - last_request > self.sleep_after:
+                        awake = False
+                    if not awake:
+                        # 休眠状态下不响应，由采集端超时后重新唤醒
+                        self.ignored_requests += 1
+                        continue
+                    last_request = time.monotonic()
+                    if function_code != READ_FUNCTION_CODE:
+                        writer.write(build_exception_response(transaction_id, unit, function_code, 0x01))
+                        continue
+                    writer.write(build_read_response(transaction_id, unit, self.payload()[:count * 2]))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(devices, host, base_port, report_interval=10.0):
+    servers = []
+    for offset, device in enumerate(devices):
+        servers.append(await asyncio.start_server(device.handle, host, base_port + offset))
+    print(f"已启动 {len(devices)} 台模拟设备: {host}:{base_port}-{base_port + len(devices) - 1}")
+    while True:
+        await asyncio.sleep(report_interval)
+        requests = sum(device.requests for device in devices)
+        wake_ups = sum(device.wake_ups for device in devices)
+        print(f"累计请求 {requests}, 唤醒 {wake_ups}")
+
+
+def write_device_list(path, devices, host, base_port):
+    """生成 gis_poller 可直接使用的设备列表文件"""
+    items = [{'name': device.name, 'host': host, 'port': base_port + i} for i, device in enumerate(devices)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GIS局放传感器 Modbus TCP 模拟器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6789, help="第一台设备的端口，后续设备依次递增")
+    parser.add_argument('--devices', type=int, default=1, help="模拟设备数量")
+    parser.add_argument('--pattern', choices=PATTERNS, default=None, help="局放类型，默认按设备编号轮流使用五种类型")
+    parser.add_argument('--fps', type=float, default=10.0, help="每台设备的数据帧率，0表示每次请求都生成新帧")
+    parser.add_argument('--sleep-after', type=float, default=30.0, help="无请求多少秒后进入休眠")
+    parser.add_argument('--wake-delay', type=float, default=0.05, help="唤醒回复延迟（秒）")
+    parser.add_argument('--device-list', default=None, help="把设备列表写入该JSON文件，供 gis_poller 使用")
+    args = parser.parse_args()
+
+    devices = []
+    for i in range(args.devices):
+        pattern = args.pattern or PATTERNS[i % len(PATTERNS)]
+        devices.append(SimulatedDevice(f"SIM-{i + 1:03d}-{pattern}", pattern, args.fps,
+                                       args.sleep_after, args.wake_delay, seed=i))
+    if args.device_list:
+        write_device_list(args.device_list, devices, args.host, args.port)
+    try:
+        asyncio.run(serve(devices, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+放电次数和幅值的多分辨率趋势。
+
+每帧的放电次数总和与 uhf_db 最大值按秒、分钟、小时三级增量汇总，每个时间桶保存帧数、总和、最小值和最大值，
+均值为总和除以帧数。每级是固定长度的环形数组：时间桶编号（时间 // 桶宽度）对容量取模得到槽位，
+槽位中同时保存桶编号，编号不符说明是一圈之前的旧数据，清空后重用。追加一帧只更新三个槽位，与已保存的数据量无关。
+查看长时间范围时直接读取较粗的级别（一个月只有约720个小时桶），不需要扫描原始记录。
+
+每个设备一组环形数组，保存在 trends/<设备>/<级别>.npy，下次启动时读取，容量改变时按时间保留最新的数据。
+界面定时保存时在调用线程复制一份数组（几毫秒），写文件在后台线程中进行，不阻塞界面。
+TrendStore 由采集线程追加、界面线程查询和保存，内部加锁；TrendSeries 本身不加锁。
+
+命令行：
+    python gis_trend.py trends/192.168.0.150_6789 --span 86400
+    python gis_trend.py --benchmark --days 30
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# (级别, 桶宽度（秒）, 容量（桶数）)
+TREND_LEVELS = (
+    ('second', 1, 86400),     # 保留1天
+    ('minute', 60, 43200),    # 保留30天
+    ('hour', 3600, 8760),     # 保留1年
+)
+
+# 汇总的指标：每帧放电次数总和、每帧 uhf_db 最大值
+METRICS = ('discharge', 'uhf')
+
+TREND_DTYPE = np.dtype([('bucket', '<i8'), ('count', '<i4')] +
+                       [(f'{metric}_{stat}', dtype) for metric in METRICS
+                        for stat, dtype in (('sum', '<f8'), ('min', '<f4'), ('max', '<f4'))])
+
+
+class TrendLevel:
+    """一个级别的环形数组，每个槽位保存一个时间桶的汇总，bucket 为 -1 表示空槽位"""
+
+    def __init__(self, name, width, capacity):
+        self.name = name
+        self.width = width
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=TREND_DTYPE)
+        self.data['bucket'] = -1
+        # 各字段的视图，逐帧更新时避免每次按字段名索引结构化数组
+        self._columns = {name: self.data[name] for name in TREND_DTYPE.names}
+        self.latest = -1  # 最新的桶编号
+
+    def add(self, seconds, discharge, uhf):
+        bucket = seconds // self.width
+        slot = bucket % self.capacity
+        columns = self._columns
+        stored = columns['bucket'][slot]
+        if stored != bucket:
+            if stored > bucket:
+                # 比环形数组中的数据早一圈以上（例如系统时间回调），已无处保存
+                return
+            self.data[slot] = (bucket, 0, 0.0, np.inf, -np.inf, 0.0, np.inf, -np.inf)
+        columns['count'][slot] += 1
+        columns['discharge_sum'][slot] += discharge
+        if discharge < columns['discharge_min'][slot]:
+            columns['discharge_min'][slot] = discharge
+        if discharge > columns['discharge_max'][slot]:
+            columns['discharge_max'][slot] = discharge
+        columns['uhf_sum'][slot] += uhf
+        if uhf < columns['uhf_min'][slot]:
+            columns['uhf_min'][slot] = uhf
+        if uhf > columns['uhf_max'][slot]:
+            columns['uhf_max'][slot] = uhf
+        if bucket > self.latest:
+            self.latest = bucket
+
+    def query(self, start_s, end_s):
+        """返回时间在 [start_s, end_s) 内的时间桶（按时间顺序的结构化数组副本），没有数据的桶不返回"""
+        first = max(int(start_s) // self.width, self.latest - self.capacity + 1)
+        last = min((int(end_s) - 1) // self.width, self.latest)
+        if last < first:
+            return self.data[:0].copy()
+        buckets = np.arange(first, last + 1)
+        rows = self.data[buckets % self.capacity]
+        return rows[rows['bucket'] == buckets]
+
+    def load(self, data):
+        """载入保存的数组，容量不同时保留最新的桶"""
+        if len(data) == self.capacity:
+            # 容量相同时槽位不变，直接复制
+            self.data[:] = data
+            self.latest = int(data['bucket'].max())
+            return
+        data = data[data['bucket'] >= 0]
+        data = data[np.argsort(data['bucket'], kind='stable')][-self.capacity:]
+        self.data['bucket'] = -1
+        self.data[data['bucket'] % self.capacity] = data
+        self.latest = int(data['bucket'][-1]) if len(data) else -1
+
+
+class TrendSeries:
+    """一个设备的各级趋势"""
+
+    def __init__(self, levels=TREND_LEVELS):
+        self.levels = [TrendLevel(*level) for level in levels]
+        self.frames = 0
+
+    def add(self, timestamp_ns, discharge, uhf):
+        """追加一帧：timestamp_ns 为采集时间，discharge 为放电次数总和，uhf 为幅值最大值"""
+        seconds = int(timestamp_ns) // 1_000_000_000
+        for level in self.levels:
+            level.add(seconds, discharge, uhf)
+        self.frames += 1
+
+    def level(self, name):
+        for level in self.levels:
+            if level.name == name:
+                return level
+        raise KeyError(name)
+
+    def query(self, start_s, end_s, max_points=4000):
+        """
+        选择桶数不超过 max_points、并且保留范围覆盖 start_s 的最细级别，返回 (级别, 时间桶)。
+        都不满足时使用最粗的级别。
+        """
+        for level in self.levels:
+            retained = (level.latest - level.capacity + 1) * level.width
+            if (end_s - start_s) / level.width <= max_points and (level.latest < 0 or start_s >= retained):
+                break
+        return level, level.query(start_s, end_s)
+
+    def snapshot(self):
+        """各级数组的副本 [(级别, 数组)]，用于在其他线程中保存"""
+        return [(level.name, level.data.copy()) for level in self.levels]
+
+    def save(self, directory):
+        save_levels(directory, [(level.name, level.data) for level in self.levels])
+
+    def load(self, directory):
+        for level in self.levels:
+            path = os.path.join(directory, f'{level.name}.npy')
+            if not os.path.exists(path):
+                continue
+            try:
+                data = np.load(path)
+            except (OSError, ValueError) as e:
+                print(f"读取趋势文件 {path} 失败: {e}")
+                continue
+            if data.dtype != TREND_DTYPE:
+                print(f"趋势文件 {path} 格式不符，已忽略")
+                continue
+            level.load(data)
+
+
+def save_levels(directory, levels):
+    """levels 为 [(级别, 数组)]，每级写入临时文件后替换，写入中途崩溃不会损坏已有的文件"""
+    os.makedirs(directory, exist_ok=True)
+    for name, data in levels:
+        path = os.path.join(directory, f'{name}.npy')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, data)
+        os.replace(path + '.tmp', path)
+
+
+class TrendWriter(threading.Thread):
+    """在后台线程中保存各设备的快照，写完后记录已保存的帧数"""
+
+    def __init__(self, store, jobs):
+        super().__init__(daemon=True)
+        self.store = store
+        self.jobs = jobs  # [(设备, 帧数, 快照)]
+        self.error = None
+
+    def run(self):
+        for device, frames, levels in self.jobs:
+            try:
+                save_levels(os.path.join(self.store.root, device), levels)
+            except OSError as e:
+                self.error = e
+                print(f"保存趋势数据 {device} 失败: {e}")
+                continue
+            self.store._saved_frames[device] = frames
+
+
+class TrendStore:
+    """
+    所有设备的趋势，设备的数据在第一次用到时从 root/<设备>/ 读取。
+    save 把有新数据的设备写回磁盘，由界面定时以 background=True 调用（在后台线程写文件），退出时再同步调用一次。
+    add 可以在采集线程中调用，与 query、save 之间用锁保护。
+    """
+
+    def __init__(self, root, levels=TREND_LEVELS):
+        self.root = root
+        self.levels = levels
+        self._series = {}
+        self._saved_frames = {}
+        self._writer = None
+        self._lock = threading.RLock()
+
+    def devices(self):
+        with self._lock:
+            names = set(self._series)
+        if os.path.isdir(self.root):
+            names.update(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+        return sorted(names)
+
+    def series(self, device):
+        with self._lock:
+            if device not in self._series:
+                series = TrendSeries(self.levels)
+                series.load(os.path.join(self.root, device))
+                self._series[device] = series
+                self._saved_frames[device] = 0
+            return self._series[device]
+
+    def add(self, device, timestamp_ns, discharge, uhf):
+        with self._lock:
+            self.series(device).add(timestamp_ns, discharge, uhf)
+
+    def query(self, device, start_s, end_s, max_points=4000):
+        """查询一个设备的趋势，返回 (级别, 时间桶)，见 TrendSeries.query"""
+        with self._lock:
+            return self.series(device).query(start_s, end_s, max_points)
+
+    def save(self, background=False):
+        """
+        保存有新数据的设备。数组在调用线程中复制，background 为 True 时在后台线程写文件后立即返回，
+        上一次的后台保存还没写完时跳过本次（数据留到下次保存）；否则等待后台保存结束后在调用线程中写完。
+        """
+        if self._writer is not None and self._writer.is_alive():
+            if background:
+                return
+            self._writer.join()
+        with self._lock:
+            jobs = [(device, series.frames, series.snapshot()) for device, series in self._series.items()
+                    if series.frames != self._saved_frames[device]]
+        if not jobs:
+            return
+        writer = TrendWriter(self, jobs)
+        if background:
+            self._writer = writer
+            writer.start()
+        else:
+            writer.run()
+            if writer.error is not None:
+                raise writer.error
+
+
+def trend_columns(rows, width):
+    """把时间桶展开为绘图用的列：桶开始时间（秒）和各指标的均值、最小值、最大值"""
+    count = np.maximum(rows['count'], 1)
+    columns = {'time': rows['bucket'] * width, 'count': rows['count']}
+    for metric in METRICS:
+        columns[f'{metric}_mean'] = rows[f'{metric}_sum'] / count
+        columns[f'{metric}_min'] = rows[f'{metric}_min']
+        columns[f'{metric}_max'] = rows[f'{metric}_max']
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看趋势数据，或测试趋势汇总和查询的耗时")
+    parser.add_argument('directory', nargs='?', help="设备的趋势目录，例如 trends/192.168.0.150_6789")
+    parser.add_argument('--span', type=float, default=86400, help="查看最近多少秒")
+    parser.add_argument('--benchmark', action='store_true', help="生成测试数据测试汇总和查询")
+    parser.add_argument('--days', type=float, default=30, help="测试数据的天数（每秒一帧）")
+    args = parser.parse_args()
+
+    series = TrendSeries()
+    if args.benchmark:
+        rng = np.random.default_rng(0)
+        frames = int(args.days * 86400)
+        end_s = int(time.time())
+        seconds = end_s - frames + np.arange(frames)
+        discharge = rng.integers(0, 3000, frames).tolist()
+        uhf = rng.uniform(0, 80, frames).tolist()
+        started = time.perf_counter()
+        for t, d, u in zip((seconds * 1_000_000_000).tolist(), discharge, uhf):
+            series.add(t, d, u)
+        elapsed = time.perf_counter() - started
+        print(f"汇总 {frames} 帧，耗时 {elapsed:.1f} s，每帧 {elapsed / frames * 1e6:.1f} µs")
+        directory = tempfile.mkdtemp(prefix='gis_trend_')
+        started = time.perf_counter()
+        series.save(directory)
+        print(f"保存耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+        started = time.perf_counter()
+        series = TrendSeries()
+        series.load(directory)
+        print(f"读取耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    elif args.directory:
+        series.load(args.directory)
+    else:
+        parser.error("需要指定趋势目录或 --benchmark")
+
+    finest = series.levels[0]
+    end_s = (finest.latest + 1) * finest.width
+    spans = (3600, 86400, 7 * 86400, 30 * 86400) if args.benchmark else (args.span,)
+    for span in spans:
+        started = time.perf_counter()
+        level, rows = series.query(end_s - span, end_s)
+        columns = trend_columns(rows, level.width)
+        elapsed = time.perf_counter() - started
+        print(f"最近 {span / 3600:g} 小时：{level.name} 级 {len(rows)} 个时间桶，查询耗时 {elapsed * 1000:.2f} ms", end='')
+        if len(rows):
+            print(f"，帧数 {int(columns['count'].sum())}，放电次数均值 {columns['discharge_mean'].mean():.1f}，"
+                  f"幅值最大 {columns['uhf_max'].max():.2f} dB")
+        else:
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+趋势图控件，只依赖 PyQt5 和 numpy。
+
+每个时间桶画出最小值~最大值的色带和均值折线，没有数据的时间桶处断开。
+数据来自 gis_trend 的预汇总级别，点数不超过四千个，整图重绘在十几毫秒内完成。
+"""
+from datetime import datetime
+
+import numpy as np
+from PyQt5.QtCore import QLineF, QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from gis_prpd_widget import nice_ticks
+from gis_trend import trend_columns
+
+# 时间轴刻度步长（秒）
+TIME_TICK_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 2 * 3600, 3 * 3600, 6 * 3600,
+                   12 * 3600, 86400, 2 * 86400, 7 * 86400, 14 * 86400)
+
+
+def value_tick_steps(span):
+    """按数值范围生成 1-2-5 序列的刻度步长"""
+    exponent = int(np.floor(np.log10(max(span, 1e-9)))) - 1
+    return [m * 10.0 ** e for e in range(exponent - 1, exponent + 3) for m in (1, 2, 5)]
+
+
+def time_label(seconds, step):
+    moment = datetime.fromtimestamp(seconds)
+    if step < 60:
+        return moment.strftime('%H:%M:%S')
+    if step < 86400:
+        return moment.strftime('%H:%M') if moment.hour or moment.minute else moment.strftime('%m-%d')
+    return moment.strftime('%m-%d')
+
+
+class TrendChart(QWidget):
+    """单个指标的趋势图：横轴为时间（本地时间），纵轴为指标值"""
+
+    MARGIN_LEFT = 60
+    MARGIN_RIGHT = 16
+    MARGIN_TOP = 26
+
+    def __init__(self, title, y_label, color, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.y_label = y_label
+        self.color = QColor(color)
+        self.info = ''
+        self.x_range = (0.0, 1.0)
+        self._data = None
+        self.setMinimumHeight(160)
+
+    def set_data(self, times, mean, low, high, width, x_range, info=''):
+        """times 为时间桶的开始时间（秒），width 为桶宽度，x_range 为显示的时间范围"""
+        self._data = (np.asarray(times, dtype=np.float64), mean, low, high, width)
+        self.x_range = (float(x_range[0]), float(x_range[1]))
+        self.info = info
+        self.update()
+
+    def _plot_rect(self):
+        metrics = self.fontMetrics()
+        bottom = metrics.height() + 10
+        return QRectF(self.MARGIN_LEFT, self.MARGIN_TOP, max(self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT, 1),
+                      max(self.height() - self.MARGIN_TOP - bottom, 1))
+
+    def _runs(self, times, width):
+        """按没有数据的时间桶切分为连续的段，返回各段的 (开始, 结束) 下标"""
+        breaks = np.flatnonzero(np.diff(times) > width * 1.5) + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(times)]])
+        return zip(starts.tolist(), ends.tolist())
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#f0f0f0'))
+        plot = self._plot_rect()
+        painter.fillRect(plot, Qt.white)
+        metrics = painter.fontMetrics()
+        x0, x1 = self.x_range
+        if self._data is not None and len(self._data[0]):
+            times, mean, low, high, width = self._data
+            y0, y1 = float(np.min(low)), float(np.max(high))
+        else:
+            times, y0, y1 = None, 0.0, 1.0
+        if y1 - y0 < 1e-6:
+            y0, y1 = y0 - 0.5, y1 + 0.5
+        pad = (y1 - y0) * 0.05
+        y0, y1 = y0 - pad, y1 + pad
+
+        def px(x):
+            return plot.left() + (x - x0) / (x1 - x0) * plot.width()
+
+        def py(y):
+            return plot.bottom() - (y - y0) / (y1 - y0) * plot.height()
+
+        # 网格和刻度，时间刻度对齐本地时间的整点
+        offset = datetime.fromtimestamp(x0).astimezone().utcoffset().total_seconds()
+        grid = QPen(QColor(0, 0, 0, 40))
+        grid.setStyle(Qt.DashLine)
+        time_ticks = nice_ticks(x0 + offset, x1 + offset, TIME_TICK_STEPS, max_ticks=8) - offset
+        step = time_ticks[1] - time_ticks[0] if len(time_ticks) > 1 else x1 - x0
+        for x in time_ticks:
+            painter.setPen(grid)
+            painter.drawLine(QPointF(px(x), plot.top()), QPointF(px(x), plot.bottom()))
+            painter.setPen(Qt.black)
+            label = time_label(x, step)
+            painter.drawText(QPointF(px(x) - metrics.horizontalAdvance(label) / 2, plot.bottom() + metrics.height()),
+                             label)
+        for y in nice_ticks(y0, y1, value_tick_steps(y1 - y0), max_ticks=6):
+            painter.setPen(grid)
+            painter.drawLine(QPointF(plot.left(), py(y)), QPointF(plot.right(), py(y)))
+            painter.setPen(Qt.black)
+            label = f"{y:g}"
+            painter.drawText(QPointF(plot.left() - metrics.horizontalAdvance(label) - 4,
+                                     py(y) + metrics.ascent() / 2 - 1), label)
+
+        # 每个时间桶画一条最小值~最大值的竖线组成色带，线宽等于桶宽的像素数；均值折线在没有数据的桶处断开。
+        # 带宽度的画笔和大多边形填充在 Qt 中要先生成描边路径，几千个点时需要数百毫秒，这里都避免使用
+        if times is not None:
+            painter.save()
+            painter.setClipRect(plot)
+            xs = px(times + width / 2)
+            band = QColor(*(255 - (255 - c) // 4 for c in (self.color.red(), self.color.green(), self.color.blue())))
+            band_pen = QPen(band, max(1, int(np.ceil(width / (x1 - x0) * plot.width()))))
+            band_pen.setCapStyle(Qt.FlatCap)
+            painter.setPen(band_pen)
+            painter.drawLines([QLineF(x, top, x, bottom) for x, top, bottom in
+                               zip(xs.tolist(), py(high).tolist(), py(low).tolist())])
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(self.color, 1))
+            ys = py(mean)
+            for start, end in self._runs(times, width):
+                if end - start == 1:
+                    painter.drawPoint(QPointF(xs[start], ys[start]))
+                else:
+                    painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in
+                                                    zip(xs[start:end].tolist(), ys[start:end].tolist())]))
+            painter.restore()
+
+        painter.setPen(Qt.black)
+        painter.drawRect(plot)
+        title_font = painter.font()
+        title_font.setBold(True)
+        font = painter.font()
+        painter.setFont(title_font)
+        painter.drawText(QRectF(plot.left(), 0, plot.width(), self.MARGIN_TOP), Qt.AlignCenter, self.title)
+        painter.setFont(font)
+        painter.save()
+        painter.translate(metrics.height() / 2 + 2, plot.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-plot.height() / 2, -metrics.height() / 2, plot.height(), metrics.height()),
+                         Qt.AlignCenter, self.y_label)
+        painter.restore()
+        if self.info:
+            painter.drawText(plot.adjusted(6, 4, -6, -4), Qt.AlignLeft | Qt.AlignTop, self.info)
+        painter.end()
+
+
+class TrendPanel(QWidget):
+    """放电次数和幅值两个趋势图上下排列"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.discharge = TrendChart('放电次数趋势（每帧总和）', '放电次数', '#2980b9')
+        self.uhf = TrendChart('幅值趋势（每帧最大值）', '幅值 (dB)', '#c0392b')
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.discharge)
+        layout.addWidget(self.uhf)
+
+    def set_trend(self, rows, width, x_range, info=''):
+        """rows 为 gis_trend 查询得到的时间桶，width 为桶宽度（秒）"""
+        columns = trend_columns(rows, width)
+        for chart, metric in ((self.discharge, 'discharge'), (self.uhf, 'uhf')):
+            chart.set_data(columns['time'], columns[f'{metric}_mean'], columns[f'{metric}_min'],
+                           columns[f'{metric}_max'], width, x_range, info if chart is self.discharge else '')
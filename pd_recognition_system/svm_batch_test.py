@@ -0,0 +1,88 @@
+"""
+批量识别接口的吞吐量测试。
+
+分别用单张识别接口逐张请求、用批量识别接口按不同批大小请求同一批测试图像，比较每秒识别的图像数，
+并检查批量结果与逐张结果是否一致。--format npz 时把图像预先处理为 64×64 数组打包为一个 .npz 上传，
+只测试模型部分（不含服务端的图像解码）。
+
+用法: python svm_batch_test.py --batch-sizes 1 8 32 128 --format png
+"""
+import argparse
+import glob
+import io
+import os
+import time
+
+import cv2
+import numpy as np
+import requests
+
+IMAGE_SIZE = (64, 64)
+
+
+def collect_images(dataset, limit):
+    paths = sorted(glob.glob(os.path.join(dataset, '*', '*.png')) + glob.glob(os.path.join(dataset, '*', '*.jpg')))
+    return paths[:limit]
+
+
+def batch_files(batch, fmt):
+    """把一批 (路径, 数据) 转换为上传的文件列表"""
+    if fmt == 'png':
+        return [('files', (os.path.basename(path), data)) for path, data in batch]
+    vectors = [cv2.resize(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE), IMAGE_SIZE)
+               for _, data in batch]
+    buffer = io.BytesIO()
+    np.savez(buffer, images=np.stack(vectors))
+    return [('files', ('batch.npz', buffer.getvalue()))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测试批量识别接口的吞吐量")
+    parser.add_argument('--server', default='http://127.0.0.1:9000', help="识别服务地址")
+    parser.add_argument('--dataset', default='./test_dataset', help="测试图像目录（每个类别一个子目录）")
+    parser.add_argument('--images', type=int, default=256, help="测试的图像数量，不足时重复使用")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--format', choices=['png', 'npz'], default='png', help="批量上传的格式")
+    args = parser.parse_args()
+
+    paths = collect_images(args.dataset, args.images)
+    if not paths:
+        print(f"错误：{args.dataset} 中没有找到测试图像")
+        return
+    images = []
+    for i in range(args.images):
+        path = paths[i % len(paths)]
+        with open(path, 'rb') as f:
+            images.append((path, f.read()))
+    session = requests.Session()
+
+    # 单张识别接口，作为吞吐量和结果的参考
+    expected = []
+    started = time.perf_counter()
+    for path, data in images:
+        response = session.post(f"{args.server}/api/v1/predict", files={'file': (os.path.basename(path), data)})
+        response.raise_for_status()
+        expected.append(response.json()['predicted_category'])
+    elapsed = time.perf_counter() - started
+    print(f"单张识别: {len(images)} 张，耗时 {elapsed:.2f} s，{len(images) / elapsed:.1f} 张/秒")
+
+    for size in args.batch_sizes:
+        batches = [images[i:i + size] for i in range(0, len(images), size)]
+        payloads = [batch_files(batch, args.format) for batch in batches]
+        categories = []
+        failed = 0
+        started = time.perf_counter()
+        for files in payloads:
+            response = session.post(f"{args.server}/api/v1/predict_batch", files=files)
+            response.raise_for_status()
+            result = response.json()
+            failed += result['failed']
+            categories.extend(item.get('predicted_category') for item in result['results'])
+        elapsed = time.perf_counter() - started
+        mismatched = sum(a != b for a, b in zip(categories, expected))
+        print(f"批量识别（{args.format}，每批 {size} 张）: {len(images) / elapsed:.1f} 张/秒，"
+              f"失败 {failed}，与单张识别不一致 {mismatched}")
+
+
+if __name__ == "__main__":
+    main()
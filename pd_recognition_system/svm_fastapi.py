@@ -1,5 +1,10 @@
+from typing import List
 from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+import io
+import os
+import zipfile
 import joblib
 import cv2
 import numpy as np
@@ -23,46 +28,239 @@ pca = joblib.load('./svm_pd_model/svm_pca.pkl')
 
 categories = ['corona', 'particle', 'floating', 'surface','void'] 
 
+# 模型输入：64×64 灰度图像展平后的向量
+IMAGE_SIZE = (64, 64)
+
+# 批量识别：一次请求最多的图像数、zip/npz 解压后的总字节数，以及每次送入模型的行数（限制标准化和降维时的临时内存）
+MAX_BATCH_ITEMS = 10000
+MAX_BATCH_BYTES = 512 * 1024 * 1024
+BATCH_CHUNK_ROWS = 1024
+
+# 批量请求超过条目数或解压大小上限，返回 413
+class BatchTooLarge(Exception):
+    pass
+
+# 一次批量请求的用量，在解压和解码之前按 zip 目录、npy 头中的大小和形状累计，超过上限时抛出 BatchTooLarge
+class BatchBudget:
+    def __init__(self, max_items=MAX_BATCH_ITEMS, max_bytes=MAX_BATCH_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.items = 0
+        self.bytes = 0
+
+    def take(self, items=0, nbytes=0):
+        self.items += items
+        self.bytes += nbytes
+        self.check()
+
+    def check(self, items=0):
+        if self.items + items > self.max_items:
+            raise BatchTooLarge(f"Too many items, at most {self.max_items} per request")
+        if self.bytes > self.max_bytes:
+            raise BatchTooLarge(f"Uncompressed data too large, at most {self.max_bytes // (1024 * 1024)} MB per request")
+
+# 把灰度图调整为模型输入的大小并展平成向量
+def preprocess_image(img):
+    if img is None:
+        return None
+    img = cv2.resize(img, IMAGE_SIZE)  # 调整图像大小
+    return img.flatten()  # 将图像展平成向量
+
 # 读取新图像并转换为灰度图
 def load_new_image(img_path):
-    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-    if img is not None:
-        img = cv2.resize(img, (64, 64))  # 调整图像大小
-        img = img.flatten()  # 将图像展平成向量
-        return img
-    else:
+    return preprocess_image(cv2.imread(img_path, cv2.IMREAD_GRAYSCALE))
+
+# 直接在内存中解码上传的图像字节（PNG/JPG等），不写临时文件，并发请求之间互不影响
+def decode_image(data):
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
         return None
+    return preprocess_image(cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE))
 
-@app.post("/api/v1/predict")
-async def predict(file: UploadFile = File(...)):
-    try:
-        # 将文件保存到临时路径
-        img_path = 'temp_image.jpg'
-        with open(img_path, "wb") as buffer:
-            buffer.write(await file.read())
+# 对多个展平后的图像向量（每行一个）一次完成标准化、降维和预测
+def predict_matrix(new_images):
+    new_images = scaler.transform(new_images)
+    new_images = pca.transform(new_images)
 
-        # 加载并处理图像
-        new_image = load_new_image(img_path)
-        if new_image is None:
-            raise HTTPException(status_code=400, detail="Failed to process image")
+    # 预测
+    new_pred = clf.predict(new_images)
 
-        # 标准化和降维
-        new_image = scaler.transform([new_image])
-        new_image = pca.transform(new_image)
+    # 获取预测概率
+    pred_prob = clf.predict_proba(new_images)
+    predicted_probability = pred_prob[np.arange(len(new_pred)), new_pred] * 100
 
-        # 预测
-        new_pred = clf.predict(new_image)
-        predicted_category = categories[new_pred[0]]
+    return [{
+        'predicted_category': categories[pred],
+        'predicted_probability': f"{prob:.2f}%"
+    } for pred, prob in zip(new_pred.tolist(), predicted_probability.tolist())]
 
-        # 获取预测概率
-        pred_prob = clf.predict_proba(new_image)
-        predicted_probability = pred_prob[0][new_pred[0]] * 100
+# 对展平后的图像向量做标准化、降维和预测
+def predict_vector(new_image):
+    return predict_matrix(np.asarray([new_image]))[0]
 
-        return JSONResponse(content={
-            'predicted_category': predicted_category,
-            'predicted_probability': f"{predicted_probability:.2f}%"
-        })
+# 灰度图像的像素取值范围，超出范围的数组不是按训练图像的方式栅格化的，过大的值还会使标准化溢出
+PIXEL_RANGE = (0, 255)
+
+# 检查数组能否作为模型输入：布尔、整数或浮点类型，没有 NaN/Inf，并且在像素取值范围内，返回错误信息，可用时返回 None
+def array_error(array):
+    if array.dtype.kind not in 'biuf':
+        return f"Expected a numeric array, got dtype {array.dtype}"
+    if array.size == 0 or array.dtype.kind == 'b':
+        return None
+    if not np.isfinite(array).all():
+        return "Array contains non-finite values"
+    if array.min() < PIXEL_RANGE[0] or array.max() > PIXEL_RANGE[1]:
+        return f"Array values must be within {PIXEL_RANGE[0]}~{PIXEL_RANGE[1]}"
+    return None
+
+# 把数组拆分为模型输入：64×64 或 4096 个元素为一张图像，(N, 64, 64) 或 (N, 4096) 为 N 张
+# 返回 [(名称, 向量, 错误), ...]，向量和错误只有一个不为 None
+def array_items(name, array):
+    pixels = IMAGE_SIZE[0] * IMAGE_SIZE[1]
+    if array.size == pixels:
+        rows = [(name, array.reshape(-1))]
+    elif array.ndim >= 2 and array.size and array[0].size == pixels:
+        rows = [(f"{name}[{i}]", row.reshape(-1)) for i, row in enumerate(array)]
+    else:
+        return [(name, None, f"Expected {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]} array(s), got shape {array.shape}")]
+    if array.dtype.kind not in 'biuf':
+        return [(name, None, f"Expected a numeric array, got dtype {array.dtype}")]
+    items = []
+    for row_name, row in rows:
+        error = array_error(row)
+        items.append((row_name, None if error else row, error))
+    return items
+
+# 只读取 .npy 的文件头，返回其中的图像数（与 array_items 的拆分方式一致）
+def npy_image_count(f):
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    elif version == (2, 0):
+        shape, _, _ = np.lib.format.read_array_header_2_0(f)
+    else:
+        raise ValueError(f"Unsupported npy version {version}")
+    if len(shape) >= 2 and shape[0] and int(np.prod(shape[1:])) == IMAGE_SIZE[0] * IMAGE_SIZE[1]:
+        return shape[0]
+    return 1
 
+# 读取 .npy：先按文件头计入条目数，再解析数据
+def load_npy(f, budget):
+    start = f.tell()
+    budget.take(items=npy_image_count(f))
+    f.seek(start)
+    return np.load(f, allow_pickle=False)
+
+# 打开 zip/npz，按目录中的解压后大小计入用量，返回其中的文件成员
+def archive_members(archive, budget):
+    members = [member for member in archive.infolist() if not member.is_dir()]
+    budget.take(nbytes=sum(member.file_size for member in members))
+    return members
+
+# 解析批量上传的一个文件：图像、.npy、.npz（每个数组）或 .zip（每个成员按扩展名解析）
+# 条目数和解压大小在解码之前计入 budget，超过上限时抛出 BatchTooLarge
+def upload_items(name, data, budget):
+    suffix = os.path.splitext(name)[1].lower()
+    try:
+        if suffix == '.zip':
+            items = []
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members = archive_members(archive, budget)
+                # 每个成员至少是一个条目
+                budget.check(items=len(members))
+                for member in members:
+                    items.extend(upload_items(f"{name}/{member.filename}", archive.read(member), budget))
+            return items
+        if suffix == '.npz':
+            items = []
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for member in archive_members(archive, budget):
+                    key = member.filename[:-4] if member.filename.endswith('.npy') else member.filename
+                    with archive.open(member) as f:
+                        array = load_npy(io.BytesIO(f.read()), budget)
+                    items.extend(array_items(f"{name}/{key}", array))
+            return items
+        if suffix == '.npy':
+            return array_items(name, load_npy(io.BytesIO(data), budget))
+    except (ValueError, EOFError, OSError, zipfile.BadZipFile) as e:
+        return [(name, None, f"Invalid {suffix[1:]} data: {e}")]
+    budget.take(items=1)
+    new_image = decode_image(data)
+    if new_image is None:
+        return [(name, None, "Failed to process image")]
+    return [(name, new_image, None)]
+
+# 批量识别：有效的向量按 BATCH_CHUNK_ROWS 行一组向量化预测，无效的条目只在对应位置返回错误
+# 一组预测失败时改为逐行预测，失败的行单独返回错误，不影响同组的其他条目
+def predict_items(items):
+    results = [{'name': name, 'error': error} if vector is None else None for name, vector, error in items]
+    valid = [i for i, (_, vector, _) in enumerate(items) if vector is not None]
+    for start in range(0, len(valid), BATCH_CHUNK_ROWS):
+        chunk = valid[start:start + BATCH_CHUNK_ROWS]
+        matrix = np.stack([items[i][1] for i in chunk]).astype(np.float64)
+        try:
+            predictions = predict_matrix(matrix)
+        except Exception:
+            predictions = []
+            for row in matrix:
+                try:
+                    predictions.append(predict_matrix(row[None, :])[0])
+                except Exception as e:
+                    predictions.append({'error': f"Prediction failed: {e}"})
+        for i, prediction in zip(chunk, predictions):
+            results[i] = {'name': items[i][0], **prediction}
+    failed = sum('error' in result for result in results)
+    return {'count': len(results), 'failed': failed, 'results': results}
+
+@app.post("/api/v1/predict")
+async def predict(file: UploadFile = File(...)):
+    # 上传的数据直接在内存中解码，每个请求使用自己的缓冲区；解码和预测在线程池中进行，不阻塞其他请求
+    new_image = await run_in_threadpool(decode_image, await file.read())
+    if new_image is None:
+        raise HTTPException(status_code=400, detail="Failed to process image")
+    try:
+        return JSONResponse(content=await run_in_threadpool(predict_vector, new_image))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/predict_array")
+async def predict_array(file: UploadFile = File(...)):
+    """
+    直接接收 64×64 灰度数组（np.save 保存的 .npy 数据，形状为 64×64 或 4096），不经过图像编码和临时文件。
+    客户端需按训练图像的方式栅格化（见 gis_prpd.PrpdRasterizer）。非数值类型、形状不符、含 NaN/Inf 或超出 0~255 时返回 400。
+    """
+    try:
+        new_image = np.load(io.BytesIO(await file.read()), allow_pickle=False)
+    except (ValueError, EOFError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid npy data: {e}")
+    if new_image.shape not in (IMAGE_SIZE, (IMAGE_SIZE[0] * IMAGE_SIZE[1],)):
+        raise HTTPException(status_code=400,
+                            detail=f"Expected {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]} array, got shape {new_image.shape}")
+    error = await run_in_threadpool(array_error, new_image)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    try:
+        return JSONResponse(content=await run_in_threadpool(predict_vector, new_image.reshape(-1)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/predict_batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    批量识别：files 可以是多个图像文件，也可以是包含图像或 .npy 的 zip、多个数组的 .npz。
+    所有有效输入堆叠为一个矩阵，一次完成标准化、降维和预测；无法解析的条目单独返回错误，不影响其他条目。
+    结果按上传顺序排列：{count, failed, results: [{name, predicted_category, predicted_probability} 或 {name, error}]}
+    """
+    uploads = [(file.filename or f"file{index}", await file.read()) for index, file in enumerate(files)]
+    # 图像解码和预测都在线程池中进行，不阻塞其他请求；条目数和解压大小在解码之前检查
+    budget = BatchBudget()
+    try:
+        items = await run_in_threadpool(
+            lambda: [item for name, data in uploads for item in upload_items(name, data, budget)])
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        return JSONResponse(content=await run_in_threadpool(predict_items, items))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,93 @@
+"""
+识别接口的延迟和并发一致性测试。
+
+先逐张顺序请求一遍，记录每张图像的识别结果，再用多个线程并发请求同样的图像，统计延迟，
+并检查并发时的结果是否与顺序请求一致（例如多个请求共用临时文件时会互相覆盖，得到别的图像的结果或读取失败）。
+
+用法: python svm_latency_test.py --requests 500 --concurrency 8
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+def collect_images(dataset, limit):
+    paths = sorted(glob.glob(os.path.join(dataset, '*', '*.png')) + glob.glob(os.path.join(dataset, '*', '*.jpg')))
+    return paths[:limit]
+
+
+def post_image(session, url, path, data):
+    started = time.perf_counter()
+    response = session.post(url, files={'file': (os.path.basename(path), data)})
+    latency = time.perf_counter() - started
+    if response.status_code != 200:
+        return latency, f"HTTP {response.status_code}"
+    result = response.json()
+    return latency, (result['predicted_category'], result['predicted_probability'])
+
+
+def summarize(name, latencies, elapsed):
+    latencies = np.array(latencies) * 1000
+    print(f"{name}: {len(latencies)} 次请求，平均 {latencies.mean():.1f} ms，"
+          f"P50 {np.percentile(latencies, 50):.1f} ms，P95 {np.percentile(latencies, 95):.1f} ms，"
+          f"最大 {latencies.max():.1f} ms，吞吐量 {len(latencies) / elapsed:.1f} 次/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测试识别接口的延迟和并发一致性")
+    parser.add_argument('--url', default='http://127.0.0.1:9000/api/v1/predict', help="识别接口地址")
+    parser.add_argument('--dataset', default='./test_dataset', help="测试图像目录（每个类别一个子目录）")
+    parser.add_argument('--images', type=int, default=50, help="使用的图像数量")
+    parser.add_argument('--requests', type=int, default=500, help="并发测试的请求总数")
+    parser.add_argument('--concurrency', type=int, default=8, help="并发线程数")
+    args = parser.parse_args()
+
+    paths = collect_images(args.dataset, args.images)
+    if not paths:
+        print(f"错误：{args.dataset} 中没有找到测试图像")
+        return
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((path, f.read()))
+
+    # 顺序请求，作为每张图像的参考结果
+    session = requests.Session()
+    expected = {}
+    latencies = []
+    started = time.perf_counter()
+    for path, data in images:
+        latency, result = post_image(session, args.url, path, data)
+        latencies.append(latency)
+        expected[path] = result
+    summarize("顺序请求", latencies, time.perf_counter() - started)
+
+    # 并发请求，每个线程使用自己的连接
+    jobs = [images[i % len(images)] for i in range(args.requests)]
+    local = threading.local()
+
+    def worker(job):
+        path, data = job
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        latency, result = post_image(local.session, args.url, path, data)
+        return path, latency, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(worker, jobs))
+    elapsed = time.perf_counter() - started
+    summarize(f"并发请求（{args.concurrency} 线程）", [latency for _, latency, _ in results], elapsed)
+    failed = sum(isinstance(result, str) for _, _, result in results)
+    mismatched = sum(result != expected[path] for path, _, result in results if not isinstance(result, str))
+    print(f"请求失败: {failed}/{len(results)}，与顺序请求结果不一致: {mismatched}/{len(results)}")
+
+
+if __name__ == "__main__":
+    main()
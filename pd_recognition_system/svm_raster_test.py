@@ -0,0 +1,161 @@
+"""
+检查 gis_prpd.PrpdRasterizer 栅格化的数组与训练图像的一致程度。
+
+从训练图像中提取放电点（按圆点的像素覆盖反推圆心），换算为相位和幅值后用 PrpdRasterizer 重新栅格化，
+与原图经 cv2 灰度读取并缩放到 64×64 的结果比较灰度差，并分别用 /api/v1/predict（上传原图）和
+/api/v1/predict_array（上传栅格化数组）识别，统计识别结果一致的图像数。
+只检查 PrpdRasterizer 模拟的样式（1250×625、蓝色放电点、红色参考正弦），其他样式的图像跳过并计数。
+提取放电点时重叠的圆点可能少算或多算，灰度差中包含这部分误差。
+
+--save-background 从这些图像中去掉放电点后取逐像素中位数，保存为 PrpdRasterizer 使用的静态部分。
+
+用法: python svm_raster_test.py --dataset ./test_dataset
+      python svm_raster_test.py --save-background ../gis_prpd_background.npz
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+
+import cv2
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gis_prpd import PrpdRasterizer  # noqa: E402
+
+# 放电点 (B, G, R) 约为 (243, 149, 34)，参考正弦为纯红色；图例在纵坐标 LEGEND_BOTTOM 以上
+LEGEND_BOTTOM = 36
+
+
+def is_raster_style(image):
+    """是否为 PrpdRasterizer 模拟的样式：1250×625，有红色参考正弦"""
+    if image.shape[:2] != (PrpdRasterizer.HEIGHT, PrpdRasterizer.WIDTH):
+        return False
+    b, g, r, a = [channel.astype(np.int16) for channel in cv2.split(image)]
+    return ((r > 200) & (g < 60) & (b < 60) & (a > 0)).sum() > 10000
+
+
+def dot_mask(image):
+    """放电点覆盖的像素（任意透明度），不含图例"""
+    b, g, r, a = cv2.split(image)
+    mask = (b > 200) & (r < 100) & (a > 0)
+    mask[:LEGEND_BOTTOM] = False
+    return mask
+
+
+def dot_footprint(radius=PrpdRasterizer.DOT_RADIUS):
+    """圆心在像素中心时与圆相交的像素"""
+    n = int(np.ceil(radius)) + 1
+    ys, xs = np.mgrid[-n:n + 1, -n:n + 1]
+    dx = np.maximum(np.abs(xs) - 0.5, 0.0)
+    dy = np.maximum(np.abs(ys) - 0.5, 0.0)
+    return (dx * dx + dy * dy < radius * radius).astype(np.uint8)
+
+
+def cover_dots(mask, min_gain):
+    """重叠的圆点：每次选覆盖未解释像素最多的圆心，直到剩下的零散像素不足 min_gain 个"""
+    kernel = dot_footprint()
+    h = kernel.shape[0] // 2
+    remaining = mask.astype(np.uint8)
+    dots = []
+    while True:
+        gain = cv2.filter2D(remaining.astype(np.float32), -1, kernel.astype(np.float32),
+                            borderType=cv2.BORDER_CONSTANT)
+        gain[~mask] = 0
+        y, x = np.unravel_index(np.argmax(gain), gain.shape)
+        if gain[y, x] < min_gain:
+            break
+        dots.append((x, y))
+        y0, y1, x0, x1 = max(y - h, 0), min(y + h + 1, mask.shape[0]), max(x - h, 0), min(x + h + 1, mask.shape[1])
+        remaining[y0:y1, x0:x1] &= 1 - kernel[h - (y - y0):h + (y1 - y), h - (x - x0):h + (x1 - x)]
+    return dots
+
+
+def extract_dots(mask, min_gain=40):
+    """
+    从放电点覆盖的像素反推圆心，返回 (N, 2) 的 (x, y)。
+    单独的圆点（连通区域不超过一个圆点的大小）取质心，重叠的圆点在连通区域内用 cover_dots 逐个选取
+    """
+    single = dot_footprint().sum() * 1.1
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(mask.astype(np.uint8))
+    dots = []
+    for label in range(1, count):
+        if stats[label, cv2.CC_STAT_AREA] <= single:
+            dots.append(tuple(centroids[label]))
+        else:
+            x, y, w, h = stats[label, :4]
+            dots.extend((x + dx, y + dy) for dx, dy in cover_dots(labels[y:y + h, x:x + w] == label, min_gain))
+    return np.array(dots, dtype=np.float64).reshape(-1, 2)
+
+
+def dots_to_prpd(dots):
+    """原图像素坐标换算为 (相位, 幅值)"""
+    r = PrpdRasterizer
+    phase = (dots[:, 0] - r.PLOT_LEFT) / (r.PLOT_RIGHT - r.PLOT_LEFT) * 360.0
+    amplitude = (r.PLOT_BOTTOM - dots[:, 1]) / (r.PLOT_BOTTOM - r.PLOT_TOP) * r.AMPLITUDE_MAX
+    return phase, amplitude
+
+
+def save_background(paths, path):
+    """去掉放电点（及其外侧2个像素）后取逐像素中位数"""
+    grays, masks = [], []
+    for image_path in paths:
+        image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        mask = cv2.dilate(dot_mask(image).astype(np.uint8), np.ones((5, 5), np.uint8)) > 0
+        grays.append(cv2.imread(image_path, cv2.IMREAD_GRAYSCALE))
+        masks.append(mask)
+    background = np.ma.median(np.ma.array(np.stack(grays), mask=np.stack(masks)), axis=0).filled(0)
+    np.savez_compressed(path, background=background.astype(np.uint8))
+    print(f"已从 {len(paths)} 张图像生成静态部分: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查 PrpdRasterizer 与训练图像的一致程度")
+    parser.add_argument('--server', default='http://127.0.0.1:9000', help="识别服务地址")
+    parser.add_argument('--dataset', default='./test_dataset', help="训练图像目录（每个类别一个子目录）")
+    parser.add_argument('--save-background', metavar='PATH', help="生成静态部分文件后退出")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dataset, '*', '*.png')))
+    selected = [path for path in paths if is_raster_style(cv2.imread(path, cv2.IMREAD_UNCHANGED))]
+    if not selected:
+        print(f"错误：{args.dataset} 中没有 PrpdRasterizer 模拟样式的图像")
+        return
+    if args.save_background:
+        save_background(selected, args.save_background)
+        return
+
+    rasterizer = PrpdRasterizer()
+    if not rasterizer.exact_background:
+        print("注意：没有找到静态部分文件，参考正弦和图例为近似绘制，不含坐标轴文字")
+    session = requests.Session()
+    agreed = 0
+    differences = []
+    print(f"共 {len(paths)} 张图像，检查 {len(selected)} 张，其他样式跳过 {len(paths) - len(selected)} 张")
+    for path in selected:
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        phase, amplitude = dots_to_prpd(extract_dots(dot_mask(image)))
+        array = rasterizer.render(phase, amplitude)
+        reference = cv2.resize(cv2.imread(path, cv2.IMREAD_GRAYSCALE), (rasterizer.size, rasterizer.size))
+        difference = np.abs(array.astype(np.int16) - reference).mean()
+        differences.append(difference)
+
+        with open(path, 'rb') as f:
+            response = session.post(f"{args.server}/api/v1/predict", files={'file': (os.path.basename(path), f.read())})
+        response.raise_for_status()
+        expected = response.json()['predicted_category']
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        response = session.post(f"{args.server}/api/v1/predict_array", files={'file': ('prpd.npy', buffer.getvalue())})
+        response.raise_for_status()
+        category = response.json()['predicted_category']
+        agreed += category == expected
+        print(f"{os.path.relpath(path, args.dataset)}: {len(phase)} 个点，平均灰度差 {difference:.2f}，"
+              f"原图 {expected}，栅格化 {category}{'' if category == expected else '  不一致'}")
+    print(f"识别结果一致 {agreed}/{len(selected)}，平均灰度差 {np.mean(differences):.2f}")
+
+
+if __name__ == "__main__":
+    main()